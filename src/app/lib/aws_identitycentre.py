@@ -3,32 +3,151 @@ Module to interact with the AWS IAM Identity Store service
 """
 import itertools
 import boto3
+import botocore.exceptions
 
 
 class AwsIdentityCentre:
-    def __init__(self, identity_store_id: str, identity_store_arn: str) -> None:
+    def __init__(
+        self,
+        identity_store_id: str,
+        identity_store_arn: str,
+        lazy_lookups: bool = False,
+        identity_store_client: boto3.client = None,
+        sso_admin_client: boto3.client = None,
+    ) -> None:
         """
         Default constructor method to initialize
         identity store variable and boto3 client.
+
+        Parameters
+        ----------
+            - identity_store_id: str, required
+                ID of the identity store
+            - identity_store_arn: str, required
+                ARN of the IAM Identity Center instance
+            - lazy_lookups: bool, optional
+                Whether principals are looked up by name on demand, the
+                full listings being fetched only once they are accessed
+            - identity_store_client: boto3.client, optional
+                Identity store client, created if omitted
+            - sso_admin_client: boto3.client, optional
+                SSO admin client, created if omitted
         """
 
         # Set class instance vars
         self._identity_store_id = identity_store_id
         self._identity_store_arn = identity_store_arn
+        self._sso_users = None
+        self._sso_groups = None
+        self._permission_sets = None
+
+        # Principal name -> ID lookups, only hits are memoized
+        self._group_ids = {}
+        self._user_ids = {}
 
         # Set boto3 clients
-        self._sso_admin_client = boto3.client("sso-admin")
-        self._identity_store_client = boto3.client("identitystore")
+        self._sso_admin_client = (
+            sso_admin_client if sso_admin_client else boto3.client("sso-admin")
+        )
+        self._identity_store_client = (
+            identity_store_client
+            if identity_store_client
+            else boto3.client("identitystore")
+        )
 
         # Set paginators
-        self._sso_users_paginator = self._identity_store_client.get_paginator("list_users")
-        self._sso_groups_paginator = self._identity_store_client.get_paginator("list_groups")
-        self._permission_sets_paginator = self._sso_admin_client.get_paginator("list_permission_sets")
+        self._sso_users_paginator = self._identity_store_client.get_paginator(
+            "list_users"
+        )
+        self._sso_groups_paginator = self._identity_store_client.get_paginator(
+            "list_groups"
+        )
+        self._permission_sets_paginator = self._sso_admin_client.get_paginator(
+            "list_permission_sets"
+        )
 
         # Get Identity center entities
-        self.sso_users = self._list_sso_users()
-        self.sso_groups = self._list_sso_groups()
-        self.permission_sets = self._list_permission_sets()
+        if not lazy_lookups:
+            self._sso_users = self._list_sso_users()
+            self._sso_groups = self._list_sso_groups()
+            self._permission_sets = self._list_permission_sets()
+
+    @property
+    def sso_users(self) -> list:
+        """Users of the identity store, listed on first access"""
+        if self._sso_users is None:
+            self._sso_users = self._list_sso_users()
+        return self._sso_users
+
+    @property
+    def sso_groups(self) -> list:
+        """Groups of the identity store, listed on first access"""
+        if self._sso_groups is None:
+            self._sso_groups = self._list_sso_groups()
+        return self._sso_groups
+
+    @property
+    def permission_sets(self) -> list:
+        """Permission set ARNs of the instance, listed on first access"""
+        if self._permission_sets is None:
+            self._permission_sets = self._list_permission_sets()
+        return self._permission_sets
+
+    def get_group_id(self, display_name: str) -> str:
+        """
+        Method to look up a group ID by display name with GetGroupId, or
+        return None if no group matches. Misses are not memoized.
+        """
+        if display_name not in self._group_ids:
+            group_id = self._get_principal_id(
+                self._identity_store_client.get_group_id,
+                "GroupId",
+                "DisplayName",
+                display_name,
+            )
+            if group_id is None:
+                return None
+            self._group_ids[display_name] = group_id
+        return self._group_ids[display_name]
+
+    def get_user_id(self, user_name: str) -> str:
+        """
+        Method to look up a user ID by user name with GetUserId, or return
+        None if no user matches. Misses are not memoized.
+        """
+        if user_name not in self._user_ids:
+            user_id = self._get_principal_id(
+                self._identity_store_client.get_user_id,
+                "UserId",
+                "UserName",
+                user_name,
+            )
+            if user_id is None:
+                return None
+            self._user_ids[user_name] = user_id
+        return self._user_ids[user_name]
+
+    def _get_principal_id(
+        self, operation, id_key: str, attribute_path: str, attribute_value: str
+    ) -> str:
+        """
+        Method to look up a principal by a unique attribute, returning
+        None when it does not exist.
+        """
+        try:
+            return operation(
+                IdentityStoreId=self._identity_store_id,
+                AlternateIdentifier={
+                    "UniqueAttribute": {
+                        "AttributePath": attribute_path,
+                        "AttributeValue": attribute_value,
+                    }
+                },
+            )[id_key]
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise
+            return None
 
     def _list_sso_groups(self):
         aws_identitystore_groups_iterator = self._sso_groups_paginator.paginate(
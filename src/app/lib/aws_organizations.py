@@ -2,42 +2,128 @@
 Module to interact with the AWS Organizations service
 """
 import itertools
+import concurrent.futures
 import boto3
+import botocore.config
+
+# Default ceiling of concurrent Organizations API calls per crawl level
+DEFAULT_MAX_WORKERS = 8
 
 
 class AwsOrganizations:
-    def __init__(self, root_ou_id: str, ou_id_ignore_list: list = []) -> None:
+    def __init__(
+        self,
+        root_ou_id: str,
+        ou_id_ignore_list: list = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        organizations_client: boto3.client = None,
+    ) -> None:
+        """
+        Default constructor method to initialize the organizations
+        client and crawl the organizational unit tree.
+
+        Parameters
+        ----------
+            - root_ou_id: str, required
+                ID of the OU (or root) the crawl starts from
+            - ou_id_ignore_list: list, optional
+                OU IDs (and by extension their subtrees) to skip
+            - max_workers: int, optional
+                Ceiling of concurrent API calls issued per OU level
+            - organizations_client: boto3.client, optional
+                Organizations client, one pooling a connection per worker
+                if omitted
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be a positive integer")
 
         # Set instance vars
         self.ou_account_map = {}
         self._root_ou_id = root_ou_id
-        self._ou_id_ignore_list = ou_id_ignore_list
+        self._ou_id_ignore_list = set(ou_id_ignore_list or [])
+        self._max_workers = max_workers
 
         # Set boto3 clients
-        self._organizations_client = boto3.client("organizations")
+        self._organizations_client = (
+            organizations_client
+            if organizations_client
+            else boto3.client(
+                "organizations",
+                config=botocore.config.Config(
+                    max_pool_connections=max(max_workers, 10)
+                ),
+            )
+        )
 
         # Set paginators
-        self._account_paginator = self._organizations_client.get_paginator("list_accounts_for_parent")
-        self._ou_paginator = self._organizations_client.get_paginator("list_organizational_units_for_parent")
+        self._account_paginator = self._organizations_client.get_paginator(
+            "list_accounts_for_parent"
+        )
+        self._ou_paginator = self._organizations_client.get_paginator(
+            "list_organizational_units_for_parent"
+        )
 
         # Create Account & OU itenerary
-        self._describe_aws_organizational_unit(self._root_ou_id)
+        self.describe_aws_organizational_unit()
+
+    def describe_aws_organizational_unit(self) -> dict:
+        """
+        Crawl the OU tree level by level, listing the accounts and
+        child OUs of every sibling OU concurrently.
+
+        Returns
+        -------
+        dict:
+            Mapping of OU ID to the list of its active accounts
+        """
+        ou_account_map = {}
+        ou_level = [self._root_ou_id]
 
-    def _describe_aws_organizational_unit(self, parent_ou_id: str = "") -> None:
-        parent_ou_id = parent_ou_id if parent_ou_id else self._root_ou_id
-        self.ou_account_map.setdefault(parent_ou_id, [])
-        
-        # Populate active accounts under parent ou ID
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers
+        ) as executor:
+            while ou_level:
+                # Both maps are submitted eagerly, so every sibling of the
+                # current level is fetched in parallel
+                ou_accounts = executor.map(self._list_active_accounts, ou_level)
+                ou_children = executor.map(self._list_child_ou_ids, ou_level)
+
+                next_ou_level = []
+                for ou_id, accounts, child_ou_ids in zip(
+                    ou_level, ou_accounts, ou_children
+                ):
+                    ou_account_map[ou_id] = accounts
+                    next_ou_level.extend(
+                        child_ou_id
+                        for child_ou_id in child_ou_ids
+                        if child_ou_id not in self._ou_id_ignore_list
+                    )
+                ou_level = next_ou_level
+
+        self.ou_account_map = ou_account_map
+        return self.ou_account_map
+
+    def _list_active_accounts(self, parent_ou_id: str) -> list:
+        """
+        Method to list the active accounts directly under an OU.
+        """
         accounts_iterator = self._account_paginator.paginate(ParentId=parent_ou_id)
-        aws_accounts_flattened_list = list(itertools.chain.from_iterable((page["Accounts"] for page in accounts_iterator)))
-        for account in aws_accounts_flattened_list:
-            if account["Status"] == "ACTIVE":
-                account_information = {"Id": account["Id"], "Name": account["Name"]}
-                self.ou_account_map[parent_ou_id].append(account_information)
-        
-        # Recursively get list of nested OUs
-        aws_ou_iterator = self._ou_paginator.paginate(ParentId=parent_ou_id)
-        aws_ous_flattened_list = list(itertools.chain.from_iterable((page["OrganizationalUnits"] for page in aws_ou_iterator)))
-        for ou in aws_ous_flattened_list:
-            if ou["Id"] not in self._ou_id_ignore_list:
-                self._describe_aws_organizational_unit(ou["Id"])
+        return [
+            {"Id": account["Id"], "Name": account["Name"]}
+            for account in itertools.chain.from_iterable(
+                (page["Accounts"] for page in accounts_iterator)
+            )
+            if account["Status"] == "ACTIVE"
+        ]
+
+    def _list_child_ou_ids(self, parent_ou_id: str) -> list:
+        """
+        Method to list the IDs of the OUs directly under an OU.
+        """
+        ou_iterator = self._ou_paginator.paginate(ParentId=parent_ou_id)
+        return [
+            ou["Id"]
+            for ou in itertools.chain.from_iterable(
+                (page["OrganizationalUnits"] for page in ou_iterator)
+            )
+        ]
@@ -1,83 +1,711 @@
 """
 Regex based rules engine for processing regex input for the
 purpose of assiging permission sets.
+
+Clients, crawls and the libraries backing them (boto3, jsonschema, yaml,
+the X-Ray SDK) are loaded on first use rather than at import, so a cold
+start only pays for what the invoked route needs.
 """
 import os
+import json
+import time
 import itertools
+import functools
 from http import HTTPStatus
+from typing import TYPE_CHECKING, Callable
 
-from aws_lambda_powertools import Logger, Tracer
-from aws_lambda_powertools.logging import correlation_paths
-from aws_lambda_powertools.event_handler import Response, content_types
-from aws_lambda_powertools.utilities.typing import LambdaContext
-from aws_lambda_powertools.utilities.data_classes import EventBridgeEvent, event_source
+from aws_lambda_powertools import Logger
 
-# Local package & layer imports
-from .lib.aws_organizations import AwsOrganizations
-from .lib.aws_identitycentre import AwsIdentityStore
-from .lib.aws_sso_resolver import RbacResolver
+if TYPE_CHECKING:
+    from aws_lambda_powertools.utilities.typing import LambdaContext
+    from aws_lambda_powertools.utilities.data_classes import EventBridgeEvent
 
 # Env vars
 LOG_LEVEL = os.getenv("LOG_LEVEL")
 TRACER_SERVICE_NAME = os.getenv("TRACER_SERVICE_NAME")
 
 ROOT_OU_ID = os.getenv("ROOT_OU_ID")
+ORGANIZATIONS_MAX_WORKERS = int(os.getenv("ORGANIZATIONS_MAX_WORKERS", "8"))
+ORGANIZATIONS_ASYNC_CRAWL = (
+    os.getenv("ORGANIZATIONS_ASYNC_CRAWL", "false").lower() == "true"
+)
 IDENTITY_STORE_ID = os.getenv("IDENTITY_STORE_ID")
 IDENTITY_STORE_ARN = os.getenv("IDENTITY_STORE_ARN")
+IDENTITY_STORE_LAZY_LOOKUPS = (
+    os.getenv("IDENTITY_STORE_LAZY_LOOKUPS", "true").lower() == "true"
+)
+
+DDB_TABLE_NAME = os.getenv("DDB_TABLE_NAME")
+DDB_HASH_KEY = os.getenv("HASH_KEY", "pk")
+DDB_RANGE_KEY = os.getenv("RANGE_KEY", "sk")
+SNAPSHOT_STORE = os.getenv("SNAPSHOT_STORE", "file")
+SNAPSHOT_TTL_SECONDS = int(os.getenv("SNAPSHOT_TTL_SECONDS", "900"))
+RECONCILIATION_SLICE_SIZE = int(os.getenv("RECONCILIATION_SLICE_SIZE", "500"))
+RECONCILIATION_SHARD_COUNT = int(os.getenv("RECONCILIATION_SHARD_COUNT", "1"))
+RECONCILIATION_SHARD_STRATEGY = os.getenv("RECONCILIATION_SHARD_STRATEGY", "ou")
+RECONCILIATION_PRUNE_UNMANAGED = (
+    os.getenv("RECONCILIATION_PRUNE_UNMANAGED", "false").lower() == "true"
+)
+JIIT_MAX_DURATION_SECONDS = int(os.getenv("JIIT_MAX_DURATION_SECONDS", "3600"))
+JIIT_SWEEP_SIZE = int(os.getenv("JIIT_SWEEP_SIZE", "500"))
+AWS_LAMBDA_FUNCTION_NAME = os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+FUNCTION_TIMEOUT_SECONDS = int(os.getenv("FUNCTION_TIMEOUT_SECONDS", "60"))
+
+# Margin of the reconciliation lease over the function timeout, covering
+# the clock skew between the invocations holding & taking over a lease
+RECONCILIATION_LEASE_MARGIN_SECONDS = 10
 
-# AWS Lambda powertool objects & class instances
-TRACER = Tracer(service=TRACER_SERVICE_NAME)
+# AWS Lambda powertool objects
 LOGGER = Logger(service=TRACER_SERVICE_NAME, level=LOG_LEVEL)
 
-py_aws_organizations = AwsOrganizations(ROOT_OU_ID)
-py_aws_identitycenter = AwsIdentityStore(IDENTITY_STORE_ID, IDENTITY_STORE_ARN)
-py_aws_rbac_resolver = RbacResolver()
+
+# Class instances, created on first use & memoized per container
+@functools.lru_cache(maxsize=None)
+def get_ddb():
+    """Return the rule store"""
+    from .lib.aws_dynamodb import DynamoDBTable
+
+    return DynamoDBTable(DDB_TABLE_NAME, hash_key=DDB_HASH_KEY, range_key=DDB_RANGE_KEY)
+
+
+@functools.lru_cache(maxsize=None)
+def get_snapshot_cache():
+    """Return the cache of organization & permission set snapshots"""
+    from .lib.snapshot_cache import (
+        SnapshotCache,
+        FileSnapshotStore,
+        DynamoDBSnapshotStore,
+    )
+
+    return SnapshotCache(
+        store=(
+            DynamoDBSnapshotStore(
+                DDB_TABLE_NAME, hash_key=DDB_HASH_KEY, range_key=DDB_RANGE_KEY
+            )
+            if SNAPSHOT_STORE == "dynamodb"
+            else FileSnapshotStore()
+        ),
+        ttl_seconds=SNAPSHOT_TTL_SECONDS,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_aws_organizations():
+    """Return the organization tree, loaded from its snapshot or crawled"""
+    from .lib.aws_organizations import AwsOrganizations
+
+    return AwsOrganizations(
+        ROOT_OU_ID,
+        max_workers=ORGANIZATIONS_MAX_WORKERS,
+        snapshot_cache=get_snapshot_cache(),
+        async_crawl=ORGANIZATIONS_ASYNC_CRAWL,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_aws_identitycenter():
+    """Return the identity store principals are looked up in"""
+    from .lib.aws_identitycentre import AwsIdentityStore
+
+    return AwsIdentityStore(
+        IDENTITY_STORE_ID,
+        IDENTITY_STORE_ARN,
+        snapshot_cache=get_snapshot_cache(),
+        listing_ttl_seconds=SNAPSHOT_TTL_SECONDS,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_permission_set_catalog():
+    """Return the catalog of permission sets"""
+    from .lib.aws_permission_sets import PermissionSetCatalog
+
+    return PermissionSetCatalog(IDENTITY_STORE_ARN, snapshot_cache=get_snapshot_cache())
+
+
+@functools.lru_cache(maxsize=None)
+def get_aws_rbac_resolver():
+    """Return the resolver of rules into assignments"""
+    from .lib.aws_sso_resolver import RbacResolver
+
+    return RbacResolver()
+
+
+@functools.lru_cache(maxsize=None)
+def get_aws_assignment_planner():
+    """Return the planner diffing desired & existing assignments"""
+    from .lib.aws_assignment_planner import AwsAssignmentPlanner
+
+    return AwsAssignmentPlanner(IDENTITY_STORE_ARN)
+
+
+@functools.lru_cache(maxsize=None)
+def get_aws_assignment_executor():
+    """Return the executor of assignment operations"""
+    from .lib.aws_assignment_executor import AwsAssignmentExecutor
+
+    return AwsAssignmentExecutor(IDENTITY_STORE_ARN)
+
+
+@functools.lru_cache(maxsize=None)
+def get_lambda_client():
+    """Return the client re-enqueuing reconciliation runs"""
+    from .lib.aws_clients import get_client
+
+    return get_client("lambda")
+
+
+def continue_reconciliation_run(run_id: str, version: int = None) -> None:
+    """
+    Re-enqueue this function asynchronously to process the next
+    slice of a reconciliation run, from the run version it follows
+    """
+    from .lib.reconciliation_runs import RECONCILIATION_EVENT_SOURCE
+
+    get_lambda_client().invoke(
+        FunctionName=AWS_LAMBDA_FUNCTION_NAME,
+        InvocationType="Event",
+        Payload=json.dumps(
+            {
+                "source": RECONCILIATION_EVENT_SOURCE,
+                "detail-type": "Reconciliation Run Continued",
+                "detail": {"run_id": run_id, "version": version},
+            }
+        ),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_reconciliation_run_store():
+    """Return the store of reconciliation run checkpoints"""
+    from .lib.reconciliation_runs import ReconciliationRunStore
+
+    return ReconciliationRunStore(
+        DDB_TABLE_NAME, hash_key=DDB_HASH_KEY, range_key=DDB_RANGE_KEY
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_reconciliation_runner():
+    """Return the runner applying assignment plans slice by slice"""
+    from .lib.reconciliation_runs import ReconciliationRunner
+
+    return ReconciliationRunner(
+        get_reconciliation_run_store(),
+        get_aws_assignment_executor(),
+        slice_size=RECONCILIATION_SLICE_SIZE,
+        continue_run=continue_reconciliation_run,
+        lease_seconds=FUNCTION_TIMEOUT_SECONDS + RECONCILIATION_LEASE_MARGIN_SECONDS,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_jiit_grant_store():
+    """Return the store of JIIT grants"""
+    from .lib.jiit_grants import JiitGrantStore
+
+    return JiitGrantStore(
+        DDB_TABLE_NAME, hash_key=DDB_HASH_KEY, range_key=DDB_RANGE_KEY
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_jiit_scheduler():
+    """Return the scheduler granting & sweeping JIIT assignments"""
+    from .lib.jiit_grants import JiitScheduler
+
+    return JiitScheduler(
+        get_jiit_grant_store(),
+        get_aws_assignment_executor(),
+        max_duration_seconds=JIIT_MAX_DURATION_SECONDS,
+        sweep_size=JIIT_SWEEP_SIZE,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_shard_coordinator():
+    """Return the coordinator fanning plans out to shard runs"""
+    from .lib.reconciliation_shards import ShardCoordinator
+
+    return ShardCoordinator(
+        get_reconciliation_run_store(),
+        dispatch_run=continue_reconciliation_run,
+        shard_count=RECONCILIATION_SHARD_COUNT,
+        strategy=RECONCILIATION_SHARD_STRATEGY,
+    )
+
+
+# Lambda Routes helpers
+def get_sso_principals(sso_assignment_rules: list) -> tuple:
+    """
+    Return the groups & users the rules refer to, looking up only the
+    referenced ones unless an implicit rule needs the full listing, which
+    is streamed page by page into the resolver's principal index
+    """
+    principal_names = get_aws_rbac_resolver().get_referenced_principal_names(
+        sso_assignment_rules
+    )
+    if principal_names is None or not IDENTITY_STORE_LAZY_LOOKUPS:
+        return (
+            get_aws_identitycenter().iter_sso_groups(),
+            get_aws_identitycenter().iter_sso_users(),
+        )
+    return (
+        get_aws_identitycenter().resolve_sso_groups(principal_names["group"]),
+        get_aws_identitycenter().resolve_sso_users(principal_names["user"]),
+    )
+
+
+def resolve_sso_assignments(
+    aws_accounts: list,
+    sso_groups,
+    sso_users,
+    permission_sets: list,
+    sso_assignment_rules: list,
+    managed_scope: set = None,
+) -> set:
+    """
+    Resolve the RBAC & ABAC rules into account assignments, crawling the
+    account tags only when an ABAC rule needs them
+    """
+    return get_aws_rbac_resolver().create_assignments_mapping(
+        aws_accounts=aws_accounts,
+        sso_groups=sso_groups,
+        sso_users=sso_users,
+        permission_sets=permission_sets,
+        assignment_rules=sso_assignment_rules,
+        organization_index=get_aws_organizations().organization_index,
+        account_tag_index=(
+            get_aws_organizations().account_tag_index
+            if any(
+                rule.get("access_type", "rbac").lower() == "abac"
+                for rule in sso_assignment_rules
+            )
+            else None
+        ),
+        managed_scope=managed_scope,
+    )
+
+
+def get_snapshot_ttl_bucket() -> int:
+    """Return the snapshot TTL period the current time falls in"""
+    return int(time.time() // max(SNAPSHOT_TTL_SECONDS, 1))
+
+
+@functools.lru_cache(maxsize=1)
+def get_rbac_resolution(ttl_bucket: int) -> tuple:
+    """
+    Return the assignments the RBAC & ABAC rules of the rule store desire,
+    with the principals & permission sets they were resolved from,
+    resolved at most once per snapshot TTL. ttl_bucket only keys the
+    memoization, a new bucket evicts the previous resolution.
+    """
+    # pylint: disable=W0613
+    active_aws_accounts = list(
+        itertools.chain(*get_aws_organizations().get_ou_account_map().values())
+    )
+    sso_assignment_rules = get_ddb().batch_query_items(
+        key="RULES", range_begins_with="RULE_"
+    )
+
+    # Principals are materialized, their names label the query results
+    aws_sso_groups, aws_sso_users = (
+        list(principals) for principals in get_sso_principals(sso_assignment_rules)
+    )
+    permission_sets = get_permission_set_catalog().list_permission_sets()
+    sso_assignments = resolve_sso_assignments(
+        active_aws_accounts,
+        aws_sso_groups,
+        aws_sso_users,
+        permission_sets,
+        sso_assignment_rules,
+    )
+    return sso_assignments, aws_sso_groups, aws_sso_users, permission_sets
+
+
+def resolve_rbac_sso_assignments() -> set:
+    """
+    Return the account assignments the RBAC & ABAC rules desire, from the
+    resolution shared with access queries for the current snapshot TTL
+    """
+    return get_rbac_resolution(get_snapshot_ttl_bucket())[0]
+
+
+@functools.lru_cache(maxsize=1)
+def get_access_query_index(ttl_bucket: int):
+    """
+    Return the index of the resolved assignments, rebuilt at most once per
+    snapshot TTL. ttl_bucket only keys the memoization, a new bucket
+    evicts the previous index. JIIT grants change within a TTL, so they
+    are read per query instead.
+    """
+    from .lib.access_query import AccessQueryIndex
+
+    (
+        sso_assignments,
+        aws_sso_groups,
+        aws_sso_users,
+        permission_sets,
+    ) = get_rbac_resolution(ttl_bucket)
+    return AccessQueryIndex(
+        sso_assignments,
+        organization_index=get_aws_organizations().organization_index,
+        permission_sets=permission_sets,
+        principal_names={
+            **{
+                ("GROUP", group["GroupId"]): group["DisplayName"]
+                for group in aws_sso_groups
+            },
+            **{("USER", user["UserId"]): user["UserName"] for user in aws_sso_users},
+        },
+        membership_index=get_aws_identitycenter().get_membership_index(),
+    )
 
 
 # Lambda Routes
-def put_rbac_sso_assignments():
+def put_rbac_sso_assignments(context: "LambdaContext") -> dict:
     """
     Lambda function route to create RBAC permission set
     Assignments.
     """
 
-    # Get active AWS accounts
-    aws_organizational_map = py_aws_organizations.describe_aws_organizational_unit()
+    # Get active AWS accounts, recrawling only once the snapshot has expired
+    aws_organizational_map = get_aws_organizations().get_ou_account_map()
     active_aws_accounts = list(itertools.chain(*aws_organizational_map.values()))
 
-    # Get SSO groups & permission sets
-    aws_sso_groups = py_aws_identitycenter.list_sso_groups()
-    permission_sets = py_aws_identitycenter.list_permission_sets()
-
     # Get SSO assignment rules
-    sso_assignment_rules = py_ddb.batch_query_items(
+    sso_assignment_rules = get_ddb().batch_query_items(
         key="RULES", range_begins_with="RULE_"
     )
 
+    # Get SSO principals & permission set names, describing only newly
+    # listed ARNs
+    aws_sso_groups, aws_sso_users = get_sso_principals(sso_assignment_rules)
+    permission_sets = get_permission_set_catalog().list_permission_sets()
+
     # Create SSO assignment
-    py_aws_rbac_resolver.create_assignments_mapping(
-        aws_accounts=active_aws_accounts,
-        sso_groups=aws_sso_groups,
-        permission_sets=permission_sets,
-        assignment_rules=sso_assignment_rules,
+    managed_scope = set()
+    sso_assignments = resolve_sso_assignments(
+        active_aws_accounts,
+        aws_sso_groups,
+        aws_sso_users,
+        permission_sets,
+        sso_assignment_rules,
+        managed_scope=managed_scope,
+    )
+
+    # Diff against the existing assignments of the managed accounts, only
+    # deleting those the rules own & leaving unexpired JIIT grants to the
+    # sweeper
+    assignment_plan = get_aws_assignment_planner().create_plan(
+        sso_assignments,
+        account_ids={aws_account["Id"] for aws_account in active_aws_accounts},
+        retained_assignments=get_jiit_grant_store().list_active_assignments(),
+        managed_scope=managed_scope,
+        prune_unmanaged=RECONCILIATION_PRUNE_UNMANAGED,
     )
+    LOGGER.info(
+        "Planned %s assignment creations & %s deletions",
+        len(assignment_plan.creates),
+        len(assignment_plan.deletes),
+    )
+
+    # Steady state, nothing to write
+    if not assignment_plan:
+        return {"status": "IN_SYNC"}
+
+    from .lib.reconciliation_runs import ReconciliationRunConflictError
 
-    # return {
-    #     "active_aws_accounts": active_aws_accounts,
-    #     "sso_groups": sso_groups,
-    #     "permission_sets": permission_sets,
-    #     "assignment_rules": assifgnment_rules,
-    # }
+    try:
+        # Coordinator mode, every shard run is drained by its own worker
+        if RECONCILIATION_SHARD_COUNT > 1:
+            return get_shard_coordinator().start(
+                assignment_plan,
+                organization_index=get_aws_organizations().organization_index,
+            )
+
+        # Apply the first slice, later slices run in re-enqueued invocations
+        reconciliation_run = get_reconciliation_runner().start(
+            assignment_plan,
+            get_remaining_time_in_millis=context.get_remaining_time_in_millis,
+        )
+    except ReconciliationRunConflictError as e:
+        # Drift left over is planned again once the runs in progress complete
+        LOGGER.info(str(e))
+        return {"status": "RUN_IN_PROGRESS"}
+    return reconciliation_run.to_summary()
+
+
+def resume_rbac_sso_assignments(
+    run_id: str, version: int, context: "LambdaContext"
+) -> dict:
+    """
+    Lambda function route to process the next slice of a
+    reconciliation run.
+    """
+    reconciliation_run = get_reconciliation_runner().resume(
+        run_id,
+        expected_version=version,
+        get_remaining_time_in_millis=context.get_remaining_time_in_millis,
+    )
+    if not reconciliation_run:
+        return {}
+
+    # Shard runs report the aggregated progress of their fan-out
+    if reconciliation_run.fanout_id and reconciliation_run.is_drained:
+        fanout_summary = get_shard_coordinator().aggregate(reconciliation_run.fanout_id)
+        LOGGER.info(
+            "Fan-out %s is %s", fanout_summary["fanout_id"], fanout_summary["status"]
+        )
+        return fanout_summary
+    return reconciliation_run.to_summary()
+
+
+def put_jiit_sso_assignment(
+    principal_type: str,
+    principal_name: str,
+    account_id: str,
+    permission_set_name: str,
+    duration_seconds: int,
+) -> dict:
+    """
+    Lambda function route to grant a time boxed assignment, provided a
+    JIIT rule of the manifest makes the principal eligible to it.
+    """
+    sso_assignment_rules = [
+        rule
+        for rule in get_ddb().batch_query_items(key="RULES", range_begins_with="RULE_")
+        if rule.get("access_type", "rbac").lower() == "jiit"
+    ]
+
+    # Resolve the eligible assignments of the requesting principal only
+    get_aws_organizations().get_ou_account_map()
+    eligible_assignments = get_aws_rbac_resolver().create_assignments_mapping(
+        aws_accounts=list(
+            itertools.chain(*get_aws_organizations().ou_account_map.values())
+        ),
+        sso_groups=(
+            get_aws_identitycenter().resolve_sso_groups({principal_name})
+            if principal_type == "group"
+            else []
+        ),
+        sso_users=(
+            get_aws_identitycenter().resolve_sso_users({principal_name})
+            if principal_type == "user"
+            else []
+        ),
+        permission_sets=get_permission_set_catalog().list_permission_sets(),
+        # Implicit rules hold name patterns, matched by the resolver against
+        # the requester only, explicit rules must name the requester
+        assignment_rules=[
+            rule
+            for rule in sso_assignment_rules
+            if rule["principal_type"].lower() == principal_type
+            and (
+                rule.get("rule_type", "explicit").lower() == "implicit"
+                or rule["principal_name"].lower() == principal_name.lower()
+            )
+        ],
+        organization_index=get_aws_organizations().organization_index,
+        access_types=("jiit",),
+    )
+
+    # The requested assignment must be one of the eligible ones
+    permission_set_arn = (
+        get_permission_set_catalog()
+        .get_permission_set_arns()
+        .get(permission_set_name.lower())
+    )
+    requested_assignment = next(
+        (
+            assignment
+            for assignment in eligible_assignments
+            if assignment.account_id == account_id
+            and assignment.permission_set_arn == permission_set_arn
+        ),
+        None,
+    )
+    if requested_assignment is None:
+        return {"status": "NOT_ELIGIBLE"}
+
+    # Assignments desired by RBAC or created manually are never granted,
+    # their expiry would revoke them. The RBAC assignments are resolved
+    # once per snapshot TTL, not per request
+    held_assignments = resolve_rbac_sso_assignments() | set(
+        get_aws_assignment_planner().list_assignments(account_id, permission_set_arn)
+    )
+    jiit_grant = get_jiit_scheduler().grant(
+        requested_assignment, duration_seconds, held_assignments=held_assignments
+    )
+    if jiit_grant is None:
+        return {"status": "ALREADY_ASSIGNED"}
+    return {"status": "GRANTED", "expires_at": jiit_grant.expires_at}
+
+
+def post_jiit_grant() -> dict:
+    """
+    API route to request a JIIT grant. The grantee is the IAM Identity
+    Center user whose credentials signed the request, or one of its
+    groups named by group_name.
+    """
+    from aws_lambda_powertools.event_handler.exceptions import (
+        BadRequestError,
+        ServiceError,
+    )
+    from .lib.jiit_grants import parse_grant_request, get_sso_user_name
+
+    api_event = get_api_resolver().current_event
+    user_name = get_sso_user_name(api_event.request_context.identity.user_arn)
+    if not user_name:
+        raise ServiceError(
+            HTTPStatus.FORBIDDEN.value,
+            "Grants must be requested with IAM Identity Center credentials",
+        )
+    try:
+        grant_request = parse_grant_request(api_event.json_body)
+    except ValueError as e:
+        raise BadRequestError(str(e)) from e
+
+    # Group grants require a live membership of the requester
+    principal_type, principal_name = "user", user_name
+    if grant_request["group_name"]:
+        user_id = get_aws_identitycenter().get_user_id(user_name)
+        group_id = get_aws_identitycenter().get_group_id(grant_request["group_name"])
+        if user_id:
+            get_aws_identitycenter().refresh_user_memberships({user_id})
+        if not (
+            user_id
+            and group_id
+            in get_aws_identitycenter().get_membership_index().get_group_ids(user_id)
+        ):
+            raise ServiceError(
+                HTTPStatus.FORBIDDEN.value,
+                f"{user_name} is not a member of {grant_request['group_name']}",
+            )
+        principal_type, principal_name = "group", grant_request["group_name"]
+
+    return put_jiit_sso_assignment(
+        principal_type,
+        principal_name,
+        grant_request["account_id"],
+        grant_request["permission_set_name"],
+        grant_request["duration_seconds"],
+    )
+
+
+def delete_expired_jiit_sso_assignments(context: "LambdaContext") -> dict:
+    """
+    Lambda function route to revoke the expired JIIT grants.
+    """
+    return get_jiit_scheduler().sweep(
+        get_remaining_time_in_millis=context.get_remaining_time_in_millis,
+        get_retained_assignments=resolve_rbac_sso_assignments,
+    )
+
+
+def get_sso_access() -> dict:
+    """
+    API route to answer an effective access query, such as who holds a
+    permission set on an account, from the in-memory index of the
+    resolved assignments & the active JIIT grants.
+    """
+    from aws_lambda_powertools.event_handler.exceptions import BadRequestError
+    from .lib.access_query import parse_access_query
+
+    try:
+        access_query = parse_access_query(
+            get_api_resolver().current_event.query_string_parameters
+        )
+    except ValueError as e:
+        raise BadRequestError(str(e)) from e
+
+    access_query_index = get_access_query_index(get_snapshot_ttl_bucket())
+
+    # Principals absent from the rules, such as users granted access only
+    # through their groups, are looked up by name
+    principal_type = access_query.get("principal_type")
+    principal = access_query.get("principal")
+    if principal:
+        principal_id = (
+            get_aws_identitycenter().get_user_id(principal)
+            if principal_type == "USER"
+            else get_aws_identitycenter().get_group_id(principal)
+        )
+        access_query = {**access_query, "principal": principal_id or principal}
+    return {
+        "assignments": access_query_index.query(
+            **access_query,
+            extra_assignments=get_jiit_grant_store().list_active_assignments(),
+        )
+    }
 
 
 # Lambda handler
-@TRACER.capture_lambda_handler
-@event_source(data_class=EventBridgeEvent)  # pylint: disable=E1120
-@LOGGER.inject_lambda_context(
-    log_event=True,
-    correlation_id_path=correlation_paths.EVENT_BRIDGE,
-)
-def lambda_handler(event: EventBridgeEvent, context: LambdaContext):
+@functools.lru_cache(maxsize=None)
+def get_tracer():
+    """
+    Return the powertools tracer, created on the first invocation since
+    importing the X-Ray SDK alone outweighs the rest of the module
+    """
+    from aws_lambda_powertools import Tracer
+
+    return Tracer(service=TRACER_SERVICE_NAME)
+
+
+@functools.lru_cache(maxsize=None)
+def get_api_resolver():
+    """
+    Return the resolver routing API Gateway requests to their API routes
+    """
+    from aws_lambda_powertools.event_handler import APIGatewayRestResolver
+
+    api_resolver = APIGatewayRestResolver()
+    api_resolver.get("/")(lambda: {"status": "HEALTHY"})
+    api_resolver.get("/access")(get_sso_access)
+    api_resolver.post("/jiit/grants")(post_jiit_grant)
+    return api_resolver
+
+
+@functools.lru_cache(maxsize=None)
+def get_api_handler() -> Callable[[dict, "LambdaContext"], dict]:
+    """
+    Return the API resolver wrapped in the powertools tracer & logger
+    decorators
+    """
+    from aws_lambda_powertools.logging import correlation_paths
+
+    return get_tracer().capture_lambda_handler(
+        LOGGER.inject_lambda_context(
+            get_api_resolver().resolve,
+            correlation_id_path=correlation_paths.API_GATEWAY_REST,
+        )
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_event_handler() -> Callable[[dict, "LambdaContext"], dict]:
+    """
+    Return the event handler wrapped in the powertools tracer, event source
+    & logger decorators
+    """
+    from aws_lambda_powertools.logging import correlation_paths
+    from aws_lambda_powertools.utilities.data_classes import (
+        EventBridgeEvent,
+        event_source,
+    )
+
+    return get_tracer().capture_lambda_handler(
+        event_source(data_class=EventBridgeEvent)(  # pylint: disable=E1120
+            LOGGER.inject_lambda_context(
+                handle_event,
+                log_event=True,
+                correlation_id_path=correlation_paths.EVENT_BRIDGE,
+            )
+        )
+    )
+
+
+def lambda_handler(event: dict, context: "LambdaContext"):
     """
     Function to create or retrieve regex rules for SSO permission
     set assignments
@@ -96,9 +724,48 @@ def lambda_handler(event: EventBridgeEvent, context: LambdaContext):
         - body: contains stringified response of lambda function
         - statusCode: contains HTTP status code
     """
+    # API Gateway requests carry their HTTP method, events their source
+    if "httpMethod" in event:
+        return get_api_handler()(event, context)
+    return get_event_handler()(event, context)
+
+
+def handle_event(event: "EventBridgeEvent", context: "LambdaContext"):
+    """
+    Function to route an EventBridge event to its Lambda function route
+    """
+    from aws_lambda_powertools.event_handler import Response, content_types
+    from .lib.aws_organizations import ORGANIZATIONS_EVENT_SOURCE
+    from .lib.aws_identitycentre import IDENTITY_STORE_EVENT_SOURCES
+    from .lib.reconciliation_runs import RECONCILIATION_EVENT_SOURCE
+    from .lib.jiit_grants import JIIT_EVENT_SOURCE
+
+    # Patch the cached organization tree with account & OU changes
+    if event.source == ORGANIZATIONS_EVENT_SOURCE:
+        is_applied = get_aws_organizations().apply_event(event.detail)
+        LOGGER.info(
+            "Organizations event applied %s",
+            "incrementally" if is_applied else "through a full resync",
+        )
+
+    # Refresh the memberships of a user, sweep JIIT grants, continue an
+    # unfinished reconciliation run, or start a new one. Memberships
+    # never change the resolved assignments.
+    if event.source in IDENTITY_STORE_EVENT_SOURCES:
+        is_applied = get_aws_identitycenter().apply_membership_event(event.detail)
+        response_body = {"status": "APPLIED" if is_applied else "RESYNCED"}
+    elif event.source == JIIT_EVENT_SOURCE:
+        response_body = delete_expired_jiit_sso_assignments(context)
+    elif event.source == RECONCILIATION_EVENT_SOURCE:
+        response_body = resume_rbac_sso_assignments(
+            event.detail["run_id"], event.detail.get("version"), context
+        )
+    else:
+        response_body = put_rbac_sso_assignments(context)
+
     # return
     return Response(
         status_code=HTTPStatus.OK.value,
         content_type=content_types.APPLICATION_JSON,
-        body=put_rbac_sso_assignments(),
+        body=json.dumps(response_body),
     )
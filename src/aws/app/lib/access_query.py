@@ -0,0 +1,306 @@
+"""
+Module to answer effective access questions, such as who holds a
+permission set on an account or what a group can do within an OU, from
+an in-memory index of the resolved assignments
+"""
+from .organization_index import OrganizationIndex
+from .membership_index import MembershipIndex
+
+# Query string parameters of an access query, all optional
+ACCESS_QUERY_PARAMETERS = (
+    "account",
+    "ou",
+    "principal_type",
+    "principal",
+    "permission_set",
+    "effective",
+)
+
+
+def parse_access_query(query_parameters: dict) -> dict:
+    """
+    Validate the query string parameters of an access query, raising
+    ValueError naming every unknown or invalid parameter
+
+    Returns
+    -------
+    dict:
+        Keyword arguments of AccessQueryIndex.query
+    """
+    query_parameters = query_parameters or {}
+    errors = [
+        f"{parameter} is not an access query parameter"
+        for parameter in sorted(set(query_parameters) - set(ACCESS_QUERY_PARAMETERS))
+    ]
+    access_query = {
+        parameter: value
+        for parameter, value in query_parameters.items()
+        if parameter in ACCESS_QUERY_PARAMETERS and parameter != "effective"
+    }
+    for parameter, value in access_query.items():
+        if not (isinstance(value, str) and value):
+            errors.append(f"{parameter} must be a non empty string")
+    if "principal_type" in access_query:
+        access_query["principal_type"] = str(access_query["principal_type"]).upper()
+        if access_query["principal_type"] not in ("USER", "GROUP"):
+            errors.append("principal_type must be USER or GROUP")
+    if "principal" in access_query and "principal_type" not in access_query:
+        errors.append("principal_type is required to query a principal")
+    if "effective" in query_parameters:
+        effective = str(query_parameters["effective"]).lower()
+        if effective not in ("true", "false"):
+            errors.append("effective must be true or false")
+        access_query["effective"] = effective == "true"
+
+    if errors:
+        raise ValueError("Invalid access query: " + ", ".join(errors))
+    return access_query
+
+
+class AccessQueryIndex:
+    """
+    Index of account assignments by account, principal & permission set.
+    A query intersects the assignment sets of its filters, smallest first,
+    so it costs O(matching assignments) rather than a ListAccountAssignments
+    call per account.
+    """
+
+    def __init__(
+        self,
+        assignments,
+        organization_index: OrganizationIndex,
+        permission_sets: list,
+        principal_names: dict,
+        membership_index: MembershipIndex = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - assignments: iterable, required
+                AccountAssignment tuples to index
+            - organization_index: OrganizationIndex, required
+                Index of the organization accounts & OUs are looked up in
+            - permission_sets: list, required
+                Permission sets ({"Name", "PermissionSetArn"})
+            - principal_names: dict, required
+                Mapping of (principal type, principal ID) to principal name
+            - membership_index: MembershipIndex, optional
+                Group memberships, expanding user queries to the groups of
+                the user and group assignments to their members
+        """
+        self._organization_index = organization_index
+        self._membership_index = membership_index
+        self._principal_names = principal_names
+
+        self._permission_set_names = {
+            permission_set["PermissionSetArn"]: permission_set["Name"]
+            for permission_set in permission_sets
+        }
+        self._permission_set_arns_by_name = {
+            permission_set["Name"].lower(): permission_set["PermissionSetArn"]
+            for permission_set in permission_sets
+        }
+        self._principal_ids_by_name = {}
+        for (principal_type, principal_id), principal_name in principal_names.items():
+            self._principal_ids_by_name.setdefault(
+                (principal_type, principal_name.lower()), set()
+            ).add(principal_id)
+
+        self.assignments = frozenset(assignments)
+        self._assignments_by_account = {}
+        self._assignments_by_principal = {}
+        self._assignments_by_permission_set = {}
+        for assignment in self.assignments:
+            self._assignments_by_account.setdefault(assignment.account_id, set()).add(
+                assignment
+            )
+            self._assignments_by_principal.setdefault(
+                (assignment.principal_type, assignment.principal_id), set()
+            ).add(assignment)
+            self._assignments_by_permission_set.setdefault(
+                assignment.permission_set_arn, set()
+            ).add(assignment)
+
+    def query(
+        self,
+        account: str = None,
+        ou: str = None,
+        principal_type: str = None,
+        principal: str = None,
+        permission_set: str = None,
+        effective: bool = True,
+        extra_assignments=None,
+    ) -> list:
+        """
+        Return the assignments matching every given filter
+
+        Parameters
+        ----------
+            - account: str, optional
+                Account ID or name
+            - ou: str, optional
+                OU ID or name, matching the accounts of its whole subtree
+            - principal_type: str, optional
+                "USER" or "GROUP", required by principal
+            - principal: str, optional
+                Principal ID or name
+            - permission_set: str, optional
+                Permission set name or ARN
+            - effective: bool, optional
+                Whether a user also matches the assignments of its groups
+            - extra_assignments: iterable, optional
+                Short lived assignments matched on top of the indexed ones
+                without being indexed, such as the active JIIT grants
+
+        Returns
+        -------
+        list:
+            Sorted assignment details, group details list the IDs of the
+            member users when memberships are indexed
+        """
+        if principal and not principal_type:
+            raise ValueError("principal_type is required to query a principal")
+
+        # Filters as the key each assignment is matched on, the index of
+        # that key if any & the accepted keys
+        filters = []
+        if account:
+            filters.append(
+                (
+                    lambda assignment: assignment.account_id,
+                    self._assignments_by_account,
+                    self._organization_index.get_account_ids(account),
+                )
+            )
+        if ou:
+            filters.append(
+                (
+                    lambda assignment: assignment.account_id,
+                    self._assignments_by_account,
+                    {
+                        account_id
+                        for ou_id in self._organization_index.get_ou_ids(ou)
+                        for account_id in self._organization_index.get_ou_account_ids(
+                            ou_id, nested=True
+                        )
+                    },
+                )
+            )
+        if principal:
+            filters.append(
+                (
+                    lambda assignment: (
+                        assignment.principal_type,
+                        assignment.principal_id,
+                    ),
+                    self._assignments_by_principal,
+                    self._get_principal_keys(
+                        principal_type.upper(), principal, effective
+                    ),
+                )
+            )
+        elif principal_type:
+            filters.append(
+                (
+                    lambda assignment: assignment.principal_type,
+                    None,
+                    {principal_type.upper()},
+                )
+            )
+        if permission_set:
+            filters.append(
+                (
+                    lambda assignment: assignment.permission_set_arn,
+                    self._assignments_by_permission_set,
+                    {
+                        self._permission_set_arns_by_name.get(
+                            permission_set.lower(), permission_set
+                        )
+                    },
+                )
+            )
+
+        # Intersect from the smallest set, so each step only shrinks it
+        assignment_sets = [
+            (
+                self._get_assignments(assignment_index, keys)
+                if assignment_index is not None
+                else {
+                    assignment
+                    for assignment in self.assignments
+                    if get_key(assignment) in keys
+                }
+            )
+            for get_key, assignment_index, keys in filters
+        ]
+        assignments = self.assignments
+        for assignment_set in sorted(assignment_sets, key=len):
+            assignments = assignments & assignment_set
+            if not assignments:
+                break
+
+        # Extra assignments are few, they are filtered one by one
+        assignments = assignments | {
+            assignment
+            for assignment in extra_assignments or ()
+            if all(get_key(assignment) in keys for get_key, _, keys in filters)
+        }
+        return [
+            self._describe(assignment)
+            for assignment in sorted(
+                assignments,
+                key=lambda assignment: (
+                    assignment.account_id,
+                    self._permission_set_names.get(assignment.permission_set_arn, ""),
+                    assignment.principal_type,
+                    assignment.principal_id,
+                ),
+            )
+        ]
+
+    def _get_principal_keys(
+        self, principal_type: str, principal: str, effective: bool
+    ) -> set:
+        """
+        Return the (principal type, principal ID) keys a principal ID or
+        name matches, with the groups of matching users when effective
+        """
+        principal_ids = self._principal_ids_by_name.get(
+            (principal_type, principal.lower()), {principal}
+        )
+        principal_keys = {
+            (principal_type, principal_id) for principal_id in principal_ids
+        }
+        if effective and principal_type == "USER" and self._membership_index:
+            principal_keys.update(
+                ("GROUP", group_id)
+                for principal_id in principal_ids
+                for group_id in self._membership_index.get_group_ids(principal_id)
+            )
+        return principal_keys
+
+    @staticmethod
+    def _get_assignments(assignment_index: dict, keys) -> set:
+        return set().union(*(assignment_index.get(key, ()) for key in keys))
+
+    def _describe(self, assignment) -> dict:
+        assignment_details = {
+            "account_id": assignment.account_id,
+            "account_name": self._organization_index.account_names.get(
+                assignment.account_id
+            ),
+            "permission_set_arn": assignment.permission_set_arn,
+            "permission_set_name": self._permission_set_names.get(
+                assignment.permission_set_arn
+            ),
+            "principal_type": assignment.principal_type,
+            "principal_id": assignment.principal_id,
+            "principal_name": self._principal_names.get(
+                (assignment.principal_type, assignment.principal_id)
+            ),
+        }
+        if assignment.principal_type == "GROUP" and self._membership_index:
+            assignment_details["member_user_ids"] = sorted(
+                self._membership_index.get_user_ids(assignment.principal_id)
+            )
+        return assignment_details
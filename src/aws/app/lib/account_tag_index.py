@@ -0,0 +1,65 @@
+"""
+Module to index the tags of AWS accounts for attribute based (ABAC)
+target selection
+"""
+
+
+class AccountTagIndex:
+    """
+    Inverted index of account tags. Every (key, value) pair maps to the
+    set of accounts carrying it, so a tag predicate is evaluated with set
+    unions & intersections instead of a lookup per account.
+    """
+
+    def __init__(self, account_tags: dict) -> None:
+        """
+        Parameters
+        ----------
+            - account_tags: dict, required
+                Mapping of account ID to its {tag key: tag value} mapping
+        """
+        self._account_ids_by_tag = {}
+        for account_id, tags in account_tags.items():
+            for tag in tags.items():
+                self._account_ids_by_tag.setdefault(tag, set()).add(account_id)
+
+    def get_account_ids(self, tag_predicate: dict) -> set:
+        """
+        Return the IDs of the accounts matching a tag predicate
+
+        Parameters
+        ----------
+            - tag_predicate: dict, required
+                Mapping of tag key to a value or list of values. An account
+                matches when, for every key, it carries one of the values.
+
+        Returns
+        -------
+        set:
+            IDs of the matching accounts, empty for an empty predicate
+        """
+        account_ids = None
+        # Evaluate the most selective keys first to shrink the intersection
+        key_account_ids = sorted(
+            (
+                set().union(
+                    *(
+                        self._account_ids_by_tag.get((tag_key, tag_value), ())
+                        for tag_value in (
+                            tag_values if isinstance(tag_values, list) else [tag_values]
+                        )
+                    )
+                )
+                for tag_key, tag_values in tag_predicate.items()
+            ),
+            key=len,
+        )
+        for matching_account_ids in key_account_ids:
+            account_ids = (
+                matching_account_ids
+                if account_ids is None
+                else account_ids & matching_account_ids
+            )
+            if not account_ids:
+                break
+        return account_ids or set()
@@ -0,0 +1,441 @@
+"""
+Module to execute assignment plans against the rate limited, asynchronous
+IAM Identity Center account assignment APIs
+"""
+import time
+import random
+import logging
+import threading
+import dataclasses
+import concurrent.futures
+import boto3
+import botocore.exceptions
+from .aws_clients import get_client
+from .aws_sso_resolver import AccountAssignment
+from .aws_assignment_planner import AssignmentPlan
+
+LOGGER = logging.getLogger(__name__)
+
+# Error codes the SSO admin APIs throttle requests with
+THROTTLING_ERROR_CODES = ("ThrottlingException", "TooManyRequestsException")
+
+# Terminal statuses of asynchronous assignment operations
+SUCCEEDED_STATUS = "SUCCEEDED"
+FAILED_STATUS = "FAILED"
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket rate limiter with additive increase,
+    multiplicative decrease (AIMD) rate adaptation on throttling.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, min_rate: float = 1.0):
+        """
+        Parameters
+        ----------
+            - rate: float, required
+                Maximum sustained requests per second
+            - capacity: float, optional
+                Maximum burst size, defaults to one second worth of tokens
+            - min_rate: float, optional
+                Floor the rate is never decreased below
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self._min_rate = min(min_rate, rate)
+        self._capacity = capacity if capacity else rate
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def acquire(self) -> None:
+        """Block until a token is available and consume it"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+    def penalize(self) -> None:
+        """Halve the rate after a throttled request"""
+        with self._lock:
+            self.rate = max(self._min_rate, self.rate / 2)
+
+    def reward(self) -> None:
+        """Recover the rate additively after a successful request"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+@dataclasses.dataclass
+class AssignmentOperation:
+    """
+    Create or delete of a single account assignment
+
+        - action: str, "create" or "delete"
+        - assignment: AccountAssignment, assignment to create or delete
+    """
+
+    action: str
+    assignment: AccountAssignment
+
+    @property
+    def operation_id(self) -> str:
+        """Deterministic ID, stable across invocations of the same plan"""
+        return "#".join((self.action, *self.assignment))
+
+
+@dataclasses.dataclass
+class ExecutionResult:
+    """
+    Outcome of executing (a slice of) an assignment plan
+
+        - succeeded: list, IDs of the operations that completed
+        - failed: dict, operation ID to failure reason
+        - pending: int, operations left over when the deadline was reached,
+          including the unsettled ones
+        - unsettled: list, IDs of the submitted operations still in
+          progress when polling gave up, to be retried
+    """
+
+    succeeded: list = dataclasses.field(default_factory=list)
+    failed: dict = dataclasses.field(default_factory=dict)
+    pending: int = 0
+    unsettled: list = dataclasses.field(default_factory=list)
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether every operation of the plan settled"""
+        return self.pending == 0
+
+
+class AwsAssignmentExecutor:
+    """
+    Rate limited, concurrent executor of account assignment operations
+    """
+
+    def __init__(
+        self,
+        identity_store_arn: str,
+        sso_admin_client: boto3.client = None,
+        max_requests_per_second: float = 10,
+        batch_size: int = 50,
+        max_workers: int = 8,
+        max_retries: int = 8,
+        backoff_seconds: float = 0.5,
+        poll_interval_seconds: float = 1.0,
+        max_polls: int = 30,
+    ) -> None:
+        """
+        Default constructor method to initialize the SSO admin client
+        and the rate limiter shared by submissions and status polls.
+
+        Parameters
+        ----------
+            - identity_store_arn: str, required
+                ARN of the IAM Identity Center instance
+            - sso_admin_client: boto3.client, optional
+                SSO admin client, by default a shared client without
+                botocore retries, which would hide throttling from the
+                rate limiter
+            - max_requests_per_second: float, optional
+                Ceiling of the adaptive request rate
+            - batch_size: int, optional
+                Operations submitted and polled together between checkpoints
+            - max_workers: int, optional
+                Ceiling of concurrent SSO admin API calls
+            - max_retries: int, optional
+                Attempts of a throttled request before it is failed
+            - backoff_seconds: float, optional
+                Base of the exponential, jittered retry backoff
+            - poll_interval_seconds: float, optional
+                Delay between status polls of in progress operations
+            - max_polls: int, optional
+                Status polls of a batch before its in progress operations
+                are given up on as unsettled
+        """
+        self._identity_store_arn = identity_store_arn
+        self._sso_admin_client = (
+            sso_admin_client
+            if sso_admin_client
+            else get_client(
+                "sso-admin", max_pool_connections=max_workers, max_attempts=1
+            )
+        )
+        self._batch_size = batch_size
+        self._max_workers = max_workers
+        self._max_retries = max_retries
+        self._backoff_seconds = backoff_seconds
+        self._poll_interval_seconds = poll_interval_seconds
+        self._max_polls = max_polls
+        self.rate_limiter = TokenBucket(max_requests_per_second)
+
+    def execute(
+        self,
+        assignment_plan: AssignmentPlan,
+        completed_operation_ids: set = None,
+        checkpoint=None,
+        get_remaining_time_in_millis=None,
+        reserved_time_in_millis: int = 10000,
+    ) -> ExecutionResult:
+        """
+        Execute an assignment plan batch by batch, creations first.
+
+        Parameters
+        ----------
+            - assignment_plan: AssignmentPlan, required
+                Plan to execute
+            - completed_operation_ids: set, optional
+                Operations completed by an earlier, interrupted run
+            - checkpoint: callable, optional
+                Called with the ExecutionResult after every batch
+            - get_remaining_time_in_millis: callable, optional
+                Remaining invocation time, typically from the Lambda context
+            - reserved_time_in_millis: int, optional
+                Time kept in reserve to checkpoint before the timeout
+
+        Returns
+        -------
+        ExecutionResult:
+            Completed, failed & pending operations
+        """
+        completed_operation_ids = completed_operation_ids or set()
+        return self.execute_operations(
+            [
+                operation
+                for operation in iter_plan_operations(assignment_plan)
+                if operation.operation_id not in completed_operation_ids
+            ],
+            checkpoint=checkpoint,
+            get_remaining_time_in_millis=get_remaining_time_in_millis,
+            reserved_time_in_millis=reserved_time_in_millis,
+        )
+
+    def execute_operations(
+        self,
+        operations: list,
+        checkpoint=None,
+        get_remaining_time_in_millis=None,
+        reserved_time_in_millis: int = 10000,
+    ) -> ExecutionResult:
+        """
+        Execute assignment operations in order, batch by batch, stopping
+        before the deadline. Every batch settles before the next one is
+        submitted, so the operations attempted are always a prefix of
+        the given list. A batch still in progress once its polls or the
+        deadline run out leaves its unsettled operations to be retried
+        and stops the execution.
+
+        Parameters
+        ----------
+            - operations: list, required
+                AssignmentOperation instances to execute
+            - checkpoint: callable, optional
+                Called with the ExecutionResult after every batch
+            - get_remaining_time_in_millis: callable, optional
+                Remaining invocation time, typically from the Lambda context
+            - reserved_time_in_millis: int, optional
+                Time kept in reserve to checkpoint before the timeout
+
+        Returns
+        -------
+        ExecutionResult:
+            Completed, failed & pending operations
+        """
+        execution_result = ExecutionResult(pending=len(operations))
+        for batch_start in range(0, len(operations), self._batch_size):
+            if (
+                get_remaining_time_in_millis
+                and get_remaining_time_in_millis() < reserved_time_in_millis
+            ):
+                LOGGER.info(
+                    "Deadline reached with %s operations pending",
+                    execution_result.pending,
+                )
+                break
+
+            batch = operations[batch_start : batch_start + self._batch_size]
+            self._execute_batch(
+                batch,
+                execution_result,
+                get_remaining_time_in_millis,
+                reserved_time_in_millis,
+            )
+            execution_result.pending -= len(batch) - len(execution_result.unsettled)
+            if checkpoint:
+                checkpoint(execution_result)
+            if execution_result.unsettled:
+                LOGGER.info(
+                    "Stopped with %s operations unsettled & %s pending",
+                    len(execution_result.unsettled),
+                    execution_result.pending,
+                )
+                break
+        return execution_result
+
+    def _execute_batch(
+        self,
+        batch: list,
+        execution_result: ExecutionResult,
+        get_remaining_time_in_millis=None,
+        reserved_time_in_millis: int = 10000,
+    ) -> None:
+        """
+        Submit a batch of operations concurrently, then poll their
+        statuses concurrently until every operation has settled, the
+        polls are exhausted or the deadline is reached.
+        """
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers
+        ) as executor:
+            submissions = list(executor.map(self._submit, batch))
+
+            in_progress = {}
+            for operation, (request_id, failure_reason) in zip(batch, submissions):
+                if failure_reason:
+                    execution_result.failed[operation.operation_id] = failure_reason
+                elif request_id is None:
+                    execution_result.succeeded.append(operation.operation_id)
+                else:
+                    in_progress[request_id] = operation
+
+            poll_count = 0
+            while in_progress:
+                statuses = list(
+                    executor.map(self._poll, in_progress.values(), in_progress)
+                )
+                for request_id, (status, failure_reason) in zip(
+                    list(in_progress), statuses
+                ):
+                    operation_id = in_progress[request_id].operation_id
+                    if status == SUCCEEDED_STATUS:
+                        execution_result.succeeded.append(operation_id)
+                        del in_progress[request_id]
+                    elif status == FAILED_STATUS:
+                        execution_result.failed[operation_id] = failure_reason
+                        del in_progress[request_id]
+
+                poll_count += 1
+                if not in_progress:
+                    break
+                if poll_count >= self._max_polls or (
+                    get_remaining_time_in_millis
+                    and get_remaining_time_in_millis() < reserved_time_in_millis
+                ):
+                    execution_result.unsettled.extend(
+                        operation.operation_id for operation in in_progress.values()
+                    )
+                    break
+                time.sleep(self._poll_interval_seconds)
+
+    def _call(self, operation, **kwargs) -> dict:
+        """
+        Call an SSO admin API under the rate limiter, retrying throttled
+        requests with exponential, jittered backoff.
+        """
+        for attempt in range(self._max_retries):
+            self.rate_limiter.acquire()
+            try:
+                response = operation(**kwargs)
+            except botocore.exceptions.ClientError as e:
+                if e.response["Error"]["Code"] not in THROTTLING_ERROR_CODES:
+                    raise
+                self.rate_limiter.penalize()
+                time.sleep(random.uniform(0, self._backoff_seconds * 2**attempt))
+            else:
+                self.rate_limiter.reward()
+                return response
+        raise RuntimeError(
+            f"Request still throttled after {self._max_retries} attempts"
+        )
+
+    def _submit(self, operation: AssignmentOperation) -> tuple:
+        """
+        Submit an operation, returning its request ID or failure reason.
+        """
+        if operation.action == "create":
+            request, status_key = (
+                self._sso_admin_client.create_account_assignment,
+                "AccountAssignmentCreationStatus",
+            )
+        else:
+            request, status_key = (
+                self._sso_admin_client.delete_account_assignment,
+                "AccountAssignmentDeletionStatus",
+            )
+
+        try:
+            operation_status = self._call(
+                request,
+                InstanceArn=self._identity_store_arn,
+                TargetId=operation.assignment.account_id,
+                TargetType="AWS_ACCOUNT",
+                PermissionSetArn=operation.assignment.permission_set_arn,
+                PrincipalType=operation.assignment.principal_type,
+                PrincipalId=operation.assignment.principal_id,
+            )[status_key]
+        except botocore.exceptions.ClientError as e:
+            # A retried delete whose assignment is already gone is done
+            if (
+                operation.action == "delete"
+                and e.response["Error"]["Code"] == "ResourceNotFoundException"
+            ):
+                return None, None
+            return None, str(e)
+        except RuntimeError as e:
+            return None, str(e)
+
+        if operation_status["Status"] == FAILED_STATUS:
+            return None, operation_status.get("FailureReason", "")
+        if operation_status["Status"] == SUCCEEDED_STATUS:
+            return None, None
+        return operation_status["RequestId"], None
+
+    def _poll(self, operation: AssignmentOperation, request_id: str) -> tuple:
+        """
+        Poll the status of a submitted operation.
+        """
+        if operation.action == "create":
+            request, status_key, request_id_key = (
+                self._sso_admin_client.describe_account_assignment_creation_status,
+                "AccountAssignmentCreationStatus",
+                "AccountAssignmentCreationRequestId",
+            )
+        else:
+            request, status_key, request_id_key = (
+                self._sso_admin_client.describe_account_assignment_deletion_status,
+                "AccountAssignmentDeletionStatus",
+                "AccountAssignmentDeletionRequestId",
+            )
+
+        try:
+            operation_status = self._call(
+                request,
+                InstanceArn=self._identity_store_arn,
+                **{request_id_key: request_id},
+            )[status_key]
+        except (botocore.exceptions.ClientError, RuntimeError) as e:
+            return FAILED_STATUS, str(e)
+        return operation_status["Status"], operation_status.get("FailureReason", "")
+
+
+def iter_plan_operations(assignment_plan: AssignmentPlan):
+    """
+    Yield the operations of a plan, creations before deletions so that
+    principals moved between permission sets never lose access
+    """
+    for assignment in assignment_plan.creates:
+        yield AssignmentOperation("create", assignment)
+    for assignment in assignment_plan.deletes:
+        yield AssignmentOperation("delete", assignment)
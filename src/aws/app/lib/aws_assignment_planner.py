@@ -0,0 +1,227 @@
+"""
+Module to plan the account assignment changes needed to reconcile the
+resolved manifest with the assignments IAM Identity Center already has
+"""
+import itertools
+import dataclasses
+import concurrent.futures
+import boto3
+from .aws_clients import get_client
+from .aws_sso_resolver import AccountAssignment
+
+# Default ceiling of concurrent SSO admin API calls
+DEFAULT_MAX_WORKERS = 8
+
+
+@dataclasses.dataclass
+class AssignmentPlan:
+    """
+    Minimal set of assignment operations that reconciles Identity Center
+
+        - creates: list, assignments missing from Identity Center
+        - deletes: list, assignments no longer described by the manifest
+    """
+
+    creates: list = dataclasses.field(default_factory=list)
+    deletes: list = dataclasses.field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.creates) + len(self.deletes)
+
+    def to_dict(self) -> dict:
+        """Serialize the plan into a JSON compatible dictionary"""
+        return {
+            "creates": [assignment._asdict() for assignment in self.creates],
+            "deletes": [assignment._asdict() for assignment in self.deletes],
+        }
+
+    @classmethod
+    def from_dict(cls, plan: dict) -> "AssignmentPlan":
+        """Deserialize a plan previously produced by to_dict"""
+        return cls(
+            creates=[AccountAssignment(**assignment) for assignment in plan["creates"]],
+            deletes=[AccountAssignment(**assignment) for assignment in plan["deletes"]],
+        )
+
+
+class AwsAssignmentPlanner:
+    """
+    Diff of the desired account assignments against those Identity Center holds
+    """
+
+    def __init__(
+        self,
+        identity_store_arn: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        sso_admin_client: boto3.client = None,
+    ) -> None:
+        """
+        Default constructor method to initialize the SSO admin client
+        and its paginators.
+
+        Parameters
+        ----------
+            - identity_store_arn: str, required
+                ARN of the IAM Identity Center instance
+            - max_workers: int, optional
+                Ceiling of concurrent SSO admin API calls
+            - sso_admin_client: boto3.client, optional
+                SSO admin client, the shared client if omitted
+        """
+        self._identity_store_arn = identity_store_arn
+        self._max_workers = max_workers
+
+        self._sso_admin_client = (
+            sso_admin_client
+            if sso_admin_client
+            else get_client("sso-admin", max_pool_connections=max_workers)
+        )
+        self._permission_sets_paginator = self._sso_admin_client.get_paginator(
+            "list_permission_sets"
+        )
+        self._provisioned_accounts_paginator = self._sso_admin_client.get_paginator(
+            "list_accounts_for_provisioned_permission_set"
+        )
+        self._account_assignments_paginator = self._sso_admin_client.get_paginator(
+            "list_account_assignments"
+        )
+
+    def list_account_assignments(self, account_ids: set = None) -> set:
+        """
+        Bulk read the existing account assignments of every provisioned
+        permission set, fanning out over (account, permission set) pairs.
+
+        Parameters
+        ----------
+            - account_ids: set, optional
+                Restrict the read to these accounts
+
+        Returns
+        -------
+        set:
+            Set of AccountAssignment tuples
+        """
+        permission_sets_iterator = self._permission_sets_paginator.paginate(
+            InstanceArn=self._identity_store_arn
+        )
+        permission_set_arns = list(
+            itertools.chain.from_iterable(
+                (page["PermissionSets"] for page in permission_sets_iterator)
+            )
+        )
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers
+        ) as executor:
+            provisioned_account_ids = executor.map(
+                self._list_provisioned_account_ids, permission_set_arns
+            )
+            account_permission_sets = [
+                (account_id, permission_set_arn)
+                for permission_set_arn, permission_set_account_ids in zip(
+                    permission_set_arns, provisioned_account_ids
+                )
+                for account_id in permission_set_account_ids
+                if account_ids is None or account_id in account_ids
+            ]
+            return set(
+                itertools.chain.from_iterable(
+                    executor.map(
+                        lambda account_permission_set: self.list_assignments(
+                            *account_permission_set
+                        ),
+                        account_permission_sets,
+                    )
+                )
+            )
+
+    def create_plan(
+        self,
+        desired_assignments: set,
+        account_ids: set = None,
+        retained_assignments: set = None,
+        managed_scope: set = None,
+        prune_unmanaged: bool = False,
+    ) -> AssignmentPlan:
+        """
+        Diff the desired assignments against the existing ones. Only
+        assignments whose permission set & principal pair is covered by
+        the manifest are deleted, so manual, break-glass or third party
+        assignments on managed accounts are left alone.
+
+        Parameters
+        ----------
+            - desired_assignments: set, required
+                AccountAssignment tuples resolved from the manifest
+            - account_ids: set, optional
+                Accounts managed by the manifest, assignments on other
+                accounts are neither created nor deleted
+            - retained_assignments: set, optional
+                Assignments managed elsewhere, such as unexpired JIIT
+                grants, which are never deleted
+            - managed_scope: set, optional
+                (permission set ARN, principal type, principal ID) pairs
+                owned by the manifest, the only ones deleted
+            - prune_unmanaged: bool, optional
+                Opt-in to delete every existing assignment the manifest
+                does not describe, whatever its permission set & principal
+
+        Returns
+        -------
+        AssignmentPlan:
+            Sorted creates & deletes, empty when nothing drifted
+        """
+        current_assignments = self.list_account_assignments(account_ids)
+        desired_assignments = {
+            assignment
+            for assignment in desired_assignments
+            if account_ids is None or assignment.account_id in account_ids
+        }
+        undesired_assignments = (
+            current_assignments - desired_assignments - (retained_assignments or set())
+        )
+        if not prune_unmanaged:
+            undesired_assignments = {
+                assignment
+                for assignment in undesired_assignments
+                if assignment[1:] in (managed_scope or set())
+            }
+        return AssignmentPlan(
+            creates=sorted(desired_assignments - current_assignments),
+            deletes=sorted(undesired_assignments),
+        )
+
+    def _list_provisioned_account_ids(self, permission_set_arn: str) -> list:
+        """
+        Method to list the accounts a permission set is provisioned to.
+        """
+        provisioned_accounts_iterator = self._provisioned_accounts_paginator.paginate(
+            InstanceArn=self._identity_store_arn,
+            PermissionSetArn=permission_set_arn,
+        )
+        return list(
+            itertools.chain.from_iterable(
+                (page["AccountIds"] for page in provisioned_accounts_iterator)
+            )
+        )
+
+    def list_assignments(self, account_id: str, permission_set_arn: str) -> list:
+        """
+        Method to list the assignments of a permission set on an account.
+        """
+        account_assignments_iterator = self._account_assignments_paginator.paginate(
+            InstanceArn=self._identity_store_arn,
+            AccountId=account_id,
+            PermissionSetArn=permission_set_arn,
+        )
+        return [
+            AccountAssignment(
+                account_id=assignment["AccountId"],
+                permission_set_arn=assignment["PermissionSetArn"],
+                principal_type=assignment["PrincipalType"],
+                principal_id=assignment["PrincipalId"],
+            )
+            for assignment in itertools.chain.from_iterable(
+                (page["AccountAssignments"] for page in account_assignments_iterator)
+            )
+        ]
@@ -0,0 +1,407 @@
+"""
+Module to crawl the organization tree, the identity store principals and
+the permission sets on a single asyncio event loop. Requests are bounded
+by semaphores rather than thread pools, so thousands of paginated calls
+can be in flight with the memory footprint of a handful of coroutines.
+
+aiobotocore is an optional dependency, installed with the "async" extra
+and imported only when a client has to be created rather than injected.
+The threaded crawl of AwsOrganizations remains the default.
+"""
+import asyncio
+import contextlib
+
+# Default ceiling of in-flight requests per crawler
+DEFAULT_MAX_CONCURRENCY = 64
+
+
+def create_client(service_name: str, max_concurrency: int):
+    """
+    Return the async context manager of an aiobotocore client, with a
+    connection pool sized to the crawler's concurrency
+    """
+    try:
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+    except ImportError as e:
+        raise ImportError(
+            "aiobotocore is required to create async clients, install the "
+            "async extra or inject the clients"
+        ) from e
+
+    return get_session().create_client(
+        service_name,
+        config=AioConfig(
+            max_pool_connections=max_concurrency,
+            retries={"mode": "standard", "max_attempts": 10},
+            tcp_keepalive=True,
+        ),
+    )
+
+
+class AsyncCrawler:
+    """
+    Base class of the async crawlers, owning their clients & semaphore.
+    Crawlers are used as async context managers, which open the clients
+    that were not injected and close them on exit.
+    """
+
+    # Service name of every client, keyed by the attribute it is stored in
+    _client_services = {}
+
+    def __init__(self, max_concurrency: int, clients: dict) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be a positive integer")
+        self._max_concurrency = max_concurrency
+        self._semaphore = None
+        self._exit_stack = None
+        for client_attribute, client in clients.items():
+            setattr(self, client_attribute, client)
+
+    async def __aenter__(self):
+        # Semaphores bind to the running loop, so they are created here
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._exit_stack = contextlib.AsyncExitStack()
+        for client_attribute, service_name in self._client_services.items():
+            if getattr(self, client_attribute) is None:
+                setattr(
+                    self,
+                    client_attribute,
+                    await self._exit_stack.enter_async_context(
+                        create_client(service_name, self._max_concurrency)
+                    ),
+                )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._exit_stack.__aexit__(*exc_info)
+
+    async def _call(self, operation, **kwargs) -> dict:
+        """Call an operation once a request slot is free"""
+        async with self._semaphore:
+            return await operation(**kwargs)
+
+    async def _paginate(
+        self, client, operation_name: str, result_key: str, **kwargs
+    ) -> list:
+        """
+        List every item of a paginated operation, holding a request slot
+        only while a page is fetched
+        """
+        items = []
+        pages = client.get_paginator(operation_name).paginate(**kwargs).__aiter__()
+        while True:
+            async with self._semaphore:
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    return items
+            items.extend(page[result_key])
+
+
+class AsyncAwsOrganizations(AsyncCrawler):
+    """
+    Async crawler of the organization tree. Every OU lists its accounts
+    and child OUs as soon as its parent is listed, instead of waiting for
+    the rest of its level, and the results match AwsOrganizations.
+    """
+
+    _client_services = {"_organizations_client": "organizations"}
+
+    def __init__(
+        self,
+        root_ou_id: str,
+        ou_id_ignore_list: list = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        organizations_client=None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - root_ou_id: str, required
+                ID of the OU (or root) the crawl starts from
+            - ou_id_ignore_list: list, optional
+                OU IDs (and by extension their subtrees) to skip
+            - max_concurrency: int, optional
+                Ceiling of in-flight Organizations requests
+            - organizations_client: aiobotocore client, optional
+                Organizations client, created on enter if omitted
+        """
+        super().__init__(
+            max_concurrency, {"_organizations_client": organizations_client}
+        )
+        self._root_ou_id = root_ou_id
+        self._ou_id_ignore_list = set(ou_id_ignore_list or [])
+        self.ou_account_map = {}
+        self.ou_metadata = {}
+
+    async def describe_aws_organizational_unit(self) -> dict:
+        """
+        Crawl the OU tree, setting ou_account_map & ou_metadata
+
+        Returns
+        -------
+        dict:
+            Mapping of OU ID to the list of its active accounts
+        """
+        ou_accounts = {}
+        ou_children = {}
+        ou_metadata = {self._root_ou_id: await self._describe_root_ou()}
+
+        async def crawl_ou(ou_id: str) -> None:
+            ou_accounts[ou_id], child_ous = await asyncio.gather(
+                self._list_active_accounts(ou_id), self._list_child_ous(ou_id)
+            )
+            ou_children[ou_id] = [
+                child_ou["Id"]
+                for child_ou in child_ous
+                if child_ou["Id"] not in self._ou_id_ignore_list
+            ]
+            for child_ou in child_ous:
+                if child_ou["Id"] not in self._ou_id_ignore_list:
+                    ou_metadata[child_ou["Id"]] = {
+                        "Name": child_ou["Name"],
+                        "ParentId": ou_id,
+                    }
+            await asyncio.gather(*map(crawl_ou, ou_children[ou_id]))
+
+        await crawl_ou(self._root_ou_id)
+
+        # Order the OUs level by level, as the sync crawler does
+        self.ou_account_map = {}
+        ou_level = [self._root_ou_id]
+        while ou_level:
+            for ou_id in ou_level:
+                self.ou_account_map[ou_id] = ou_accounts[ou_id]
+            ou_level = [
+                child_ou_id for ou_id in ou_level for child_ou_id in ou_children[ou_id]
+            ]
+        self.ou_metadata = {ou_id: ou_metadata[ou_id] for ou_id in self.ou_account_map}
+        return self.ou_account_map
+
+    async def list_account_tags(self, account_ids: list) -> dict:
+        """
+        Return the mapping of account ID to its {tag key: tag value} tags
+        """
+        account_tags = await asyncio.gather(
+            *(
+                self._paginate(
+                    self._organizations_client,
+                    "list_tags_for_resource",
+                    "Tags",
+                    ResourceId=account_id,
+                )
+                for account_id in account_ids
+            )
+        )
+        return {
+            account_id: {tag["Key"]: tag["Value"] for tag in tags}
+            for account_id, tags in zip(account_ids, account_tags)
+        }
+
+    async def _list_active_accounts(self, parent_ou_id: str) -> list:
+        accounts = await self._paginate(
+            self._organizations_client,
+            "list_accounts_for_parent",
+            "Accounts",
+            ParentId=parent_ou_id,
+        )
+        return [
+            {"Id": account["Id"], "Name": account["Name"]}
+            for account in accounts
+            if account["Status"] == "ACTIVE"
+        ]
+
+    async def _list_child_ous(self, parent_ou_id: str) -> list:
+        child_ous = await self._paginate(
+            self._organizations_client,
+            "list_organizational_units_for_parent",
+            "OrganizationalUnits",
+            ParentId=parent_ou_id,
+        )
+        return [{"Id": ou["Id"], "Name": ou["Name"]} for ou in child_ous]
+
+    async def _describe_root_ou(self) -> dict:
+        if self._root_ou_id.startswith("r-"):
+            roots = await self._paginate(
+                self._organizations_client, "list_roots", "Roots"
+            )
+            root = next(
+                (root for root in roots if root["Id"] == self._root_ou_id), None
+            )
+            if root is None:
+                raise ValueError(f"Root {self._root_ou_id} is not in the organization")
+            return {"Name": root["Name"]}
+
+        ou = (
+            await self._call(
+                self._organizations_client.describe_organizational_unit,
+                OrganizationalUnitId=self._root_ou_id,
+            )
+        )["OrganizationalUnit"]
+        return {"Name": ou["Name"]}
+
+
+class AsyncAwsIdentityStore(AsyncCrawler):
+    """
+    Async lister of the identity store principals & of the permission sets
+    of the instance, with the projections of AwsIdentityStore and
+    PermissionSetCatalog
+    """
+
+    _client_services = {
+        "_identity_store_client": "identitystore",
+        "_sso_admin_client": "sso-admin",
+    }
+
+    def __init__(
+        self,
+        identity_store_id: str,
+        identity_store_arn: str,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        identity_store_client=None,
+        sso_admin_client=None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - identity_store_id: str, required
+                ID of the identity store
+            - identity_store_arn: str, required
+                ARN of the IAM Identity Center instance
+            - max_concurrency: int, optional
+                Ceiling of in-flight requests, shared by both clients
+            - identity_store_client: aiobotocore client, optional
+                Identity store client, created on enter if omitted
+            - sso_admin_client: aiobotocore client, optional
+                SSO admin client, created on enter if omitted
+        """
+        super().__init__(
+            max_concurrency,
+            {
+                "_identity_store_client": identity_store_client,
+                "_sso_admin_client": sso_admin_client,
+            },
+        )
+        self._identity_store_id = identity_store_id
+        self._identity_store_arn = identity_store_arn
+
+    async def list_sso_groups(self) -> list:
+        """
+        List the groups ({"GroupId", "DisplayName"}) of the identity store
+        """
+        groups = await self._paginate(
+            self._identity_store_client,
+            "list_groups",
+            "Groups",
+            IdentityStoreId=self._identity_store_id,
+        )
+        return [
+            {"GroupId": group["GroupId"], "DisplayName": group["DisplayName"]}
+            for group in groups
+        ]
+
+    async def list_sso_users(self) -> list:
+        """
+        List the users ({"UserId", "UserName"}) of the identity store
+        """
+        users = await self._paginate(
+            self._identity_store_client,
+            "list_users",
+            "Users",
+            IdentityStoreId=self._identity_store_id,
+        )
+        return [
+            {"UserId": user["UserId"], "UserName": user["UserName"]} for user in users
+        ]
+
+    async def list_permission_sets(self) -> list:
+        """
+        List & describe every permission set of the instance, describing
+        them all concurrently
+
+        Returns
+        -------
+        list:
+            Permission sets ({"Name", "PermissionSetArn", "CreatedDate"})
+        """
+        permission_set_arns = await self._paginate(
+            self._sso_admin_client,
+            "list_permission_sets",
+            "PermissionSets",
+            InstanceArn=self._identity_store_arn,
+        )
+        return list(await asyncio.gather(*map(self._describe, permission_set_arns)))
+
+    async def _describe(self, permission_set_arn: str) -> dict:
+        permission_set = (
+            await self._call(
+                self._sso_admin_client.describe_permission_set,
+                InstanceArn=self._identity_store_arn,
+                PermissionSetArn=permission_set_arn,
+            )
+        )["PermissionSet"]
+        created_date = permission_set.get("CreatedDate")
+        return {
+            "Name": permission_set["Name"],
+            "PermissionSetArn": permission_set_arn,
+            "CreatedDate": created_date.isoformat() if created_date else None,
+        }
+
+
+async def crawl_data_plane(
+    organizations: AsyncAwsOrganizations, identity_store: AsyncAwsIdentityStore
+) -> dict:
+    """
+    Crawl the organization tree, the principals and the permission sets
+    concurrently on the running event loop
+
+    Returns
+    -------
+    dict:
+        "ou_account_map", "ou_metadata", "sso_groups", "sso_users" &
+        "permission_sets" of the crawl
+    """
+    async with organizations, identity_store:
+        ou_account_map, sso_groups, sso_users, permission_sets = await asyncio.gather(
+            organizations.describe_aws_organizational_unit(),
+            identity_store.list_sso_groups(),
+            identity_store.list_sso_users(),
+            identity_store.list_permission_sets(),
+        )
+    return {
+        "ou_account_map": ou_account_map,
+        "ou_metadata": organizations.ou_metadata,
+        "sso_groups": sso_groups,
+        "sso_users": sso_users,
+        "permission_sets": permission_sets,
+    }
+
+
+def run_organization_crawl(organizations: AsyncAwsOrganizations) -> tuple:
+    """
+    Crawl the organization tree on a new event loop, for synchronous
+    callers such as AwsOrganizations
+
+    Returns
+    -------
+    tuple:
+        The ou_account_map & ou_metadata of the crawl
+    """
+
+    async def crawl_organization() -> tuple:
+        async with organizations:
+            await organizations.describe_aws_organizational_unit()
+        return organizations.ou_account_map, organizations.ou_metadata
+
+    return asyncio.run(crawl_organization())
+
+
+def run_data_plane_crawl(
+    organizations: AsyncAwsOrganizations, identity_store: AsyncAwsIdentityStore
+) -> dict:
+    """
+    Run crawl_data_plane on a new event loop, for synchronous callers
+    such as the Lambda handler
+    """
+    return asyncio.run(crawl_data_plane(organizations, identity_store))
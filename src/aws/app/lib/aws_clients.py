@@ -0,0 +1,130 @@
+"""
+Module to share boto3 clients & resources across the library classes, so
+that every service endpoint is resolved once per container and concurrent
+crawlers get a connection pool sized for their workers
+"""
+import threading
+import boto3
+import botocore.config
+
+# Default connection pool size, botocore's own default
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+
+# Ceiling of attempts per request, including the first one
+DEFAULT_MAX_ATTEMPTS = 10
+
+_SESSION = None
+_clients = {}
+_resources = {}
+_lock = threading.Lock()
+
+
+def get_config(
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+):
+    """
+    Return the client configuration shared by every client: adaptive
+    retries, which rate limit the client once it is throttled, and TCP
+    keepalive so that idle pooled connections survive between pages.
+    A single attempt disables botocore's retries & rate limiting alike,
+    for callers that pace and retry their requests themselves.
+    """
+    return botocore.config.Config(
+        max_pool_connections=max_pool_connections,
+        retries={
+            "mode": "adaptive" if max_attempts > 1 else "standard",
+            "total_max_attempts": max_attempts,
+        },
+        tcp_keepalive=True,
+    )
+
+
+def get_session() -> boto3.session.Session:
+    """
+    Return the session clients are created from, created once per container
+    """
+    global _SESSION  # pylint: disable=W0603
+    with _lock:
+        if _SESSION is None:
+            _SESSION = boto3.session.Session()
+        return _SESSION
+
+
+def get_client(
+    service_name: str,
+    region_name: str = None,
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> boto3.client:
+    """
+    Return the client of a service & region, creating it on first use.
+    A client is recreated only when a caller needs a larger connection
+    pool than the cached client has, callers holding the previous client
+    keep using it.
+
+    Parameters
+    ----------
+        - service_name: str, required
+            Name of the AWS service
+        - region_name: str, optional
+            Region of the client, the session's region if omitted
+        - max_pool_connections: int, optional
+            Ceiling of concurrent connections, at least the number of
+            workers sharing the client
+        - max_attempts: int, optional
+            Ceiling of attempts per request, clients differing in attempts
+            are cached apart
+    """
+    session = get_session()
+    client_key = (service_name, region_name or session.region_name, max_attempts)
+    with _lock:
+        cached_client = _clients.get(client_key)
+        if (
+            cached_client
+            and cached_client.meta.config.max_pool_connections >= max_pool_connections
+        ):
+            return cached_client
+
+        # Session methods are not thread safe, clients are created under lock
+        _clients[client_key] = session.client(
+            service_name,
+            region_name=region_name,
+            config=get_config(
+                max(
+                    max_pool_connections,
+                    DEFAULT_MAX_POOL_CONNECTIONS,
+                    cached_client.meta.config.max_pool_connections
+                    if cached_client
+                    else 0,
+                ),
+                max_attempts,
+            ),
+        )
+        return _clients[client_key]
+
+
+def get_resource(service_name: str, region_name: str = None) -> boto3.resource:
+    """
+    Return the resource of a service & region, creating it on first use
+    """
+    session = get_session()
+    resource_key = (service_name, region_name or session.region_name)
+    with _lock:
+        if resource_key not in _resources:
+            _resources[resource_key] = session.resource(
+                service_name, region_name=region_name, config=get_config()
+            )
+        return _resources[resource_key]
+
+
+def clear_clients() -> None:
+    """
+    Drop the cached session, clients & resources, so that the next calls
+    pick up changed credentials or endpoints
+    """
+    global _SESSION  # pylint: disable=W0603
+    with _lock:
+        _SESSION = None
+        _clients.clear()
+        _resources.clear()
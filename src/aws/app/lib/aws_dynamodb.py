@@ -0,0 +1,270 @@
+"""
+Module to read & write the items of the application's pk/sk DynamoDB
+table in as few round trips as possible
+"""
+import time
+import random
+import decimal
+import logging
+import boto3
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from .aws_clients import get_client
+
+LOGGER = logging.getLogger(__name__)
+
+# Ceilings of the keys & items of a single BatchGetItem & BatchWriteItem call
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+
+
+class ItemSerializer(TypeSerializer):
+    """
+    Serializer accepting floats, converted through their shortest repr
+    rather than their inexact binary expansion, which DynamoDB rejects
+    """
+
+    def serialize(self, value) -> dict:
+        if isinstance(value, float):
+            value = decimal.Decimal(repr(value))
+        return super().serialize(value)
+
+
+class ItemDeserializer(TypeDeserializer):
+    """
+    Deserializer returning numbers as int or float rather than Decimal, so
+    items need no second pass before being handed to the resolver
+    """
+
+    def _deserialize_n(self, value: str):
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+
+    def _deserialize_ns(self, value: list) -> set:
+        return set(map(self._deserialize_n, value))
+
+
+class DynamoDBTable:
+    """
+    Data access to a pk/sk table through a single low level client, reused
+    across calls & invocations. Queries are paginated with 1MB pages and
+    batch calls retry their unprocessed keys & items with backoff.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        hash_key: str = "pk",
+        range_key: str = "sk",
+        dynamodb_client: boto3.client = None,
+        max_attempts: int = 8,
+        backoff_seconds: float = 0.05,
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - table_name: str, required
+                Name of the DynamoDB table
+            - hash_key: str, optional
+                Name of the partition key attribute
+            - range_key: str, optional
+                Name of the sort key attribute
+            - dynamodb_client: boto3.client, optional
+                DynamoDB client, the shared client if omitted
+            - max_attempts: int, optional
+                Ceiling of calls per batch before unprocessed keys or items
+                raise RuntimeError
+            - backoff_seconds: float, optional
+                Base of the exponential, jittered retry backoff
+        """
+        self.table_name = table_name
+        self._hash_key = hash_key
+        self._range_key = range_key
+        self._max_attempts = max_attempts
+        self._backoff_seconds = backoff_seconds
+        self._client = dynamodb_client if dynamodb_client else get_client("dynamodb")
+        self._serializer = ItemSerializer()
+        self._deserializer = ItemDeserializer()
+
+    def query_items(
+        self,
+        key: str,
+        range_begins_with: str = None,
+        projection: list = None,
+        consistent_read: bool = False,
+    ):
+        """
+        Yield the items of a partition, page by page
+
+        Parameters
+        ----------
+            - key: str, required
+                Value of the partition key
+            - range_begins_with: str, optional
+                Prefix the sort key of the items starts with
+            - projection: list, optional
+                Attributes to return, all of them if omitted
+            - consistent_read: bool, optional
+                Whether to read with strong consistency
+        """
+        expression_attribute_names = {"#pk": self._hash_key}
+        expression_attribute_values = {":pk": {"S": key}}
+        key_condition_expression = "#pk = :pk"
+        if range_begins_with:
+            expression_attribute_names["#sk"] = self._range_key
+            expression_attribute_values[":sk"] = {"S": range_begins_with}
+            key_condition_expression += " AND begins_with(#sk, :sk)"
+
+        query_kwargs = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": key_condition_expression,
+            "ExpressionAttributeValues": expression_attribute_values,
+            "ConsistentRead": consistent_read,
+        }
+        if projection:
+            query_kwargs["ProjectionExpression"] = self._get_projection_expression(
+                projection, expression_attribute_names
+            )
+        query_kwargs["ExpressionAttributeNames"] = expression_attribute_names
+
+        while True:
+            response = self._client.query(**query_kwargs)
+            for item in response["Items"]:
+                yield self.deserialize_item(item)
+            if "LastEvaluatedKey" not in response:
+                break
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def batch_query_items(
+        self, key: str, range_begins_with: str = None, projection: list = None
+    ) -> list:
+        """
+        Return every item of a partition, whose sort key starts with
+        range_begins_with if given, in sort key order
+        """
+        return list(
+            self.query_items(
+                key, range_begins_with=range_begins_with, projection=projection
+            )
+        )
+
+    def batch_get_items(self, keys: list, projection: list = None) -> list:
+        """
+        Return the items of a list of (partition key, sort key) tuples, in
+        chunks of BATCH_GET_SIZE keys. Missing items are omitted and the
+        order of the returned items is unspecified.
+        """
+        items = []
+        keys = list(dict.fromkeys(keys))
+        for chunk_start in range(0, len(keys), BATCH_GET_SIZE):
+            keys_and_attributes = {
+                "Keys": [
+                    {
+                        self._hash_key: {"S": hash_value},
+                        self._range_key: {"S": range_value},
+                    }
+                    for hash_value, range_value in keys[
+                        chunk_start : chunk_start + BATCH_GET_SIZE
+                    ]
+                ]
+            }
+            if projection:
+                expression_attribute_names = {}
+                keys_and_attributes[
+                    "ProjectionExpression"
+                ] = self._get_projection_expression(
+                    projection, expression_attribute_names
+                )
+                keys_and_attributes[
+                    "ExpressionAttributeNames"
+                ] = expression_attribute_names
+
+            request_items = {self.table_name: keys_and_attributes}
+            for attempt in range(self._max_attempts):
+                response = self._client.batch_get_item(RequestItems=request_items)
+                items.extend(
+                    self.deserialize_item(item)
+                    for item in response["Responses"].get(self.table_name, [])
+                )
+                request_items = response.get("UnprocessedKeys")
+                if not request_items:
+                    break
+                self._backoff(attempt)
+            else:
+                raise RuntimeError(
+                    f"Unprocessed keys left after {self._max_attempts} attempts"
+                )
+        return items
+
+    def batch_write_items(self, put_items: list = (), delete_keys: list = ()) -> None:
+        """
+        Put items and delete (partition key, sort key) tuples, in chunks
+        of BATCH_WRITE_SIZE requests. BatchWriteItem rejects a batch that
+        writes a key twice, so only the last request of a key is kept,
+        deletes following puts.
+        """
+        write_requests = {}
+        for item in put_items:
+            write_requests[(item[self._hash_key], item[self._range_key])] = {
+                "PutRequest": {"Item": self.serialize_item(item)}
+            }
+        for hash_value, range_value in delete_keys:
+            write_requests[(hash_value, range_value)] = {
+                "DeleteRequest": {
+                    "Key": {
+                        self._hash_key: {"S": hash_value},
+                        self._range_key: {"S": range_value},
+                    }
+                }
+            }
+        write_requests = list(write_requests.values())
+        for chunk_start in range(0, len(write_requests), BATCH_WRITE_SIZE):
+            request_items = {
+                self.table_name: write_requests[
+                    chunk_start : chunk_start + BATCH_WRITE_SIZE
+                ]
+            }
+            for attempt in range(self._max_attempts):
+                response = self._client.batch_write_item(RequestItems=request_items)
+                request_items = response.get("UnprocessedItems")
+                if not request_items:
+                    break
+                self._backoff(attempt)
+            else:
+                raise RuntimeError(
+                    f"Unprocessed items left after {self._max_attempts} attempts"
+                )
+
+    def serialize_item(self, item: dict) -> dict:
+        """Serialize an item into the DynamoDB attribute value format"""
+        return {
+            attribute: self._serializer.serialize(value)
+            for attribute, value in item.items()
+        }
+
+    def deserialize_item(self, item: dict) -> dict:
+        """Deserialize an item from the DynamoDB attribute value format"""
+        return {
+            attribute: self._deserializer.deserialize(value)
+            for attribute, value in item.items()
+        }
+
+    def _backoff(self, attempt: int) -> None:
+        LOGGER.info("Retrying unprocessed requests, attempt %s", attempt + 1)
+        time.sleep(random.uniform(0, self._backoff_seconds * 2**attempt))
+
+    @staticmethod
+    def _get_projection_expression(
+        projection: list, expression_attribute_names: dict
+    ) -> str:
+        """
+        Return a projection expression of placeholders, adding them to
+        expression_attribute_names, so that reserved words can be projected
+        """
+        placeholders = []
+        for attribute_number, attribute in enumerate(projection):
+            placeholder = f"#p{attribute_number}"
+            expression_attribute_names[placeholder] = attribute
+            placeholders.append(placeholder)
+        return ", ".join(placeholders)
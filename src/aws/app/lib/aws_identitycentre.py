@@ -1,20 +1,98 @@
 """
 Module to interact with the AWS IAM Identity Store service
 """
-import itertools
+import time
+import hashlib
+import logging
+import threading
+import concurrent.futures
 import boto3
+import botocore.exceptions
+from .aws_clients import get_client
+from .snapshot_cache import SnapshotCache
+from .membership_index import MembershipIndex
+
+LOGGER = logging.getLogger(__name__)
+
+# Default ceiling of concurrent identity store API calls
+DEFAULT_MAX_WORKERS = 8
+
+# Default age after which the full listings of lookup misses are relisted
+DEFAULT_LISTING_TTL_SECONDS = 900
+
+# Version of the cached membership payload, bumped on format changes
+MEMBERSHIP_SNAPSHOT_VERSION = 1
+
+# Sources of the CloudTrail events of console & identity store API calls
+IDENTITY_STORE_EVENT_SOURCES = ("aws.sso-directory", "aws.identitystore")
+
+# CloudTrail events changing the group memberships of a user
+MEMBERSHIP_EVENT_NAMES = (
+    "AddMemberToGroup",
+    "RemoveMemberFromGroup",
+    "CreateGroupMembership",
+    "DeleteGroupMembership",
+)
 
 
 class AwsIdentityStore:
-    def __init__(self, identity_store_id: str, identity_store_arn: str) -> None:
+    """
+    Lazy lookups of the identity store principals & group memberships
+    """
+
+    def __init__(
+        self,
+        identity_store_id: str,
+        identity_store_arn: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        identity_store_client: boto3.client = None,
+        sso_admin_client: boto3.client = None,
+        snapshot_cache: SnapshotCache = None,
+        listing_ttl_seconds: int = DEFAULT_LISTING_TTL_SECONDS,
+    ) -> None:
         """
         Default constructor method to initialize
         identity store variable and boto3 client.
+
+        Parameters
+        ----------
+            - identity_store_id: str, required
+                ID of the identity store
+            - identity_store_arn: str, required
+                ARN of the IAM Identity Center instance
+            - max_workers: int, optional
+                Ceiling of concurrent principal lookups
+            - identity_store_client: boto3.client, optional
+                Identity store client, the shared client if omitted
+            - sso_admin_client: boto3.client, optional
+                SSO admin client, the shared client if omitted
+            - snapshot_cache: SnapshotCache, optional
+                Cache group memberships are persisted in between invocations
+            - listing_ttl_seconds: int, optional
+                Age after which the full principal listings lookups fall
+                back to are relisted
         """
         self._identity_store_id = identity_store_id
         self._identity_store_arn = identity_store_arn
+        self._max_workers = max_workers
+
+        # Principal name -> ID lookups, only hits are memoized per container
+        self._group_ids = {}
+        self._user_ids = {}
+        self._listings = {}
+        self._listing_ttl_seconds = listing_ttl_seconds
+        self._listing_lock = threading.Lock()
+
+        # Group memberships, crawled on first use
+        self._snapshot_cache = snapshot_cache
+        self._membership_index = None
+        self._membership_created_at = None
 
-        self._identity_store_client = boto3.client("identitystore")
+        self._identity_store_client = (
+            identity_store_client
+            if identity_store_client
+            else get_client("identitystore", max_pool_connections=max_workers)
+        )
         self._sso_users_paginator = self._identity_store_client.get_paginator(
             "list_users"
         )
@@ -22,43 +100,351 @@ class AwsIdentityStore:
             "list_groups"
         )
 
-        self._sso_admin_client = boto3.client("sso-admin")
+        self._sso_admin_client = (
+            sso_admin_client
+            if sso_admin_client
+            else get_client("sso-admin", max_pool_connections=max_workers)
+        )
         self._permission_sets_paginator = self._sso_admin_client.get_paginator(
             "list_permission_sets"
         )
 
-    def list_sso_groups(self):
+    def iter_sso_groups(self):
+        """
+        Method to stream the groups in the identity store, projecting
+        each page down to the group ID & display name as it arrives.
+        """
         aws_identitystore_groups_iterator = self._sso_groups_paginator.paginate(
             IdentityStoreId=self._identity_store_id
         )
-        return list(
-            itertools.chain.from_iterable(
-                (page["Groups"] for page in aws_identitystore_groups_iterator)
-            )
-        )
+        for page in aws_identitystore_groups_iterator:
+            for group in page["Groups"]:
+                yield {"GroupId": group["GroupId"], "DisplayName": group["DisplayName"]}
 
-    def list_sso_users(self):
+    def iter_sso_users(self):
         """
-        Method to list all the users in the identity store.
+        Method to stream the users in the identity store, projecting
+        each page down to the user ID & user name as it arrives.
         """
         aws_identitystore_users_iterator = self._sso_users_paginator.paginate(
             IdentityStoreId=self._identity_store_id
         )
-        return list(
-            itertools.chain.from_iterable(
-                (page["Users"] for page in aws_identitystore_users_iterator)
-            )
+        for page in aws_identitystore_users_iterator:
+            for user in page["Users"]:
+                yield {"UserId": user["UserId"], "UserName": user["UserName"]}
+
+    def iter_permission_sets(self):
+        """
+        Method to stream the permission set ARNs of the instance.
+        """
+        aws_permission_sets_iterator = self._permission_sets_paginator.paginate(
+            InstanceArn=self._identity_store_arn
         )
+        for page in aws_permission_sets_iterator:
+            yield from page["PermissionSets"]
+
+    def list_sso_groups(self):
+        """
+        Method to list all the groups in the identity store.
+        """
+        return list(self.iter_sso_groups())
+
+    def list_sso_users(self):
+        """
+        Method to list all the users in the identity store.
+        """
+        return list(self.iter_sso_users())
 
     def list_permission_sets(self):
         """
         Method to list permission sets and remove sensitive information.
         """
-        aws_permission_sets_iterator = self._permission_sets_paginator.paginate(
-            InstanceArn=self._identity_store_arn
+        return list(self.iter_permission_sets())
+
+    def get_membership_index(self) -> MembershipIndex:
+        """
+        Method to return the index of group memberships, reusing the
+        in-memory or cached index while it is fresh and crawling the
+        memberships of every group concurrently once it has expired.
+        """
+        if self._membership_index is not None and not (
+            self._snapshot_cache
+            and self._snapshot_cache.is_expired(self._membership_created_at)
+        ):
+            return self._membership_index
+
+        snapshot = (
+            self._snapshot_cache.get(
+                self._membership_snapshot_key, MEMBERSHIP_SNAPSHOT_VERSION
+            )
+            if self._snapshot_cache
+            else None
+        )
+        if snapshot:
+            self._membership_index = MembershipIndex(snapshot.data["group_user_ids"])
+            self._membership_created_at = snapshot.created_at
+            return self._membership_index
+
+        return self._crawl_membership_index()
+
+    def refresh_user_memberships(self, user_ids: set) -> int:
+        """
+        Method to refresh the group memberships of the given users only,
+        with one concurrent ListGroupMembershipsForMember crawl per user.
+
+        Returns
+        -------
+        int:
+            Number of users whose memberships changed
+        """
+        membership_index = self.get_membership_index()
+        user_ids = sorted(user_ids)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers
+        ) as executor:
+            user_group_ids = list(executor.map(self._list_member_group_ids, user_ids))
+
+        changed_user_count = sum(
+            membership_index.update_user(user_id, group_ids)
+            for user_id, group_ids in zip(user_ids, user_group_ids)
         )
-        return list(
-            itertools.chain.from_iterable(
-                (page["PermissionSets"] for page in aws_permission_sets_iterator)
+        if changed_user_count:
+            LOGGER.info("Memberships of %s users changed", changed_user_count)
+            self._save_membership_snapshot()
+        return changed_user_count
+
+    def apply_membership_event(self, event_detail: dict) -> bool:
+        """
+        Apply a CloudTrail event changing group memberships by refreshing
+        the memberships of its user, falling back to a full recrawl when
+        the event does not name the user, as DeleteGroupMembership does.
+
+        Parameters
+        ----------
+            - event_detail: dict, required
+                The detail section of the EventBridge event
+
+        Returns
+        -------
+        bool:
+            True if the event was applied to its user only, False if the
+            memberships were recrawled instead
+        """
+        # Failed API calls are recorded too, but did not change memberships
+        if event_detail.get("errorCode"):
+            return True
+        if event_detail.get("eventName") not in MEMBERSHIP_EVENT_NAMES:
+            return True
+
+        request_parameters = event_detail.get("requestParameters") or {}
+        member_id = (
+            request_parameters.get("memberId") or request_parameters.get("member") or {}
+        )
+        user_id = member_id.get("userId") or member_id.get("memberId")
+        if not user_id:
+            self._crawl_membership_index()
+            return False
+
+        self.refresh_user_memberships({user_id})
+        return True
+
+    def get_group_id(self, display_name: str) -> str:
+        """
+        Method to look up a group ID by display name, or return None
+        if no group matches. Misses are not memoized, so a group created
+        later is found by the next lookup.
+        """
+        if display_name not in self._group_ids:
+            group_id = self._get_principal_id(
+                self._identity_store_client.get_group_id,
+                "GroupId",
+                "DisplayName",
+                display_name,
+            )
+            if group_id is None:
+                group_id = self._get_listed_group_ids().get(display_name.lower())
+            if group_id is None:
+                return None
+            self._group_ids[display_name] = group_id
+        return self._group_ids[display_name]
+
+    def get_user_id(self, user_name: str) -> str:
+        """
+        Method to look up a user ID by user name, or return None
+        if no user matches. Misses are not memoized, so a user created
+        later is found by the next lookup.
+        """
+        if user_name not in self._user_ids:
+            user_id = self._get_principal_id(
+                self._identity_store_client.get_user_id,
+                "UserId",
+                "UserName",
+                user_name,
             )
+            if user_id is None:
+                user_id = self._get_listed_user_ids().get(user_name.lower())
+            if user_id is None:
+                return None
+            self._user_ids[user_name] = user_id
+        return self._user_ids[user_name]
+
+    def resolve_sso_groups(self, display_names: set) -> list:
+        """
+        Method to resolve only the given groups, with concurrent
+        GetGroupId lookups instead of a full listing.
+
+        Returns
+        -------
+        list:
+            Groups ({"GroupId", "DisplayName"}) found in the identity store
+        """
+        return self._resolve_principals(
+            self.get_group_id, "GroupId", "DisplayName", display_names
+        )
+
+    def resolve_sso_users(self, user_names: set) -> list:
+        """
+        Method to resolve only the given users, with concurrent
+        GetUserId lookups instead of a full listing.
+
+        Returns
+        -------
+        list:
+            Users ({"UserId", "UserName"}) found in the identity store
+        """
+        return self._resolve_principals(
+            self.get_user_id, "UserId", "UserName", user_names
         )
+
+    def _resolve_principals(
+        self, get_principal_id, id_key: str, name_key: str, principal_names: set
+    ) -> list:
+        principal_names = sorted(principal_names)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers
+        ) as executor:
+            principal_ids = list(executor.map(get_principal_id, principal_names))
+        return [
+            {id_key: principal_id, name_key: principal_name}
+            for principal_name, principal_id in zip(principal_names, principal_ids)
+            if principal_id
+        ]
+
+    def _get_principal_id(
+        self, operation, id_key: str, attribute_path: str, attribute_value: str
+    ) -> str:
+        """
+        Method to look up a principal by a unique attribute, returning
+        None when it does not exist.
+        """
+        try:
+            return operation(
+                IdentityStoreId=self._identity_store_id,
+                AlternateIdentifier={
+                    "UniqueAttribute": {
+                        "AttributePath": attribute_path,
+                        "AttributeValue": attribute_value,
+                    }
+                },
+            )[id_key]
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise
+            return None
+
+    def _get_listed_group_ids(self) -> dict:
+        """
+        Method to index a full listing of the groups by lowercased display
+        name. Lookups are case sensitive while manifests are matched case
+        insensitively, so misses fall back to this listing, relisted once
+        it is older than the listing TTL.
+        """
+        return self._get_listing(
+            "groups", self.iter_sso_groups, "DisplayName", "GroupId"
+        )
+
+    def _get_listed_user_ids(self) -> dict:
+        """
+        Method to index a full listing of the users by lowercased user
+        name, the fallback of user lookups that miss.
+        """
+        return self._get_listing("users", self.iter_sso_users, "UserName", "UserId")
+
+    def _get_listing(
+        self, listing_name: str, iter_principals, name_key: str, id_key: str
+    ) -> dict:
+        with self._listing_lock:
+            listed_at, listed_ids = self._listings.get(listing_name, (None, None))
+            if listed_at is None or (
+                time.monotonic() - listed_at >= self._listing_ttl_seconds
+            ):
+                listed_ids = {
+                    principal[name_key].lower(): principal[id_key]
+                    for principal in iter_principals()
+                }
+                self._listings[listing_name] = (time.monotonic(), listed_ids)
+        return listed_ids
+
+    @property
+    def _membership_snapshot_key(self) -> str:
+        identity_store_hash = hashlib.sha256(self._identity_store_id.encode("utf-8"))
+        return f"memberships-{identity_store_hash.hexdigest()[:16]}"
+
+    def _crawl_membership_index(self) -> MembershipIndex:
+        """
+        Method to crawl the memberships of every group concurrently and
+        cache the rebuilt index.
+        """
+        group_ids = [group["GroupId"] for group in self.iter_sso_groups()]
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers
+        ) as executor:
+            self._membership_index = MembershipIndex(
+                dict(
+                    zip(group_ids, executor.map(self._list_member_user_ids, group_ids))
+                )
+            )
+        self._membership_created_at = None
+        self._save_membership_snapshot()
+        return self._membership_index
+
+    def _save_membership_snapshot(self) -> None:
+        if not self._snapshot_cache:
+            return
+
+        # Incremental refreshes keep the age of the snapshot, so its TTL
+        # still forces a full crawl periodically
+        snapshot = self._snapshot_cache.put(
+            self._membership_snapshot_key,
+            {"group_user_ids": self._membership_index.to_dict()},
+            MEMBERSHIP_SNAPSHOT_VERSION,
+            created_at=self._membership_created_at,
+        )
+        self._membership_created_at = snapshot.created_at
+
+    def _list_member_user_ids(self, group_id: str) -> list:
+        """
+        Method to list the IDs of the member users of a group.
+        """
+        return [
+            membership["MemberId"]["UserId"]
+            for page in self._identity_store_client.get_paginator(
+                "list_group_memberships"
+            ).paginate(IdentityStoreId=self._identity_store_id, GroupId=group_id)
+            for membership in page["GroupMemberships"]
+            if "UserId" in membership.get("MemberId", {})
+        ]
+
+    def _list_member_group_ids(self, user_id: str) -> list:
+        """
+        Method to list the IDs of the groups a user is a member of.
+        """
+        return [
+            membership["GroupId"]
+            for page in self._identity_store_client.get_paginator(
+                "list_group_memberships_for_member"
+            ).paginate(
+                IdentityStoreId=self._identity_store_id, MemberId={"UserId": user_id}
+            )
+            for membership in page["GroupMemberships"]
+        ]
@@ -0,0 +1,513 @@
+"""
+Module to interact with the AWS Organizations service
+"""
+import hashlib
+import itertools
+import concurrent.futures
+import boto3
+from .aws_clients import get_client
+from .snapshot_cache import SnapshotCache, SnapshotConflictError
+from .organization_index import OrganizationIndex
+from .account_tag_index import AccountTagIndex
+
+# Default ceiling of concurrent Organizations API calls per crawl level
+DEFAULT_MAX_WORKERS = 8
+
+# Version of the organization snapshot format, bump on format changes
+ORGANIZATION_SNAPSHOT_VERSION = 3
+
+# Source of the CloudTrail backed EventBridge events of AWS Organizations
+ORGANIZATIONS_EVENT_SOURCE = "aws.organizations"
+
+
+class AwsOrganizations:
+    """
+    Cached tree of the organization OUs, accounts & account tags
+    """
+
+    def __init__(
+        self,
+        root_ou_id: str,
+        ou_id_ignore_list: list = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        snapshot_cache: SnapshotCache = None,
+        organizations_client: boto3.client = None,
+        async_crawl: bool = False,
+    ) -> None:
+        """
+        Default constructor method to initialize the organizations
+        client and load the organizational unit tree, either from a
+        cached snapshot or from a live crawl.
+
+        Parameters
+        ----------
+            - root_ou_id: str, required
+                ID of the OU (or root) the crawl starts from
+            - ou_id_ignore_list: list, optional
+                OU IDs (and by extension their subtrees) to skip
+            - max_workers: int, optional
+                Ceiling of concurrent API calls issued per OU level
+            - snapshot_cache: SnapshotCache, optional
+                Cache the crawled tree is persisted to and reloaded from
+            - organizations_client: boto3.client, optional
+                Organizations client, the shared client if omitted
+            - async_crawl: bool, optional
+                Whether full crawls run on an asyncio loop, which requires
+                the aiobotocore of the async extra
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be a positive integer")
+
+        # Set instance vars
+        self.ou_account_map = {}
+        self.ou_metadata = {}
+        self._organization_index = None
+        self._account_tags = {}
+        self._account_tag_index = None
+        self._root_ou_id = root_ou_id
+        self._ou_id_ignore_list = set(ou_id_ignore_list or [])
+        self._max_workers = max_workers
+        self._snapshot_cache = snapshot_cache
+        self._snapshot_created_at = None
+        self._snapshot_revision = None
+        self._async_crawl = async_crawl
+
+        # Set boto3 clients
+        self._organizations_client = (
+            organizations_client
+            if organizations_client
+            else get_client("organizations", max_pool_connections=max_workers)
+        )
+
+        # Set paginators
+        self._account_paginator = self._organizations_client.get_paginator(
+            "list_accounts_for_parent"
+        )
+        self._tags_paginator = self._organizations_client.get_paginator(
+            "list_tags_for_resource"
+        )
+        self._ou_paginator = self._organizations_client.get_paginator(
+            "list_organizational_units_for_parent"
+        )
+
+        # Set handlers of the organization events applied as deltas
+        self._event_handlers = {
+            "MoveAccount": self._apply_move_account,
+            "CreateOrganizationalUnit": self._apply_create_organizational_unit,
+            "DeleteOrganizationalUnit": self._apply_delete_organizational_unit,
+            "CloseAccount": self._apply_remove_account,
+            "RemoveAccountFromOrganization": self._apply_remove_account,
+            "TagResource": self._apply_tag_resource,
+            "UntagResource": self._apply_tag_resource,
+        }
+
+        # Create Account & OU itenerary
+        self.get_ou_account_map()
+
+    @property
+    def _snapshot_key(self) -> str:
+        """
+        Cache key of the tree snapshot, unique per root and ignore list
+        """
+        ignore_list_digest = hashlib.sha256(
+            ",".join(sorted(self._ou_id_ignore_list)).encode("utf-8")
+        ).hexdigest()[:16]
+        return f"organization-{self._root_ou_id}-{ignore_list_digest}"
+
+    def get_ou_account_map(self) -> dict:
+        """
+        Return the OU to accounts map, reusing the in-memory tree or the
+        cached snapshot while it is fresh and crawling the organization
+        only once it has expired or is missing.
+
+        Returns
+        -------
+        dict:
+            Mapping of OU ID to the list of its active accounts
+        """
+        if not self._snapshot_cache:
+            return self.describe_aws_organizational_unit()
+
+        # Warm container holding a fresh tree
+        if self._snapshot_created_at is not None and not (
+            self._snapshot_cache.is_expired(self._snapshot_created_at)
+        ):
+            return self.ou_account_map
+
+        if self._load_snapshot():
+            return self.ou_account_map
+
+        return self.describe_aws_organizational_unit()
+
+    def _load_snapshot(self) -> bool:
+        """
+        Reload the tree from the cached snapshot, returning False if it is
+        missing or expired. The in-memory tree and its indexes are kept
+        when the snapshot was not saved again since they were loaded.
+        """
+        snapshot = self._snapshot_cache.get(
+            self._snapshot_key, ORGANIZATION_SNAPSHOT_VERSION
+        )
+        if not snapshot:
+            return False
+
+        if snapshot.revision != self._snapshot_revision or not snapshot.revision:
+            self.ou_account_map = snapshot.data["ou_account_map"]
+            self.ou_metadata = snapshot.data["ou_metadata"]
+            self._reset_indexes(reset_account_tags=True)
+            self._account_tags = snapshot.data["account_tags"]
+        self._snapshot_created_at = snapshot.created_at
+        self._snapshot_revision = snapshot.revision
+        return True
+
+    def describe_aws_organizational_unit(self) -> dict:
+        """
+        Crawl the OU tree, on an asyncio loop or level by level on a
+        thread pool, and snapshot it.
+
+        Returns
+        -------
+        dict:
+            Mapping of OU ID to the list of its active accounts
+        """
+        if self._async_crawl:
+            from .aws_async_crawler import (
+                AsyncAwsOrganizations,
+                run_organization_crawl,
+            )
+
+            self.ou_account_map, self.ou_metadata = run_organization_crawl(
+                AsyncAwsOrganizations(
+                    self._root_ou_id,
+                    ou_id_ignore_list=list(self._ou_id_ignore_list),
+                    max_concurrency=self._max_workers,
+                )
+            )
+        else:
+            self.ou_account_map, self.ou_metadata = self._crawl_ou_tree()
+
+        self._reset_indexes(reset_account_tags=True)
+        if self._snapshot_cache:
+            snapshot = self._snapshot_cache.put(
+                self._snapshot_key,
+                self._snapshot_data,
+                ORGANIZATION_SNAPSHOT_VERSION,
+            )
+            self._snapshot_created_at = snapshot.created_at
+            self._snapshot_revision = snapshot.revision
+        return self.ou_account_map
+
+    def _crawl_ou_tree(self) -> tuple:
+        """
+        Crawl the OU tree level by level, listing the accounts and
+        child OUs of every sibling OU concurrently.
+
+        Returns
+        -------
+        tuple:
+            The OU to accounts map & the OU metadata of the crawl
+        """
+        ou_account_map = {}
+        ou_metadata = {self._root_ou_id: self._describe_root_ou()}
+        ou_level = [self._root_ou_id]
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers
+        ) as executor:
+            while ou_level:
+                # Both maps are submitted eagerly, so every sibling of the
+                # current level is fetched in parallel
+                ou_accounts = executor.map(self._list_active_accounts, ou_level)
+                ou_children = executor.map(self._list_child_ous, ou_level)
+
+                next_ou_level = []
+                for ou_id, accounts, child_ous in zip(
+                    ou_level, ou_accounts, ou_children
+                ):
+                    ou_account_map[ou_id] = accounts
+                    for child_ou in child_ous:
+                        if child_ou["Id"] not in self._ou_id_ignore_list:
+                            ou_metadata[child_ou["Id"]] = {
+                                "Name": child_ou["Name"],
+                                "ParentId": ou_id,
+                            }
+                            next_ou_level.append(child_ou["Id"])
+                ou_level = next_ou_level
+        return ou_account_map, ou_metadata
+
+    @property
+    def _snapshot_data(self) -> dict:
+        return {
+            "ou_account_map": self.ou_account_map,
+            "ou_metadata": self.ou_metadata,
+            "account_tags": self._account_tags,
+        }
+
+    def _save_snapshot(self) -> bool:
+        """
+        Save the patched tree over the snapshot it was loaded from,
+        returning False if another writer saved the snapshot meanwhile
+        """
+        try:
+            snapshot = self._snapshot_cache.put(
+                self._snapshot_key,
+                self._snapshot_data,
+                ORGANIZATION_SNAPSHOT_VERSION,
+                created_at=self._snapshot_created_at,
+                expected_revision=self._snapshot_revision,
+            )
+        except SnapshotConflictError:
+            return False
+        self._snapshot_revision = snapshot.revision
+        return True
+
+    @property
+    def organization_index(self) -> OrganizationIndex:
+        """
+        Index of the current organization tree, rebuilt lazily after the
+        tree is recrawled, reloaded or patched
+        """
+        if self._organization_index is None:
+            self._organization_index = OrganizationIndex(
+                self._root_ou_id, self.ou_account_map, self.ou_metadata
+            )
+        return self._organization_index
+
+    @property
+    def account_tag_index(self) -> AccountTagIndex:
+        """
+        Index of the tags of every active account. Tags are crawled
+        concurrently on first use and, after the tree is patched or tags
+        changed, only for accounts that are not tracked yet. Crawled tags
+        are saved in the snapshot, and refreshed entirely whenever the
+        tree is recrawled.
+        """
+        if self._account_tag_index is None:
+            account_ids = self.organization_index.account_ids
+            untagged_account_ids = sorted(account_ids - self._account_tags.keys())
+            if untagged_account_ids:
+                with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_workers
+                ) as executor:
+                    self._account_tags.update(
+                        zip(
+                            untagged_account_ids,
+                            executor.map(self._list_account_tags, untagged_account_ids),
+                        )
+                    )
+            self._account_tags = {
+                account_id: tags
+                for account_id, tags in self._account_tags.items()
+                if account_id in account_ids
+            }
+            # Another writer's snapshot wins, the tags stay in memory only
+            if untagged_account_ids and self._snapshot_cache:
+                self._save_snapshot()
+            self._account_tag_index = AccountTagIndex(self._account_tags)
+        return self._account_tag_index
+
+    def _reset_indexes(self, reset_account_tags: bool = False) -> None:
+        """
+        Drop the indexes derived from the tree after it changed
+        """
+        self._organization_index = None
+        self._account_tag_index = None
+        if reset_account_tags:
+            self._account_tags = {}
+
+    def apply_event(self, event_detail: dict) -> bool:
+        """
+        Apply an AWS Organizations CloudTrail event to the cached tree in
+        place, falling back to a full resync for any event that cannot
+        be applied safely. With a snapshot cache, the latest snapshot is
+        reloaded before it is patched and saved only if no other writer
+        saved it meanwhile, resyncing fully on such a conflict.
+
+        Parameters
+        ----------
+            - event_detail: dict, required
+                The detail section of the EventBridge event
+
+        Returns
+        -------
+        bool:
+            True if the event was applied as a delta, False if the
+            organization was recrawled instead
+        """
+        # Failed API calls are recorded too, but did not change the tree
+        if event_detail.get("errorCode"):
+            return True
+
+        # Patch the latest snapshot, other containers may have saved deltas
+        if self._snapshot_cache and not self._load_snapshot():
+            self.describe_aws_organizational_unit()
+            return False
+
+        event_handler = self._event_handlers.get(event_detail.get("eventName"))
+        try:
+            is_applied = bool(event_handler) and event_handler(
+                event_detail.get("requestParameters") or {},
+                event_detail.get("responseElements") or {},
+            )
+        except KeyError:
+            is_applied = False
+
+        if not is_applied:
+            self.describe_aws_organizational_unit()
+            return False
+
+        self._reset_indexes()
+        if self._snapshot_cache and not self._save_snapshot():
+            self.describe_aws_organizational_unit()
+            return False
+        return True
+
+    def _find_account(self, account_id: str, parent_ou_id: str = "") -> tuple:
+        """
+        Return the OU ID and details of a tracked account, looking under
+        the given parent OU first, or (None, None) if it is not tracked.
+        """
+        ou_ids = itertools.chain(
+            [parent_ou_id] if parent_ou_id in self.ou_account_map else [],
+            self.ou_account_map,
+        )
+        for ou_id in ou_ids:
+            for account in self.ou_account_map[ou_id]:
+                if account["Id"] == account_id:
+                    return ou_id, account
+        return None, None
+
+    def _apply_move_account(
+        self, request_parameters: dict, response_elements: dict
+    ) -> bool:
+        # pylint: disable=W0613
+        account_id = request_parameters["accountId"]
+        destination_ou_id = request_parameters["destinationParentId"]
+
+        # Destination is ignored or unknown to a possibly stale tree
+        if destination_ou_id not in self.ou_account_map:
+            return False
+
+        ou_id, account = self._find_account(
+            account_id, request_parameters.get("sourceParentId", "")
+        )
+        if ou_id is None:
+            # Account moved in from an untracked OU, a single lookup
+            # resolves its name and status
+            account = self._organizations_client.describe_account(AccountId=account_id)[
+                "Account"
+            ]
+            if account["Status"] != "ACTIVE":
+                return True
+            account = {"Id": account["Id"], "Name": account["Name"]}
+        elif ou_id != destination_ou_id:
+            self.ou_account_map[ou_id].remove(account)
+        else:
+            return True
+
+        self.ou_account_map[destination_ou_id].append(account)
+        return True
+
+    def _apply_create_organizational_unit(
+        self, request_parameters: dict, response_elements: dict
+    ) -> bool:
+        ou = response_elements["organizationalUnit"]
+        if request_parameters["parentId"] not in self.ou_account_map:
+            return False
+        self.ou_account_map.setdefault(ou["id"], [])
+        self.ou_metadata[ou["id"]] = {
+            "Name": ou["name"],
+            "ParentId": request_parameters["parentId"],
+        }
+        return True
+
+    def _apply_delete_organizational_unit(
+        self, request_parameters: dict, response_elements: dict
+    ) -> bool:
+        # pylint: disable=W0613
+        ou_id = request_parameters["organizationalUnitId"]
+
+        # Only empty OUs can be deleted, accounts left means a stale tree
+        if self.ou_account_map.get(ou_id):
+            return False
+        self.ou_account_map.pop(ou_id, None)
+        self.ou_metadata.pop(ou_id, None)
+        return True
+
+    def _apply_remove_account(
+        self, request_parameters: dict, response_elements: dict
+    ) -> bool:
+        # pylint: disable=W0613
+        ou_id, account = self._find_account(request_parameters["accountId"])
+        if ou_id is not None:
+            self.ou_account_map[ou_id].remove(account)
+        return True
+
+    def _apply_tag_resource(
+        self, request_parameters: dict, response_elements: dict
+    ) -> bool:
+        # Tags of the OUs, roots & policies are not tracked
+        self._account_tags.pop(request_parameters["resourceId"], None)
+        return True
+
+    def _list_active_accounts(self, parent_ou_id: str) -> list:
+        """
+        Method to list the active accounts directly under an OU.
+        """
+        accounts_iterator = self._account_paginator.paginate(ParentId=parent_ou_id)
+        return [
+            {"Id": account["Id"], "Name": account["Name"]}
+            for account in itertools.chain.from_iterable(
+                (page["Accounts"] for page in accounts_iterator)
+            )
+            if account["Status"] == "ACTIVE"
+        ]
+
+    def _list_account_tags(self, account_id: str) -> dict:
+        """
+        Method to list the tags of an account.
+        """
+        tags_iterator = self._tags_paginator.paginate(ResourceId=account_id)
+        return {
+            tag["Key"]: tag["Value"]
+            for tag in itertools.chain.from_iterable(
+                (page["Tags"] for page in tags_iterator)
+            )
+        }
+
+    def _list_child_ous(self, parent_ou_id: str) -> list:
+        """
+        Method to list the IDs and names of the OUs directly under an OU.
+        """
+        ou_iterator = self._ou_paginator.paginate(ParentId=parent_ou_id)
+        return [
+            {"Id": ou["Id"], "Name": ou["Name"]}
+            for ou in itertools.chain.from_iterable(
+                (page["OrganizationalUnits"] for page in ou_iterator)
+            )
+        ]
+
+    def _describe_root_ou(self) -> dict:
+        """
+        Method to describe the OU (or root) the crawl starts from.
+        """
+        if self._root_ou_id.startswith("r-"):
+            root = next(
+                (
+                    root
+                    for page in self._organizations_client.get_paginator(
+                        "list_roots"
+                    ).paginate()
+                    for root in page["Roots"]
+                    if root["Id"] == self._root_ou_id
+                ),
+                None,
+            )
+            if root is None:
+                raise ValueError(f"Root {self._root_ou_id} is not in the organization")
+            return {"Name": root["Name"]}
+
+        ou = self._organizations_client.describe_organizational_unit(
+            OrganizationalUnitId=self._root_ou_id
+        )["OrganizationalUnit"]
+        return {"Name": ou["Name"]}
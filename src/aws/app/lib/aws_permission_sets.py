@@ -0,0 +1,177 @@
+"""
+Module to hydrate the permission sets of an IAM Identity Center instance
+into a name addressable catalog, cached between invocations
+"""
+import hashlib
+import logging
+import concurrent.futures
+import boto3
+from .aws_clients import get_client
+from .snapshot_cache import SnapshotCache
+
+LOGGER = logging.getLogger(__name__)
+
+# Default ceiling of concurrent DescribePermissionSet calls
+DEFAULT_MAX_WORKERS = 8
+
+# Version of the cached catalog payload, bumped on format changes
+PERMISSION_SET_SNAPSHOT_VERSION = 1
+
+
+class PermissionSetCatalog:
+    """
+    Catalog of permission set descriptions keyed by ARN. Listing the ARNs
+    is a handful of paginated calls, describing them is one call each, so
+    descriptions are cached and only ARNs that appeared since the last
+    listing are described. The cache TTL bounds how long a renamed
+    permission set can be served under its old name.
+    """
+
+    def __init__(
+        self,
+        identity_store_arn: str,
+        sso_admin_client: boto3.client = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        snapshot_cache: SnapshotCache = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - identity_store_arn: str, required
+                ARN of the IAM Identity Center instance
+            - sso_admin_client: boto3.client, optional
+                SSO admin client, the shared client if omitted
+            - max_workers: int, optional
+                Ceiling of concurrent DescribePermissionSet calls
+            - snapshot_cache: SnapshotCache, optional
+                Cache descriptions are persisted in between invocations
+        """
+        self._identity_store_arn = identity_store_arn
+        self._max_workers = max_workers
+        self._snapshot_cache = snapshot_cache
+
+        self._sso_admin_client = (
+            sso_admin_client
+            if sso_admin_client
+            else get_client("sso-admin", max_pool_connections=max_workers)
+        )
+        self._permission_sets_paginator = self._sso_admin_client.get_paginator(
+            "list_permission_sets"
+        )
+
+        # ARN -> {"Name", "PermissionSetArn", "CreatedDate"}
+        self._permission_sets = {}
+        self._snapshot_created_at = None
+
+    @property
+    def _snapshot_key(self) -> str:
+        instance_hash = hashlib.sha256(self._identity_store_arn.encode("utf-8"))
+        return f"permission-sets-{instance_hash.hexdigest()[:16]}"
+
+    def list_permission_sets(self) -> list:
+        """
+        List the permission sets of the instance, describing only the
+        ARNs missing from the cache.
+
+        Returns
+        -------
+        list:
+            Permission sets ({"Name", "PermissionSetArn", "CreatedDate"})
+        """
+        self._load_snapshot()
+
+        permission_set_arns = [
+            permission_set_arn
+            for page in self._permission_sets_paginator.paginate(
+                InstanceArn=self._identity_store_arn
+            )
+            for permission_set_arn in page["PermissionSets"]
+        ]
+        added_arns = [
+            permission_set_arn
+            for permission_set_arn in permission_set_arns
+            if permission_set_arn not in self._permission_sets
+        ]
+        removed_arns = self._permission_sets.keys() - set(permission_set_arns)
+
+        for permission_set_arn in removed_arns:
+            del self._permission_sets[permission_set_arn]
+        if added_arns:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._max_workers
+            ) as executor:
+                self._permission_sets.update(
+                    zip(added_arns, executor.map(self._describe, added_arns))
+                )
+
+        if added_arns or removed_arns:
+            LOGGER.info(
+                "Permission set catalog changed, %s added & %s removed",
+                len(added_arns),
+                len(removed_arns),
+            )
+            self._save_snapshot()
+        return [
+            self._permission_sets[permission_set_arn]
+            for permission_set_arn in permission_set_arns
+        ]
+
+    def get_permission_set_arns(self) -> dict:
+        """
+        Return the mapping of lowercased permission set name to ARN
+        """
+        return {
+            permission_set["Name"].lower(): permission_set["PermissionSetArn"]
+            for permission_set in self.list_permission_sets()
+        }
+
+    def _describe(self, permission_set_arn: str) -> dict:
+        """
+        Method to describe a permission set down to the cached fields.
+        """
+        permission_set = self._sso_admin_client.describe_permission_set(
+            InstanceArn=self._identity_store_arn,
+            PermissionSetArn=permission_set_arn,
+        )["PermissionSet"]
+        created_date = permission_set.get("CreatedDate")
+        return {
+            "Name": permission_set["Name"],
+            "PermissionSetArn": permission_set_arn,
+            "CreatedDate": created_date.isoformat() if created_date else None,
+        }
+
+    def _load_snapshot(self) -> None:
+        """
+        Method to reload the cached descriptions once the in-memory ones
+        expired, starting over empty when the snapshot expired too.
+        """
+        if not self._snapshot_cache:
+            return
+        if self._snapshot_created_at is not None and not (
+            self._snapshot_cache.is_expired(self._snapshot_created_at)
+        ):
+            return
+
+        snapshot = self._snapshot_cache.get(
+            self._snapshot_key, PERMISSION_SET_SNAPSHOT_VERSION
+        )
+        if snapshot:
+            self._permission_sets = snapshot.data["permission_sets"]
+            self._snapshot_created_at = snapshot.created_at
+        else:
+            self._permission_sets = {}
+            self._snapshot_created_at = None
+
+    def _save_snapshot(self) -> None:
+        if not self._snapshot_cache:
+            return
+
+        # Incremental updates keep the age of the snapshot, so its TTL
+        # still forces every description to be refreshed periodically
+        snapshot = self._snapshot_cache.put(
+            self._snapshot_key,
+            {"permission_sets": self._permission_sets},
+            PERMISSION_SET_SNAPSHOT_VERSION,
+            created_at=self._snapshot_created_at,
+        )
+        self._snapshot_created_at = snapshot.created_at
@@ -1,31 +1,430 @@
-import jsonschema
-from .utils import load_file
+from typing import NamedTuple
+from .manifest_compiler import ManifestCompiler
+from .name_matcher import NameMatcher
+from .organization_index import OrganizationIndex
+from .account_tag_index import AccountTagIndex
 
 
 class AwsResolver:
-    """ """
+    """
+    Loads a manifest through the manifest compiler, so that it is only
+    validated & normalized again when its content or the schema changed.
+    """
 
     def __init__(
-        self, manifest_definition_filepath: str, schema_definition_filepath: str
+        self,
+        manifest_definition_path: str,
+        schema_definition_filepath: str,
+        manifest_compiler: ManifestCompiler = None,
     ) -> None:
-        self._schema_definition = load_file(schema_definition_filepath)
-        self.manifest_definition = load_file(manifest_definition_filepath)
+        """
+        Parameters
+        ----------
+            - manifest_definition_path: str, required
+                Path to a YAML or JSON manifest, to a directory of manifest
+                fragments or a glob pattern matching manifest fragments
+            - schema_definition_filepath: str, required
+                Path to the JSON schema the manifest is validated against
+            - manifest_compiler: ManifestCompiler, optional
+                Compiler caching the compiled manifest, raises
+                jsonschema.ValidationError if the manifest is invalid
+        """
+        self._manifest_compiler = (
+            manifest_compiler if manifest_compiler else ManifestCompiler()
+        )
+        self.manifest_definition = self._manifest_compiler.compile(
+            manifest_definition_path, schema_definition_filepath
+        )
+
+
+# Access types resolved into permanent account assignments
+RESOLVED_ACCESS_TYPES = ("rbac", "abac")
+
+
+class AccountAssignment(NamedTuple):
+    """
+    Permission set assignment of a principal on an AWS account
+    """
+
+    account_id: str
+    permission_set_arn: str
+    principal_type: str
+    principal_id: str
+
 
-        # validate manifest against schema
-        self._is_valid()
+class RbacResolver:
+    """
+    Resolves manifest rules into the deduplicated set of account
+    assignments they describe.
 
-    def _is_valid(self) -> None:
+    Accounts are encoded as bit positions, so the targets of a rule are a
+    single integer bitmap. Rules sharing a principal & permission set are
+    merged with a bitwise OR and ignore entries are subtracted as one
+    mask, which keeps resolution linear in rules and memory proportional
+    to the resolved assignments rather than to the cross product.
+
+    Implicit rules (rule_type: implicit) match target & principal names
+    against glob patterns, or regex patterns when prefixed with "^". The
+    patterns of all implicit rules are combined per kind of name, so every
+    account, OU & principal name is scanned once whatever the rule count.
+
+    Attribute based rules (access_type: abac) further restrict their
+    targets to the accounts whose tags match the rule's target_tags.
+    """
+
+    def create_assignments_mapping(
+        self,
+        aws_accounts: list,
+        sso_groups,
+        permission_sets: list,
+        assignment_rules: list,
+        ignore_rules: list = None,
+        sso_users=None,
+        organization_index: OrganizationIndex = None,
+        account_tag_index: AccountTagIndex = None,
+        access_types: tuple = RESOLVED_ACCESS_TYPES,
+        managed_scope: set = None,
+    ) -> set:
         """
-        Validates the manifest definition against the schema definition.
+        Resolve RBAC & ABAC assignment rules into account assignments
+
+        Parameters
+        ----------
+            - aws_accounts: list, required
+                Active accounts ({"Id", "Name"}) assignments can target
+            - sso_groups: iterable, required
+                Identity store groups ({"GroupId", "DisplayName"}), consumed
+                once so a streaming listing is never materialized
+            - permission_sets: list, required
+                Permission sets ({"Name", "PermissionSetArn"})
+            - assignment_rules: list, required
+                Manifest rules to resolve, rules of other access types
+                than access_types are skipped
+            - ignore_rules: list, optional
+                Manifest ignore entries subtracted from every rule
+            - sso_users: iterable, optional
+                Identity store users ({"UserId", "UserName"}), consumed once
+            - organization_index: OrganizationIndex, optional
+                Index of the organization, required by OU targets
+            - account_tag_index: AccountTagIndex, optional
+                Index of the account tags, required by ABAC rules
+            - access_types: tuple, optional
+                Access types resolved, JIIT rules are only resolved to
+                check the eligibility of grant requests
+            - managed_scope: set, optional
+                Updated with the (permission set ARN, principal type,
+                principal ID) pairs the rules cover, whatever their
+                targets, which bounds the assignments the manifest owns
 
-        Returns:
+        Returns
         -------
-        bool
-            True if the manifest is valid, raises jsonschema.ValidationError otherwise.
+        set:
+            Deduplicated set of AccountAssignment tuples
         """
-        try:
-            jsonschema.validate(
-                instance=self.manifest_definition, schema=self._schema_definition
+        # Integer encoding of accounts, principals & permission sets
+        account_ids = [account["Id"] for account in aws_accounts]
+        account_positions = {
+            account_id: position for position, account_id in enumerate(account_ids)
+        }
+        account_ids_by_name = {}
+        for account in aws_accounts:
+            account_ids_by_name.setdefault(account["Name"].lower(), []).append(
+                account["Id"]
+            )
+
+        principal_ids = {
+            ("group", group["DisplayName"].lower()): group["GroupId"]
+            for group in sso_groups
+        }
+        principal_ids.update(
+            {
+                ("user", user["UserName"].lower()): user["UserId"]
+                for user in sso_users or []
+            }
+        )
+        permission_set_arns = {
+            permission_set["Name"].lower(): permission_set["PermissionSetArn"]
+            for permission_set in permission_sets
+        }
+
+        rbac_rules = [
+            rule
+            for rule in assignment_rules
+            if rule.get("access_type", "rbac").lower() in access_types
+        ]
+        implicit_rules = [rule for rule in rbac_rules if _is_implicit(rule)]
+
+        resolver_context = _ResolverContext(
+            account_positions,
+            account_ids_by_name,
+            organization_index,
+            account_tag_index,
+        )
+        resolver_context.index_patterns(implicit_rules, aws_accounts)
+        principal_pattern_ids = _index_principal_patterns(implicit_rules, principal_ids)
+        unresolved_references = []
+
+        # Merge rule targets per (principal, permission set) pair
+        assignment_masks = {}
+        for rule in rbac_rules:
+            principal_key = (
+                rule["principal_type"].lower(),
+                rule["principal_name"].lower(),
+            )
+            if _is_implicit(rule):
+                rule_principal_ids = principal_pattern_ids.get(
+                    (principal_key[0], rule["principal_name"]), []
+                )
+            elif principal_key in principal_ids:
+                rule_principal_ids = [principal_ids[principal_key]]
+            else:
+                rule_principal_ids = []
+                unresolved_references.append(":".join(principal_key))
+
+            permission_set_arn = permission_set_arns.get(
+                rule["permission_set_name"].lower()
+            )
+            if not permission_set_arn:
+                unresolved_references.append(
+                    f"permission_set:{rule['permission_set_name']}"
+                )
+
+            target_mask = resolver_context.get_target_mask(rule, unresolved_references)
+            if not permission_set_arn:
+                continue
+            for principal_id in rule_principal_ids:
+                assignment_key = (principal_key[0], principal_id, permission_set_arn)
+                if managed_scope is not None:
+                    managed_scope.add(
+                        (permission_set_arn, principal_key[0].upper(), principal_id)
+                    )
+                assignment_masks[assignment_key] = (
+                    assignment_masks.get(assignment_key, 0) | target_mask
+                )
+
+        ignore_mask = 0
+        for ignore_rule in ignore_rules or []:
+            ignore_mask |= resolver_context.get_target_mask(ignore_rule, [])
+
+        if unresolved_references:
+            raise ValueError(
+                "Unresolved manifest references: "
+                + ", ".join(sorted(set(unresolved_references)))
             )
-        except jsonschema.ValidationError as e:
-            raise jsonschema.ValidationError(f"Validation error: {e.message}")
+
+        # Decode the bitmaps into assignments
+        assignments = set()
+        for (
+            principal_type,
+            principal_id,
+            permission_set_arn,
+        ), mask in assignment_masks.items():
+            mask &= ~ignore_mask
+            while mask:
+                lowest_bit = mask & -mask
+                assignments.add(
+                    AccountAssignment(
+                        account_id=account_ids[lowest_bit.bit_length() - 1],
+                        permission_set_arn=permission_set_arn,
+                        principal_type=principal_type.upper(),
+                        principal_id=principal_id,
+                    )
+                )
+                mask ^= lowest_bit
+        return assignments
+
+    def get_referenced_principal_names(self, assignment_rules: list) -> dict:
+        """
+        Collect the principals named by RBAC & ABAC rules, so that only those
+        have to be looked up in the identity store
+
+        Parameters
+        ----------
+            - assignment_rules: list, required
+                Manifest rules to inspect
+
+        Returns
+        -------
+        dict:
+            Principal type ("group", "user") to the set of referenced
+            names, or None when an implicit rule can match any principal
+            and the identity store has to be listed in full
+        """
+        principal_names = {"group": set(), "user": set()}
+        for rule in assignment_rules:
+            if rule.get("access_type", "rbac").lower() not in RESOLVED_ACCESS_TYPES:
+                continue
+            if _is_implicit(rule):
+                return None
+            principal_names[rule["principal_type"].lower()].add(rule["principal_name"])
+        return principal_names
+
+
+def _is_implicit(rule: dict) -> bool:
+    return rule.get("rule_type", "explicit").lower() == "implicit"
+
+
+def _index_principal_patterns(implicit_rules: list, principal_ids: dict) -> dict:
+    """
+    Map the (principal type, pattern) pairs of implicit rules to the IDs
+    of the principals they match, scanning every principal name once
+    """
+    principal_matchers = {}
+    for principal_type in ("group", "user"):
+        patterns = [
+            rule["principal_name"]
+            for rule in implicit_rules
+            if rule["principal_type"].lower() == principal_type
+        ]
+        if patterns:
+            principal_matchers[principal_type] = NameMatcher(patterns)
+
+    principal_pattern_ids = {}
+    for (principal_type, principal_name), principal_id in principal_ids.items():
+        if principal_type not in principal_matchers:
+            continue
+        for pattern in principal_matchers[principal_type].match(principal_name):
+            principal_pattern_ids.setdefault((principal_type, pattern), []).append(
+                principal_id
+            )
+    return principal_pattern_ids
+
+
+class _ResolverContext:
+    """
+    Memoized conversion of rule targets into account bitmaps
+    """
+
+    def __init__(
+        self,
+        account_positions: dict,
+        account_ids_by_name: dict,
+        organization_index: OrganizationIndex,
+        account_tag_index: AccountTagIndex = None,
+    ) -> None:
+        self._account_positions = account_positions
+        self._account_ids_by_name = account_ids_by_name
+        self._organization_index = organization_index
+        self._account_tag_index = account_tag_index
+        self._target_masks = {}
+
+        # Implicit target patterns -> account bitmaps / matching OU IDs
+        self._account_pattern_masks = {}
+        self._ou_pattern_ids = {}
+
+    def index_patterns(self, implicit_rules: list, aws_accounts: list) -> None:
+        """
+        Match the target patterns of implicit rules against every account
+        & OU, matching each name and ID once against all the patterns
+        """
+        account_matcher = NameMatcher(
+            target_name
+            for rule in implicit_rules
+            if rule["target_type"].lower() == "act"
+            for target_name in rule["target_names"]
+        )
+        if account_matcher.patterns:
+            for account in aws_accounts:
+                account_bit = 1 << self._account_positions[account["Id"]]
+                for pattern in {
+                    *account_matcher.match(account["Name"]),
+                    *account_matcher.match(account["Id"]),
+                }:
+                    self._account_pattern_masks[pattern] = (
+                        self._account_pattern_masks.get(pattern, 0) | account_bit
+                    )
+
+        ou_matcher = NameMatcher(
+            target_name
+            for rule in implicit_rules
+            if rule["target_type"].lower() == "ou"
+            for target_name in rule["target_names"]
+        )
+        if ou_matcher.patterns:
+            if self._organization_index is None:
+                raise ValueError("OU targets require an organization index")
+            for ou_id, ou_name in self._organization_index.ou_names.items():
+                for pattern in {*ou_matcher.match(ou_name), *ou_matcher.match(ou_id)}:
+                    self._ou_pattern_ids.setdefault(pattern, []).append(ou_id)
+
+    def _to_mask(self, account_ids) -> int:
+        mask = 0
+        for account_id in account_ids:
+            position = self._account_positions.get(account_id)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def _resolve_target_mask(self, target_type: str, target_name: str, nested: bool):
+        if target_type == "act":
+            if target_name in self._account_positions:
+                return 1 << self._account_positions[target_name]
+            account_ids = self._account_ids_by_name.get(target_name.lower())
+            return self._to_mask(account_ids) if account_ids else None
+
+        if self._organization_index is None:
+            raise ValueError("OU targets require an organization index")
+        ou_ids = self._organization_index.get_ou_ids(target_name)
+        if not ou_ids:
+            return None
+        return self._to_mask(
+            account_id
+            for ou_id in ou_ids
+            for account_id in self._organization_index.get_ou_account_ids(
+                ou_id, nested=nested
+            )
+        )
+
+    def _resolve_pattern_mask(self, target_type: str, pattern: str, nested: bool):
+        if target_type == "act":
+            return self._account_pattern_masks.get(pattern, 0)
+        return self._to_mask(
+            account_id
+            for ou_id in self._ou_pattern_ids.get(pattern, [])
+            for account_id in self._organization_index.get_ou_account_ids(
+                ou_id, nested=nested
+            )
+        )
+
+    def get_target_mask(self, rule: dict, unresolved_references: list) -> int:
+        """
+        Return the bitmap of the accounts targeted by a rule, recording
+        target names that match no account or OU. Patterns of implicit
+        rules matching nothing are not errors. ABAC rules are restricted
+        to the accounts matching their tag predicate.
+        """
+        mask = self._get_scope_mask(rule, unresolved_references)
+        if rule.get("access_type", "rbac").lower() != "abac":
+            return mask
+
+        if self._account_tag_index is None:
+            raise ValueError("ABAC rules require an account tag index")
+        return mask & self._to_mask(
+            self._account_tag_index.get_account_ids(rule.get("target_tags", {}))
+        )
+
+    def _get_scope_mask(self, rule: dict, unresolved_references: list) -> int:
+        target_type = rule["target_type"].lower()
+        nested = bool(rule.get("nested", False))
+
+        mask = 0
+        if _is_implicit(rule):
+            for pattern in rule["target_names"]:
+                pattern_key = ("pattern", target_type, pattern, nested)
+                if pattern_key not in self._target_masks:
+                    self._target_masks[pattern_key] = self._resolve_pattern_mask(
+                        *pattern_key[1:]
+                    )
+                mask |= self._target_masks[pattern_key]
+            return mask
+
+        for target_name in rule["target_names"]:
+            target_key = (target_type, target_name, nested)
+            if target_key not in self._target_masks:
+                self._target_masks[target_key] = self._resolve_target_mask(*target_key)
+            target_mask = self._target_masks[target_key]
+            if target_mask is None:
+                unresolved_references.append(f"{target_type}:{target_name}")
+            else:
+                mask |= target_mask
+        return mask
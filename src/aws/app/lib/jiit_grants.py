@@ -0,0 +1,399 @@
+"""
+Module to grant just-in-time (JIIT) account assignments and to sweep them
+once they expire
+"""
+import re
+import time
+import logging
+import dataclasses
+import boto3
+from boto3.dynamodb.conditions import Key
+from .aws_clients import get_resource
+from .aws_sso_resolver import AccountAssignment
+from .aws_assignment_executor import AwsAssignmentExecutor, AssignmentOperation
+
+LOGGER = logging.getLogger(__name__)
+
+# Source of the events requesting sweeps
+JIIT_EVENT_SOURCE = "sso-manager.jiit"
+JIIT_SWEEP_DETAIL_TYPE = "JIIT Grants Sweep"
+
+# Fields of a grant request, to their required flag
+GRANT_REQUEST_FIELDS = {
+    "account_id": True,
+    "permission_set_name": True,
+    "duration_seconds": True,
+    "group_name": False,
+}
+
+# Session ARN of the roles IAM Identity Center users sign in with, the
+# session name being the user name
+SSO_USER_SESSION_ARN_PATTERN = re.compile(
+    r"arn:aws[a-z-]*:sts::\d{12}:assumed-role/AWSReservedSSO_[\w+=,.@-]+/(?P<user_name>.+)"
+)
+
+# Partitions of the expiry ordered grants & of the grant per assignment
+EXPIRY_PARTITION_KEY = "JIIT#EXPIRY"
+ASSIGNMENT_PARTITION_KEY = "JIIT#ASSIGNMENT"
+
+
+@dataclasses.dataclass
+class JiitGrant:
+    """
+    Time boxed account assignment
+
+        - assignment: AccountAssignment, assignment granted
+        - expires_at: int, epoch seconds at which the grant is revoked
+    """
+
+    assignment: AccountAssignment
+    expires_at: int
+
+    @property
+    def assignment_id(self) -> str:
+        """Deterministic ID, one grant is tracked per assignment"""
+        return "#".join(self.assignment)
+
+    @property
+    def expiry_key(self) -> str:
+        """Sort key ordering grants by expiry, zero padded to sort as text"""
+        return f"{self.expires_at:010d}#{self.assignment_id}"
+
+
+def parse_grant_request(grant_request: dict) -> dict:
+    """
+    Validate a grant request, raising ValueError naming every missing,
+    unknown or invalid field
+
+    Returns
+    -------
+    dict:
+        The grant request, group_name is None for a grant to the requester
+    """
+    if not isinstance(grant_request, dict):
+        raise ValueError("Grant request must be a JSON object")
+
+    errors = [
+        f"{field} is required"
+        for field, is_required in GRANT_REQUEST_FIELDS.items()
+        if is_required and field not in grant_request
+    ] + [
+        f"{field} is not a grant request field"
+        for field in sorted(set(grant_request) - set(GRANT_REQUEST_FIELDS))
+    ]
+    account_id = grant_request.get("account_id")
+    if "account_id" in grant_request and not (
+        isinstance(account_id, str) and re.fullmatch(r"\d{12}", account_id)
+    ):
+        errors.append("account_id must be a 12 digit account ID")
+    for field in ("permission_set_name", "group_name"):
+        if field in grant_request and not (
+            isinstance(grant_request[field], str) and grant_request[field]
+        ):
+            errors.append(f"{field} must be a non empty string")
+    duration_seconds = grant_request.get("duration_seconds")
+    if "duration_seconds" in grant_request and not (
+        isinstance(duration_seconds, int)
+        and not isinstance(duration_seconds, bool)
+        and duration_seconds > 0
+    ):
+        errors.append("duration_seconds must be a positive integer")
+
+    if errors:
+        raise ValueError("Invalid grant request: " + ", ".join(errors))
+    return {"group_name": None, **grant_request}
+
+
+def get_sso_user_name(caller_arn: str) -> str:
+    """
+    Return the IAM Identity Center user name of an authenticated caller,
+    or None if the caller did not sign in through IAM Identity Center
+    """
+    match = SSO_USER_SESSION_ARN_PATTERN.fullmatch(caller_arn or "")
+    return match.group("user_name") if match else None
+
+
+class JiitGrantStore:
+    """
+    Persists grants in the application's pk/sk table. Every grant has an
+    item in a single partition sorted by expiry, so due grants are read
+    with one range query rather than a scan, and an item keyed by its
+    assignment holding its current expiry.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        hash_key: str = "pk",
+        range_key: str = "sk",
+        dynamodb_resource: boto3.resource = None,
+    ):
+        self._hash_key = hash_key
+        self._range_key = range_key
+        dynamodb_resource = (
+            dynamodb_resource if dynamodb_resource else get_resource("dynamodb")
+        )
+        self._table = dynamodb_resource.Table(table_name)
+
+    def get(self, assignment: AccountAssignment) -> JiitGrant:
+        """Load the grant of an assignment, or return None"""
+        item = self._table.get_item(
+            Key={
+                self._hash_key: ASSIGNMENT_PARTITION_KEY,
+                self._range_key: "#".join(assignment),
+            },
+            ConsistentRead=True,
+        ).get("Item")
+        return JiitGrant(assignment, int(item["expires_at"])) if item else None
+
+    def put(self, grant: JiitGrant, replaced_grant: JiitGrant = None) -> None:
+        """
+        Persist a grant, dropping the expiry item of the grant it extends.
+        Items are written in order, so an interrupted extension leaves at
+        worst a stale expiry item, which the assignment item exposes.
+        """
+        self._table.put_item(
+            Item={
+                **self._expiry_item_key(grant),
+                "assignment": list(grant.assignment),
+                "expires_at": grant.expires_at,
+            }
+        )
+        self._table.put_item(
+            Item={
+                self._hash_key: ASSIGNMENT_PARTITION_KEY,
+                self._range_key: grant.assignment_id,
+                "expires_at": grant.expires_at,
+            }
+        )
+        if replaced_grant and replaced_grant.expiry_key != grant.expiry_key:
+            self._table.delete_item(Key=self._expiry_item_key(replaced_grant))
+
+    def delete(self, grants: list, expiry_items_only: bool = False) -> None:
+        """Delete the items of revoked grants, or only their expiry items"""
+        with self._table.batch_writer() as batch:
+            for grant in grants:
+                batch.delete_item(Key=self._expiry_item_key(grant))
+                if not expiry_items_only:
+                    batch.delete_item(
+                        Key={
+                            self._hash_key: ASSIGNMENT_PARTITION_KEY,
+                            self._range_key: grant.assignment_id,
+                        }
+                    )
+
+    def list_expired(self, now: int, limit: int) -> list:
+        """
+        List up to limit grants expired at now, earliest first. Reads
+        only due items, so a sweep costs O(expired) whatever the number
+        of active grants.
+        """
+        grants = []
+        query_kwargs = {
+            "KeyConditionExpression": Key(self._hash_key).eq(EXPIRY_PARTITION_KEY)
+            # Every expiry key of second "now" sorts below the next second
+            & Key(self._range_key).lt(f"{now + 1:010d}"),
+            "ConsistentRead": True,
+            "Limit": limit,
+        }
+        while len(grants) < limit:
+            response = self._table.query(**query_kwargs)
+            grants.extend(
+                JiitGrant(
+                    AccountAssignment(*item["assignment"]), int(item["expires_at"])
+                )
+                for item in response["Items"]
+            )
+            if "LastEvaluatedKey" not in response:
+                break
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        return grants[:limit]
+
+    def list_active_assignments(self) -> set:
+        """
+        List the assignments of every grant, so that reconciliation does
+        not delete them before they expire
+        """
+        assignments = set()
+        query_kwargs = {
+            "KeyConditionExpression": Key(self._hash_key).eq(ASSIGNMENT_PARTITION_KEY),
+            "ProjectionExpression": "#sk",
+            "ExpressionAttributeNames": {"#sk": self._range_key},
+        }
+        while True:
+            response = self._table.query(**query_kwargs)
+            assignments.update(
+                AccountAssignment(*item[self._range_key].split("#"))
+                for item in response["Items"]
+            )
+            if "LastEvaluatedKey" not in response:
+                break
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        return assignments
+
+    def _expiry_item_key(self, grant: JiitGrant) -> dict:
+        return {
+            self._hash_key: EXPIRY_PARTITION_KEY,
+            self._range_key: grant.expiry_key,
+        }
+
+
+class JiitScheduler:
+    """
+    Grants time boxed assignments and revokes them once expired
+    """
+
+    def __init__(
+        self,
+        grant_store: JiitGrantStore,
+        executor: AwsAssignmentExecutor,
+        max_duration_seconds: int = 3600,
+        sweep_size: int = 500,
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - grant_store: JiitGrantStore, required
+                Store grants are recorded in
+            - executor: AwsAssignmentExecutor, required
+                Executor creating & deleting the assignments
+            - max_duration_seconds: int, optional
+                Ceiling of the duration of a grant
+            - sweep_size: int, optional
+                Maximum grants revoked per sweep
+        """
+        self._grant_store = grant_store
+        self._executor = executor
+        self._max_duration_seconds = max_duration_seconds
+        self._sweep_size = sweep_size
+
+    def grant(
+        self,
+        assignment: AccountAssignment,
+        duration_seconds: int,
+        now: int = None,
+        held_assignments: set = None,
+    ) -> JiitGrant:
+        """
+        Create an assignment and record its expiry. Granting an assignment
+        that is already granted extends it, never shortens it.
+
+        Parameters
+        ----------
+            - assignment: AccountAssignment, required
+                Assignment to grant
+            - duration_seconds: int, required
+                Duration of the grant, capped to max_duration_seconds
+            - now: int, optional
+                Epoch seconds the grant starts at
+            - held_assignments: set, optional
+                Assignments held outside JIIT, desired by RBAC or created
+                manually. Granting one of them records no grant, so that
+                no sweep ever revokes it, and returns None.
+        """
+        now = int(time.time()) if now is None else now
+        duration_seconds = min(duration_seconds, self._max_duration_seconds)
+        if duration_seconds <= 0:
+            raise ValueError("duration_seconds must be a positive integer")
+
+        current_grant = self._grant_store.get(assignment)
+        if current_grant is None and assignment in (held_assignments or set()):
+            LOGGER.info("%s is already held outside JIIT", "#".join(assignment))
+            return None
+        grant = JiitGrant(assignment, now + duration_seconds)
+        if current_grant and current_grant.expires_at >= grant.expires_at:
+            return current_grant
+
+        # Record the grant first, so a failed create is still swept
+        self._grant_store.put(grant, replaced_grant=current_grant)
+        execution_result = self._executor.execute_operations(
+            [AssignmentOperation("create", assignment)]
+        )
+        if execution_result.failed:
+            raise RuntimeError(
+                f"Failed to grant {grant.assignment_id}: "
+                + ", ".join(execution_result.failed.values())
+            )
+        return grant
+
+    def sweep(
+        self,
+        now: int = None,
+        get_remaining_time_in_millis=None,
+        get_retained_assignments=None,
+    ) -> dict:
+        """
+        Revoke the grants expired at now, deleting their assignments in
+        batches through the executor. Grants whose deletion failed or was
+        cut short by the deadline stay due and are retried next sweep.
+
+        Parameters
+        ----------
+            - now: int, optional
+                Epoch seconds grants are expired at
+            - get_remaining_time_in_millis: callable, optional
+                Remaining invocation time, typically from the Lambda context
+            - get_retained_assignments: callable, optional
+                Returns the assignments desired by RBAC, called only when
+                grants are due. The grants of those assignments are dropped
+                without deleting the assignments.
+
+        Returns
+        -------
+        dict:
+            Counts of revoked, retained & failed grants
+        """
+        now = int(time.time()) if now is None else now
+        due_grants, stale_grants = [], []
+        for grant in self._grant_store.list_expired(now, self._sweep_size):
+            current_grant = self._grant_store.get(grant.assignment)
+            if current_grant and current_grant.expires_at > now:
+                stale_grants.append(grant)
+            else:
+                due_grants.append(grant)
+
+        # Expiry items left behind by interrupted extensions revoke nothing
+        self._grant_store.delete(stale_grants, expiry_items_only=True)
+        if not due_grants:
+            return {"revoked": 0, "retained": 0, "failed": 0}
+
+        # Assignments RBAC also grants outlive their grants
+        retained_grants = []
+        if get_retained_assignments:
+            retained_assignments = get_retained_assignments()
+            retained_grants = [
+                grant
+                for grant in due_grants
+                if grant.assignment in retained_assignments
+            ]
+            due_grants = [
+                grant
+                for grant in due_grants
+                if grant.assignment not in retained_assignments
+            ]
+            self._grant_store.delete(retained_grants)
+
+        operations = [
+            AssignmentOperation("delete", grant.assignment) for grant in due_grants
+        ]
+        execution_result = self._executor.execute_operations(
+            operations, get_remaining_time_in_millis=get_remaining_time_in_millis
+        )
+        succeeded_operation_ids = set(execution_result.succeeded)
+        revoked_grants = [
+            grant
+            for grant, operation in zip(due_grants, operations)
+            if operation.operation_id in succeeded_operation_ids
+        ]
+        self._grant_store.delete(revoked_grants)
+        LOGGER.info(
+            "Revoked %s expired grants, retained %s, %s failed",
+            len(revoked_grants),
+            len(retained_grants),
+            len(execution_result.failed),
+        )
+        return {
+            "revoked": len(revoked_grants),
+            "retained": len(retained_grants),
+            "failed": len(execution_result.failed),
+        }
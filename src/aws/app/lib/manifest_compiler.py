@@ -0,0 +1,388 @@
+"""
+Module to compile manifests, single files or directories of fragments,
+into validated, normalized rule plans that are cached by content hash,
+so that unchanged manifests are neither parsed nor validated again
+"""
+import os
+import glob
+import json
+import time
+import hashlib
+import logging
+import functools
+import concurrent.futures
+import jsonschema
+from .utils import load_file
+from .snapshot_cache import Snapshot, SnapshotStore, FileSnapshotStore
+
+LOGGER = logging.getLogger(__name__)
+
+# Version of the compiled rule plan format, bumped on format changes
+MANIFEST_PLAN_VERSION = 2
+
+# Schema keyword marking properties whose values are matched case insensitively
+CASE_INSENSITIVE_KEYWORD = "x-case-insensitive"
+
+# File extensions of manifest fragments within a directory
+MANIFEST_FILE_EXTENSIONS = (".yaml", ".yml", ".json")
+
+# Schema manifests are validated against by default
+MANIFEST_SCHEMA_DEFINITION_FILEPATH = os.path.realpath(
+    os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "schemas",
+        "manifest_schema_definition.json",
+    )
+)
+
+
+class ManifestValidationError(jsonschema.ValidationError):
+    """
+    Validation error reporting every failing manifest entry at once
+
+        - entry_errors: list, {"section", "index", "message"} of every
+          error, index is None for errors outside of the rule lists
+    """
+
+    def __init__(self, entry_errors: list) -> None:
+        self.entry_errors = entry_errors
+        super().__init__(
+            "Validation error: "
+            + "; ".join(
+                (
+                    f"{entry_error['section']}[{entry_error['index']}]: "
+                    if entry_error["index"] is not None
+                    else ""
+                )
+                + entry_error["message"]
+                for entry_error in entry_errors
+            )
+        )
+
+
+class ManifestValidator:
+    """
+    Validator compiled once from a schema definition. Every manifest entry
+    is validated in a single pass, collecting all errors instead of
+    stopping at the first one.
+    """
+
+    def __init__(self, schema_definition: dict) -> None:
+        """
+        Parameters
+        ----------
+            - schema_definition: dict, required
+                JSON schema manifests are validated against
+        """
+        validator_class = jsonschema.validators.validator_for(schema_definition)
+        validator_class.check_schema(schema_definition)
+        self._validator = validator_class(
+            schema_definition, format_checker=validator_class.FORMAT_CHECKER
+        )
+        self.case_insensitive_keys = get_case_insensitive_keys(schema_definition)
+
+    def validate(self, manifest_definition: dict) -> None:
+        """
+        Validate a manifest definition, raising ManifestValidationError
+        with the errors of every failing entry if it is invalid.
+        """
+        entry_errors = []
+        for error in self._validator.iter_errors(manifest_definition):
+            error_path = list(error.absolute_path)
+            entry_errors.append(
+                {
+                    "section": error_path[0] if error_path else None,
+                    "index": error_path[1] if len(error_path) > 1 else None,
+                    "message": error.message,
+                }
+            )
+        if entry_errors:
+            entry_errors.sort(
+                key=lambda entry_error: (
+                    str(entry_error["section"]),
+                    -1 if entry_error["index"] is None else entry_error["index"],
+                )
+            )
+            raise ManifestValidationError(entry_errors)
+
+
+def get_manifest_validator(schema_definition_filepath: str) -> ManifestValidator:
+    """
+    Return the validator of a JSON schema, compiled once per schema
+    content, so a schema edited in place is compiled again
+    """
+    with open(schema_definition_filepath, "rb") as file:
+        schema_bytes = file.read()
+    schema_digest = hashlib.sha256(schema_bytes).hexdigest()
+    if schema_digest not in _manifest_validators:
+        _manifest_validators[schema_digest] = ManifestValidator(
+            json.loads(schema_bytes)
+        )
+    return _manifest_validators[schema_digest]
+
+
+# Compiled validators, keyed by the digest of their schema
+_manifest_validators = {}
+
+
+class ManifestCompiler:
+    """
+    Compiles manifests against a schema. Compiled plans are keyed by the
+    hash of the manifest & schema bytes, so any change to either one is a
+    cache miss and stale plans are never served.
+    """
+
+    def __init__(self, store: SnapshotStore = None, max_workers: int = None) -> None:
+        """
+        Parameters
+        ----------
+            - store: SnapshotStore, optional
+                Store compiled plans are persisted in, defaults to files
+                in the temporary directory of the container
+            - max_workers: int, optional
+                Ceiling of fragments parsed in parallel, defaults to the
+                number of processors
+        """
+        self._store = store if store else FileSnapshotStore()
+        self._max_workers = max_workers
+
+    def compile(
+        self, manifest_definition_path: str, schema_definition_filepath: str
+    ) -> dict:
+        """
+        Return the compiled rule plan of a manifest, validating and
+        normalizing it only when no plan is cached for its content.
+
+        Parameters
+        ----------
+            - manifest_definition_path: str, required
+                Path to a YAML or JSON manifest, to a directory of manifest
+                fragments or a glob pattern matching manifest fragments
+            - schema_definition_filepath: str, required
+                Path to the JSON schema the manifest is validated against
+
+        Returns
+        -------
+        dict:
+            Normalized manifest with "rules" & "ignore" sections
+        """
+        manifest_filepaths = get_manifest_filepaths(manifest_definition_path)
+        plan_key = self._get_plan_key(manifest_filepaths, schema_definition_filepath)
+        serialized_snapshot = self._store.load(plan_key)
+        if serialized_snapshot:
+            snapshot = Snapshot.from_dict(serialized_snapshot)
+            if snapshot.version == MANIFEST_PLAN_VERSION:
+                return snapshot.data
+
+        LOGGER.info("Compiling manifest %s", manifest_definition_path)
+        manifest_validator = get_manifest_validator(
+            os.path.realpath(schema_definition_filepath)
+        )
+        manifest_fragments = self._load_fragments(
+            manifest_filepaths, manifest_validator.case_insensitive_keys
+        )
+        for manifest_fragment in manifest_fragments:
+            manifest_validator.validate(manifest_fragment)
+
+        manifest_plan = merge_manifests(
+            [
+                (manifest_filepath, normalize_manifest(manifest_fragment))
+                for manifest_filepath, manifest_fragment in zip(
+                    manifest_filepaths, manifest_fragments
+                )
+            ]
+        )
+        self._store.save(
+            plan_key,
+            Snapshot(
+                data=manifest_plan,
+                version=MANIFEST_PLAN_VERSION,
+                created_at=time.time(),
+            ).to_dict(),
+        )
+        return manifest_plan
+
+    def _load_fragments(
+        self, manifest_filepaths: list, case_insensitive_keys: frozenset
+    ) -> list:
+        """
+        Parse manifest fragments in parallel. YAML parsing is CPU bound, so
+        fragments are parsed in a process pool, falling back to threads
+        where processes can not be spawned (AWS Lambda has no /dev/shm).
+        """
+        load_fragment = functools.partial(
+            load_file, case_insensitive_keys=case_insensitive_keys
+        )
+        if len(manifest_filepaths) == 1:
+            return [load_fragment(manifest_filepaths[0])]
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._max_workers
+            ) as executor:
+                return list(executor.map(load_fragment, manifest_filepaths))
+        except (OSError, NotImplementedError):
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._max_workers
+            ) as executor:
+                return list(executor.map(load_fragment, manifest_filepaths))
+
+    def _get_plan_key(
+        self, manifest_filepaths: list, schema_definition_filepath: str
+    ) -> str:
+        content_hash = hashlib.sha256()
+        for filepath in [*manifest_filepaths, schema_definition_filepath]:
+            with open(filepath, "rb") as file:
+                file_bytes = file.read()
+            # Length prefixes keep the boundaries between files unambiguous
+            for chunk in (os.path.basename(filepath).encode("utf-8"), file_bytes):
+                content_hash.update(len(chunk).to_bytes(8, "big"))
+                content_hash.update(chunk)
+        return f"manifest-{content_hash.hexdigest()}"
+
+
+def get_case_insensitive_keys(schema_definition: dict) -> frozenset:
+    """
+    Return the names of the properties a schema marks as case insensitive,
+    following local "#/$defs/..." references.
+    """
+    case_insensitive_keys = set()
+    subschemas = [schema_definition]
+    while subschemas:
+        subschema = subschemas.pop()
+        if isinstance(subschema, list):
+            subschemas.extend(subschema)
+            continue
+        if not isinstance(subschema, dict):
+            continue
+
+        for property_name, property_schema in subschema.get("properties", {}).items():
+            if isinstance(property_schema, dict) and "$ref" in property_schema:
+                property_schema = schema_definition.get("$defs", {}).get(
+                    property_schema["$ref"].rsplit("/", 1)[-1], {}
+                )
+            if isinstance(property_schema, dict) and property_schema.get(
+                CASE_INSENSITIVE_KEYWORD
+            ):
+                case_insensitive_keys.add(property_name)
+        subschemas.extend(
+            value for key, value in subschema.items() if key != "properties"
+        )
+        subschemas.extend(subschema.get("properties", {}).values())
+    return frozenset(case_insensitive_keys)
+
+
+def get_manifest_filepaths(manifest_definition_path: str) -> list:
+    """
+    Return the sorted paths of the manifest fragments a path refers to,
+    raising ValueError if it matches none.
+    """
+    if os.path.isdir(manifest_definition_path):
+        manifest_filepaths = [
+            os.path.join(manifest_definition_path, filename)
+            for filename in os.listdir(manifest_definition_path)
+            if filename.endswith(MANIFEST_FILE_EXTENSIONS)
+        ]
+    elif glob.has_magic(manifest_definition_path):
+        manifest_filepaths = glob.glob(manifest_definition_path, recursive=True)
+    else:
+        return [manifest_definition_path]
+
+    if not manifest_filepaths:
+        raise ValueError(f"No manifest found at {manifest_definition_path}")
+    return sorted(manifest_filepaths)
+
+
+def merge_manifests(manifest_fragments: list) -> dict:
+    """
+    Merge normalized manifest fragments. Rules are indexed by what they
+    grant, exact duplicates are dropped and rules granting the same access
+    with different options raise ValueError naming both fragments.
+
+    Parameters
+    ----------
+        - manifest_fragments: list, required
+            (filepath, normalized manifest) tuples, in merge order
+
+    Returns
+    -------
+    dict:
+        Normalized manifest with "rules" & "ignore" sections
+    """
+    merged_manifest = {"rules": [], "ignore": []}
+    rule_index = {}
+    ignore_index = set()
+    conflicts = []
+    for manifest_filepath, manifest_fragment in manifest_fragments:
+        for rule in manifest_fragment["rules"]:
+            rule_key = _get_rule_key(rule)
+            if rule_key not in rule_index:
+                rule_index[rule_key] = (manifest_filepath, rule)
+                merged_manifest["rules"].append(rule)
+                continue
+
+            indexed_filepath, indexed_rule = rule_index[rule_key]
+            if indexed_rule != rule:
+                conflicts.append(
+                    f"{rule['principal_type']}:{rule['principal_name']} -> "
+                    f"{rule['permission_set_name']} in {indexed_filepath} "
+                    f"and {manifest_filepath}"
+                )
+            else:
+                LOGGER.info("Dropped duplicate rule from %s", manifest_filepath)
+
+        for ignore_rule in manifest_fragment["ignore"]:
+            ignore_key = json.dumps(ignore_rule, sort_keys=True)
+            if ignore_key not in ignore_index:
+                ignore_index.add(ignore_key)
+                merged_manifest["ignore"].append(ignore_rule)
+
+    if conflicts:
+        raise ValueError("Conflicting manifest rules: " + ", ".join(conflicts))
+    return merged_manifest
+
+
+def _get_rule_key(rule: dict) -> tuple:
+    """
+    Return the identity of a rule, the access it grants regardless of
+    options such as nesting. Names are matched case insensitively and the
+    tag predicate of ABAC rules is part of the access granted.
+    """
+    return (
+        rule["access_type"],
+        rule["target_type"],
+        tuple(sorted(target_name.lower() for target_name in rule["target_names"])),
+        rule["principal_type"],
+        rule["principal_name"].lower(),
+        rule["permission_set_name"].lower(),
+        tuple(
+            sorted(
+                (
+                    tag_key,
+                    tuple(
+                        sorted(
+                            tag_values if isinstance(tag_values, list) else [tag_values]
+                        )
+                    ),
+                )
+                for tag_key, tag_values in rule.get("target_tags", {}).items()
+            )
+        ),
+    )
+
+
+def normalize_manifest(manifest_definition: dict) -> dict:
+    """
+    Fill in the schema defaults of a validated manifest, so that consumers
+    of the compiled plan never need to handle optional keys.
+    """
+    return {
+        "rules": [
+            {"nested": False, "rule_type": "explicit", **rule}
+            for rule in manifest_definition["rules"]
+        ],
+        "ignore": [
+            {"nested": False, **ignore_rule}
+            for ignore_rule in manifest_definition.get("ignore", [])
+        ],
+    }
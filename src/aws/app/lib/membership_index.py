@@ -0,0 +1,74 @@
+"""
+Module to index the group memberships of an identity store in both
+directions, for constant time lookups of a user's groups
+"""
+
+
+class MembershipIndex:
+    """
+    In-memory index of group memberships. Memberships are held both as
+    group to users and as user to groups, so the groups of a user and the
+    users of a group are both a single lookup.
+    """
+
+    def __init__(self, group_user_ids: dict) -> None:
+        """
+        Parameters
+        ----------
+            - group_user_ids: dict, required
+                Mapping of group ID to the IDs of its member users
+        """
+        # Sets are patched in place, readers only ever get frozen copies
+        self._user_ids_by_group = {
+            group_id: set(user_ids) for group_id, user_ids in group_user_ids.items()
+        }
+        self._group_ids_by_user = {}
+        for group_id, user_ids in self._user_ids_by_group.items():
+            for user_id in user_ids:
+                self._group_ids_by_user.setdefault(user_id, set()).add(group_id)
+
+    @property
+    def group_ids(self) -> frozenset:
+        """IDs of every indexed group"""
+        return frozenset(self._user_ids_by_group)
+
+    def get_group_ids(self, user_id: str) -> frozenset:
+        """Return the IDs of the groups a user is a member of"""
+        return frozenset(self._group_ids_by_user.get(user_id, ()))
+
+    def get_user_ids(self, group_id: str) -> frozenset:
+        """Return the IDs of the member users of a group"""
+        return frozenset(self._user_ids_by_group.get(group_id, ()))
+
+    def update_user(self, user_id: str, group_ids) -> bool:
+        """
+        Replace the groups of a user, patching both directions of the
+        index in O(changed groups)
+
+        Returns
+        -------
+        bool:
+            True if the memberships of the user changed
+        """
+        group_ids = set(group_ids)
+        current_group_ids = self._group_ids_by_user.get(user_id, set())
+        if group_ids == current_group_ids:
+            return False
+
+        for group_id in current_group_ids - group_ids:
+            self._user_ids_by_group[group_id].discard(user_id)
+        for group_id in group_ids - current_group_ids:
+            self._user_ids_by_group.setdefault(group_id, set()).add(user_id)
+
+        if group_ids:
+            self._group_ids_by_user[user_id] = group_ids
+        else:
+            self._group_ids_by_user.pop(user_id, None)
+        return True
+
+    def to_dict(self) -> dict:
+        """Return the mapping of group ID to the sorted IDs of its users"""
+        return {
+            group_id: sorted(user_ids)
+            for group_id, user_ids in self._user_ids_by_group.items()
+        }
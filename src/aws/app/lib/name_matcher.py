@@ -0,0 +1,66 @@
+"""
+Module to match names against many glob or regex patterns at once, with
+a single combined regular expression scanning every name only once
+"""
+import re
+import fnmatch
+
+# Prefix marking a pattern as a regular expression rather than a glob
+REGEX_PATTERN_PREFIX = "^"
+
+
+def translate_pattern(pattern: str) -> str:
+    """
+    Translate a pattern into a regular expression. Patterns starting with
+    "^" are regular expressions matched from the start of the name, every
+    other pattern is a glob ("*", "?", "[...]") matching the whole name.
+    """
+    if pattern.startswith(REGEX_PATTERN_PREFIX):
+        re.compile(pattern)
+        return pattern
+    return fnmatch.translate(pattern)
+
+
+class NameMatcher:
+    """
+    Matcher of names against a set of patterns, case insensitively.
+
+    Every pattern is compiled into an optional lookahead with its own named
+    group, so matching a name against the combined expression evaluates
+    all patterns in one call and reports each pattern that matched, not
+    just the first alternative.
+    """
+
+    def __init__(self, patterns) -> None:
+        """
+        Parameters
+        ----------
+            - patterns: iterable, required
+                Glob or "^" prefixed regex patterns. Regex patterns may not
+                contain backreferences to numbered groups.
+        """
+        self.patterns = list(dict.fromkeys(patterns))
+        self._regex = re.compile(
+            "".join(
+                f"(?=(?P<p{pattern_number}>{translate_pattern(pattern)}))?"
+                for pattern_number, pattern in enumerate(self.patterns)
+            ),
+            re.IGNORECASE,
+        )
+        self._pattern_group_names = [
+            (f"p{pattern_number}", pattern)
+            for pattern_number, pattern in enumerate(self.patterns)
+        ]
+
+    def match(self, name: str) -> list:
+        """
+        Return the patterns matching a name
+        """
+        if not self.patterns:
+            return []
+        name_match = self._regex.match(name)
+        return [
+            pattern
+            for group_name, pattern in self._pattern_group_names
+            if name_match.group(group_name) is not None
+        ]
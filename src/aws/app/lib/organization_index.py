@@ -0,0 +1,121 @@
+"""
+Module to index a crawled AWS organization for constant time lookups
+of accounts and OUs by ID or name
+"""
+
+
+class OrganizationIndex:
+    """
+    In-memory index of an organization tree. Names are indexed case
+    insensitively and map to sets of IDs, since neither account nor OU
+    names are unique within an organization.
+    """
+
+    def __init__(
+        self, root_ou_id: str, ou_account_map: dict, ou_metadata: dict
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - root_ou_id: str, required
+                ID of the OU (or root) the organization was crawled from
+            - ou_account_map: dict, required
+                Mapping of OU ID to the list of its active accounts
+            - ou_metadata: dict, required
+                Mapping of OU ID to its "Name" and "ParentId"
+        """
+        self.root_ou_id = root_ou_id
+
+        # Parent/child links
+        self.ou_parent_ids = {}
+        self.ou_child_ids = {ou_id: [] for ou_id in ou_account_map}
+        self.account_parent_ids = {}
+
+        # ID -> name & name -> IDs indexes
+        self.ou_names = {}
+        self.account_names = {}
+        self._ou_ids_by_name = {}
+        self._account_ids_by_name = {}
+
+        for ou_id, accounts in ou_account_map.items():
+            ou_details = ou_metadata.get(ou_id, {})
+            self.ou_names[ou_id] = ou_details.get("Name", "")
+            self._ou_ids_by_name.setdefault(self.ou_names[ou_id].lower(), set()).add(
+                ou_id
+            )
+
+            parent_ou_id = ou_details.get("ParentId")
+            if ou_id != root_ou_id and parent_ou_id in self.ou_child_ids:
+                self.ou_parent_ids[ou_id] = parent_ou_id
+                self.ou_child_ids[parent_ou_id].append(ou_id)
+
+            for account in accounts:
+                self.account_parent_ids[account["Id"]] = ou_id
+                self.account_names[account["Id"]] = account["Name"]
+                self._account_ids_by_name.setdefault(
+                    account["Name"].lower(), set()
+                ).add(account["Id"])
+
+        # Descendant accounts, folded bottom-up from the deepest OUs
+        self._ou_account_ids = {
+            ou_id: frozenset(account["Id"] for account in accounts)
+            for ou_id, accounts in ou_account_map.items()
+        }
+        self._ou_descendant_account_ids = {}
+        for ou_id in reversed(self._breadth_first_ou_ids()):
+            self._ou_descendant_account_ids[ou_id] = self._ou_account_ids[ou_id].union(
+                *(
+                    self._ou_descendant_account_ids[child_ou_id]
+                    for child_ou_id in self.ou_child_ids[ou_id]
+                )
+            )
+
+    def _breadth_first_ou_ids(self) -> list:
+        """
+        Return every indexed OU ID, parents always before their children
+        """
+        ou_ids = [
+            ou_id for ou_id in self.ou_child_ids if ou_id not in self.ou_parent_ids
+        ]
+        for ou_id in ou_ids:
+            ou_ids.extend(self.ou_child_ids[ou_id])
+        return ou_ids
+
+    @property
+    def account_ids(self) -> frozenset:
+        """IDs of every indexed account"""
+        return frozenset(self.account_parent_ids)
+
+    def get_account_ids(self, account_identifier: str) -> set:
+        """
+        Return the IDs of the accounts matching an account ID or name
+        """
+        if account_identifier in self.account_names:
+            return {account_identifier}
+        return set(self._account_ids_by_name.get(account_identifier.lower(), ()))
+
+    def get_ou_ids(self, ou_identifier: str) -> set:
+        """
+        Return the IDs of the OUs matching an OU ID or name
+        """
+        if ou_identifier in self.ou_names:
+            return {ou_identifier}
+        return set(self._ou_ids_by_name.get(ou_identifier.lower(), ()))
+
+    def get_ou_account_ids(self, ou_id: str, nested: bool = False) -> frozenset:
+        """
+        Return the IDs of the accounts directly under an OU or, when
+        nested, under the OU and all of its descendant OUs
+        """
+        if nested:
+            return self._ou_descendant_account_ids.get(ou_id, frozenset())
+        return self._ou_account_ids.get(ou_id, frozenset())
+
+    def get_ou_path(self, ou_id: str) -> list:
+        """
+        Return the OU IDs from the root down to the given OU
+        """
+        ou_path = [ou_id]
+        while ou_path[-1] in self.ou_parent_ids:
+            ou_path.append(self.ou_parent_ids[ou_path[-1]])
+        return ou_path[::-1]
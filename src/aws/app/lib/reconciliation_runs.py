@@ -0,0 +1,526 @@
+"""
+Module to persist reconciliation runs in DynamoDB, so that plans too
+large for a single Lambda invocation are drained slice by slice across
+self re-enqueued invocations
+"""
+import json
+import time
+import uuid
+import zlib
+import logging
+import dataclasses
+import boto3
+import botocore.exceptions
+from boto3.dynamodb.conditions import Attr, Key
+from .aws_clients import get_resource
+from .aws_sso_resolver import AccountAssignment
+from .aws_assignment_planner import AssignmentPlan
+from .aws_assignment_executor import (
+    AwsAssignmentExecutor,
+    AssignmentOperation,
+    iter_plan_operations,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# Source of the events continuing a reconciliation run
+RECONCILIATION_EVENT_SOURCE = "sso-manager.reconciliation"
+
+# Plan operations stored per DynamoDB item
+PLAN_CHUNK_SIZE = 1000
+
+# Run statuses
+IN_PROGRESS_STATUS = "IN_PROGRESS"
+COMPLETED_STATUS = "COMPLETED"
+
+# Partition of the item reserving reconciliation for the active runs
+ACTIVE_RUNS_PARTITION_KEY = "RECONCILIATION#ACTIVE"
+
+
+class ReconciliationRunConflictError(RuntimeError):
+    """
+    Raised when a run is started while other runs are in progress, or
+    when a run's state was written by another invocation since it loaded
+    """
+
+
+@dataclasses.dataclass
+class ReconciliationRun:
+    """
+    State of a reconciliation run
+
+        - run_id: str, unique ID of the run
+        - operations: list, AssignmentOperation instances of the plan
+        - cursor: int, number of operations already attempted. Operations
+          are executed in plan order, so the operations before the cursor
+          are exactly the completed (succeeded or failed) ones
+        - failed: dict, operation ID to failure reason
+        - status: str, IN_PROGRESS or COMPLETED
+        - fanout_id: str, ID of the sharded fan-out the run is a shard of
+        - version: int, number of checkpoints written, every checkpoint
+          is conditioned on it so concurrent writers cannot interleave
+    """
+
+    run_id: str
+    operations: list
+    cursor: int = 0
+    failed: dict = dataclasses.field(default_factory=dict)
+    status: str = IN_PROGRESS_STATUS
+    fanout_id: str = None
+    version: int = 0
+
+    @property
+    def completed_operation_ids(self) -> set:
+        """IDs of the operations attempted so far"""
+        return {operation.operation_id for operation in self.operations[: self.cursor]}
+
+    @property
+    def is_drained(self) -> bool:
+        """Whether every operation of the plan was attempted"""
+        return self.cursor >= len(self.operations)
+
+    def to_summary(self) -> dict:
+        """Summarize the progress of the run"""
+        return {
+            "run_id": self.run_id,
+            "status": self.status,
+            "cursor": self.cursor,
+            "operation_count": len(self.operations),
+            "failed": self.failed,
+            "fanout_id": self.fanout_id,
+        }
+
+
+class ReconciliationRunStore:
+    """
+    Persists reconciliation runs in the application's pk/sk table. Each
+    run is a partition holding a small, frequently updated STATE item
+    and the immutable plan split into compressed PLAN#<n> chunks. The
+    STATE item also holds the lease of the invocation processing the run.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        hash_key: str = "pk",
+        range_key: str = "sk",
+        dynamodb_resource: boto3.resource = None,
+    ):
+        self._hash_key = hash_key
+        self._range_key = range_key
+        dynamodb_resource = (
+            dynamodb_resource if dynamodb_resource else get_resource("dynamodb")
+        )
+        self._table = dynamodb_resource.Table(table_name)
+
+    def _partition_key(self, run_id: str) -> str:
+        return f"RUN#{run_id}"
+
+    def _state_key(self, run_id: str) -> dict:
+        return {
+            self._hash_key: self._partition_key(run_id),
+            self._range_key: "STATE",
+        }
+
+    def create(
+        self, assignment_plan: AssignmentPlan, fanout_id: str = None, run_id: str = None
+    ) -> ReconciliationRun:
+        """Persist a new run of an assignment plan"""
+        run = ReconciliationRun(
+            run_id=run_id if run_id else uuid.uuid4().hex,
+            operations=list(iter_plan_operations(assignment_plan)),
+            fanout_id=fanout_id,
+        )
+        with self._table.batch_writer() as batch:
+            for chunk_start in range(0, len(run.operations), PLAN_CHUNK_SIZE):
+                chunk = [
+                    [operation.action, *operation.assignment]
+                    for operation in run.operations[
+                        chunk_start : chunk_start + PLAN_CHUNK_SIZE
+                    ]
+                ]
+                batch.put_item(
+                    Item={
+                        self._hash_key: self._partition_key(run.run_id),
+                        self._range_key: f"PLAN#{chunk_start // PLAN_CHUNK_SIZE:06d}",
+                        "operations": zlib.compress(json.dumps(chunk).encode("utf-8")),
+                    }
+                )
+        self.save(run)
+        return run
+
+    def save(self, run: ReconciliationRun) -> None:
+        """
+        Checkpoint the cursor, failures & status of a run, provided no
+        other invocation checkpointed it since it was loaded, otherwise
+        raise ReconciliationRunConflictError
+        """
+        state = {
+            "cursor": run.cursor,
+            "operation_count": len(run.operations),
+            "failed": json.dumps(run.failed),
+            "status": run.status,
+            "updated_at": int(time.time()),
+            "version": run.version + 1,
+        }
+        if run.fanout_id:
+            state["fanout_id"] = run.fanout_id
+        try:
+            self._table.update_item(
+                Key=self._state_key(run.run_id),
+                UpdateExpression="SET "
+                + ", ".join(f"#{attribute} = :{attribute}" for attribute in state),
+                ConditionExpression=(
+                    Attr(self._hash_key).not_exists()
+                    if run.version == 0
+                    else Attr("version").eq(run.version)
+                ),
+                ExpressionAttributeNames={
+                    f"#{attribute}": attribute for attribute in state
+                },
+                ExpressionAttributeValues={
+                    f":{attribute}": value for attribute, value in state.items()
+                },
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            raise ReconciliationRunConflictError(
+                f"Reconciliation run {run.run_id} was checkpointed concurrently"
+            ) from e
+        run.version += 1
+
+    def acquire_lease(self, run_id: str, lease_id: str, lease_seconds: int) -> bool:
+        """
+        Lease a run to an invocation, unless another invocation holds an
+        unexpired lease on it or the run does not exist
+
+        Returns
+        -------
+        bool:
+            True if the lease was acquired
+        """
+        now = int(time.time())
+        try:
+            self._table.update_item(
+                Key=self._state_key(run_id),
+                UpdateExpression="SET lease_id = :lease_id, "
+                "lease_expires_at = :lease_expires_at",
+                ConditionExpression=Attr(self._hash_key).exists()
+                & (
+                    Attr("lease_expires_at").not_exists()
+                    | Attr("lease_expires_at").lte(now)
+                    | Attr("lease_id").eq(lease_id)
+                ),
+                ExpressionAttributeValues={
+                    ":lease_id": lease_id,
+                    ":lease_expires_at": now + lease_seconds,
+                },
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return False
+        return True
+
+    def release_lease(self, run_id: str, lease_id: str) -> None:
+        """Release the lease of a run, if still held by lease_id"""
+        try:
+            self._table.update_item(
+                Key=self._state_key(run_id),
+                UpdateExpression="REMOVE lease_id, lease_expires_at",
+                ConditionExpression=Attr("lease_id").eq(lease_id),
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+    def reserve_active_runs(self, run_ids: list, stale_after_seconds: int) -> None:
+        """
+        Record run_ids as the active runs, raising
+        ReconciliationRunConflictError while a previously reserved run is
+        in progress. Runs without a checkpoint for stale_after_seconds
+        are considered abandoned and do not block new runs.
+        """
+        active_runs_key = {
+            self._hash_key: ACTIVE_RUNS_PARTITION_KEY,
+            self._range_key: "STATE",
+        }
+        active_runs = self._table.get_item(
+            Key=active_runs_key, ConsistentRead=True
+        ).get("Item")
+        if active_runs:
+            now = int(time.time())
+            in_progress_run_ids = [
+                run_summary["run_id"]
+                for run_summary in map(self.load_summary, active_runs["run_ids"])
+                if run_summary
+                and run_summary["status"] == IN_PROGRESS_STATUS
+                and now - run_summary["updated_at"] < stale_after_seconds
+            ]
+            if in_progress_run_ids:
+                raise ReconciliationRunConflictError(
+                    "Reconciliation runs in progress: " + ", ".join(in_progress_run_ids)
+                )
+
+        # The reservation is swapped only if no other start swapped it first
+        reservation_id = uuid.uuid4().hex
+        try:
+            self._table.put_item(
+                Item={
+                    **active_runs_key,
+                    "run_ids": run_ids,
+                    "reservation_id": reservation_id,
+                },
+                ConditionExpression=(
+                    Attr("reservation_id").eq(active_runs["reservation_id"])
+                    if active_runs
+                    else Attr(self._hash_key).not_exists()
+                ),
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            raise ReconciliationRunConflictError(
+                "Reconciliation runs were started concurrently"
+            ) from e
+
+    def load_summary(self, run_id: str) -> dict:
+        """
+        Load the progress of a run without its plan, or return None if
+        it does not exist
+        """
+        state = self._table.get_item(
+            Key=self._state_key(run_id), ConsistentRead=True
+        ).get("Item")
+        if not state:
+            return None
+        return {
+            "run_id": run_id,
+            "status": state["status"],
+            "cursor": int(state["cursor"]),
+            "operation_count": int(state["operation_count"]),
+            "failed": json.loads(state["failed"]),
+            "fanout_id": state.get("fanout_id"),
+            "updated_at": int(state["updated_at"]),
+        }
+
+    def save_fanout(self, fanout_id: str, run_ids: list) -> None:
+        """Persist the shard runs of a sharded fan-out"""
+        self._table.put_item(
+            Item={
+                self._hash_key: f"FANOUT#{fanout_id}",
+                self._range_key: "STATE",
+                "run_ids": run_ids,
+                "created_at": int(time.time()),
+            }
+        )
+
+    def load_fanout(self, fanout_id: str) -> list:
+        """Load the shard run IDs of a sharded fan-out"""
+        fanout = self._table.get_item(
+            Key={self._hash_key: f"FANOUT#{fanout_id}", self._range_key: "STATE"},
+            ConsistentRead=True,
+        ).get("Item")
+        return list(fanout["run_ids"]) if fanout else []
+
+    def load(self, run_id: str) -> ReconciliationRun:
+        """Load a run, or return None if it does not exist"""
+        items = []
+        query_kwargs = {
+            "KeyConditionExpression": Key(self._hash_key).eq(
+                self._partition_key(run_id)
+            ),
+            "ConsistentRead": True,
+        }
+        while True:
+            response = self._table.query(**query_kwargs)
+            items.extend(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        state = next((item for item in items if item[self._range_key] == "STATE"), None)
+        if not state:
+            return None
+
+        # Chunks sort by their zero padded sequence number
+        operations = [
+            AssignmentOperation(operation[0], AccountAssignment(*operation[1:]))
+            for item in items
+            if item[self._range_key].startswith("PLAN#")
+            for operation in json.loads(zlib.decompress(item["operations"].value))
+        ]
+        return ReconciliationRun(
+            run_id=run_id,
+            operations=operations,
+            cursor=int(state["cursor"]),
+            failed=json.loads(state["failed"]),
+            status=state["status"],
+            fanout_id=state.get("fanout_id"),
+            version=int(state.get("version", 0)),
+        )
+
+
+class ReconciliationRunner:
+    """
+    Drains reconciliation runs one bounded slice per invocation. A slice
+    is only processed under the run's lease, and continuations carry the
+    run version they follow, so redelivered or retried invocations of the
+    same continuation neither overlap nor fork the chain.
+    """
+
+    def __init__(
+        self,
+        run_store: ReconciliationRunStore,
+        executor: AwsAssignmentExecutor,
+        slice_size: int = 500,
+        continue_run=None,
+        lease_seconds: int = 120,
+        stale_after_seconds: int = 900,
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - run_store: ReconciliationRunStore, required
+                Store runs are checkpointed to
+            - executor: AwsAssignmentExecutor, required
+                Executor applying the operations
+            - slice_size: int, optional
+                Maximum operations attempted per invocation
+            - continue_run: callable, optional
+                Called with the run ID & version to enqueue the next slice
+            - lease_seconds: int, optional
+                Duration of the lease of an invocation on a run, at least
+                the invocation timeout
+            - stale_after_seconds: int, optional
+                Age of the last checkpoint after which an in progress run
+                is considered abandoned and no longer blocks new runs
+        """
+        self._run_store = run_store
+        self._executor = executor
+        self._slice_size = slice_size
+        self._continue_run = continue_run
+        self._lease_seconds = lease_seconds
+        self._stale_after_seconds = stale_after_seconds
+
+    def start(
+        self, assignment_plan: AssignmentPlan, get_remaining_time_in_millis=None
+    ) -> ReconciliationRun:
+        """
+        Persist a new run for a plan and process its first slice, raising
+        ReconciliationRunConflictError while another run is in progress
+        """
+        run_id = uuid.uuid4().hex
+        self._run_store.reserve_active_runs([run_id], self._stale_after_seconds)
+        run = self._run_store.create(assignment_plan, run_id=run_id)
+        LOGGER.info(
+            "Started reconciliation run %s of %s operations",
+            run.run_id,
+            len(run.operations),
+        )
+        return self._process_leased_slice(
+            run.run_id, get_remaining_time_in_millis, run=run
+        )
+
+    def resume(
+        self,
+        run_id: str,
+        expected_version: int = None,
+        get_remaining_time_in_millis=None,
+    ) -> ReconciliationRun:
+        """
+        Process the next slice of a persisted run. A continuation whose
+        expected_version no longer matches the run was already followed,
+        and is dropped.
+        """
+        return self._process_leased_slice(
+            run_id, get_remaining_time_in_millis, expected_version=expected_version
+        )
+
+    def _process_leased_slice(
+        self,
+        run_id: str,
+        get_remaining_time_in_millis,
+        expected_version: int = None,
+        run: ReconciliationRun = None,
+    ) -> ReconciliationRun:
+        lease_id = uuid.uuid4().hex
+        if not self._run_store.acquire_lease(run_id, lease_id, self._lease_seconds):
+            LOGGER.info(
+                "Reconciliation run %s is missing or leased to another invocation",
+                run_id,
+            )
+            return None
+
+        try:
+            run = run if run else self._run_store.load(run_id)
+            if run.status == COMPLETED_STATUS:
+                LOGGER.info("Reconciliation run %s has nothing left to process", run_id)
+                return run
+            if expected_version is not None and run.version != expected_version:
+                LOGGER.info(
+                    "Dropping continuation of reconciliation run %s at version %s, "
+                    "the run is at version %s",
+                    run_id,
+                    expected_version,
+                    run.version,
+                )
+                return run
+            self._process_slice(run, get_remaining_time_in_millis)
+        finally:
+            self._run_store.release_lease(run_id, lease_id)
+
+        # Enqueued once the lease is released, so the next slice can take it
+        if not run.is_drained and self._continue_run:
+            self._continue_run(run.run_id, run.version)
+        return run
+
+    def _process_slice(
+        self, run: ReconciliationRun, get_remaining_time_in_millis
+    ) -> ReconciliationRun:
+        slice_start = run.cursor
+        slice_operations = run.operations[slice_start : slice_start + self._slice_size]
+
+        def checkpoint(execution_result) -> None:
+            settled_count = len(execution_result.succeeded) + len(
+                execution_result.failed
+            )
+            # The cursor stops at the first unsettled operation, operations
+            # settled after it are retried with it, creates & deletes being
+            # idempotent
+            if execution_result.unsettled:
+                unsettled_operation_ids = set(execution_result.unsettled)
+                settled_count = next(
+                    position
+                    for position, operation in enumerate(slice_operations)
+                    if operation.operation_id in unsettled_operation_ids
+                )
+            settled_operation_ids = {
+                operation.operation_id for operation in slice_operations[:settled_count]
+            }
+            run.cursor = slice_start + settled_count
+            run.failed.update(
+                {
+                    operation_id: failure_reason
+                    for operation_id, failure_reason in execution_result.failed.items()
+                    if operation_id in settled_operation_ids
+                }
+            )
+            self._run_store.save(run)
+
+        self._executor.execute_operations(
+            slice_operations,
+            checkpoint=checkpoint,
+            get_remaining_time_in_millis=get_remaining_time_in_millis,
+        )
+
+        if run.is_drained:
+            run.status = COMPLETED_STATUS
+            self._run_store.save(run)
+            LOGGER.info(
+                "Completed reconciliation run %s with %s failures",
+                run.run_id,
+                len(run.failed),
+            )
+        return run
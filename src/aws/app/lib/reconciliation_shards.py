@@ -0,0 +1,229 @@
+"""
+Module to shard reconciliation plans across parallel Lambda workers and
+aggregate the progress of their shard runs
+"""
+import zlib
+import heapq
+import uuid
+import logging
+from .aws_assignment_planner import AssignmentPlan
+from .organization_index import OrganizationIndex
+from .reconciliation_runs import (
+    ReconciliationRunStore,
+    IN_PROGRESS_STATUS,
+    COMPLETED_STATUS,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# Strategies accounts are assigned to shards with
+ACCOUNT_HASH_STRATEGY = "account_hash"
+OU_STRATEGY = "ou"
+
+
+def get_account_shard(account_id: str, shard_count: int) -> int:
+    """
+    Return the shard of an account. CRC32 is stable across processes,
+    unlike the salted built-in hash, so retries land on the same shard.
+    """
+    return zlib.crc32(account_id.encode("utf-8")) % shard_count
+
+
+def _get_account_subtree_id(
+    account_id: str, organization_index: OrganizationIndex
+) -> str:
+    """
+    Return the ID of the top level OU an account sits under, the root
+    for accounts directly under it and the account ID for unknown ones
+    """
+    parent_ou_id = organization_index.account_parent_ids.get(account_id)
+    if parent_ou_id is None:
+        return account_id
+    ou_path = organization_index.get_ou_path(parent_ou_id)
+    return ou_path[1] if len(ou_path) > 1 else ou_path[0]
+
+
+def partition_plan(
+    assignment_plan: AssignmentPlan,
+    shard_count: int,
+    strategy: str = ACCOUNT_HASH_STRATEGY,
+    organization_index: OrganizationIndex = None,
+) -> list:
+    """
+    Split an assignment plan into shard plans, keeping every operation
+    of an account in the same shard.
+
+    Parameters
+    ----------
+        - assignment_plan: AssignmentPlan, required
+            Plan to split
+        - shard_count: int, required
+            Number of shards to split the plan into
+        - strategy: str, optional
+            account_hash to spread accounts by a stable hash of their ID,
+            ou to keep top level OU subtrees together, balanced by size
+        - organization_index: OrganizationIndex, optional
+            Index of the organization, required by the ou strategy
+
+    Returns
+    -------
+    list:
+        shard_count AssignmentPlan instances, some possibly empty
+    """
+    if strategy == OU_STRATEGY:
+        if organization_index is None:
+            raise ValueError("The ou strategy requires an organization index")
+
+        # Longest processing time first: largest subtrees go to the
+        # least loaded shard
+        subtree_operation_counts = {}
+        for assignment in assignment_plan.creates + assignment_plan.deletes:
+            subtree_id = _get_account_subtree_id(
+                assignment.account_id, organization_index
+            )
+            subtree_operation_counts[subtree_id] = (
+                subtree_operation_counts.get(subtree_id, 0) + 1
+            )
+
+        shard_loads = [(0, shard) for shard in range(shard_count)]
+        subtree_shards = {}
+        for subtree_id, operation_count in sorted(
+            subtree_operation_counts.items(), key=lambda item: (-item[1], item[0])
+        ):
+            shard_load, shard = heapq.heappop(shard_loads)
+            subtree_shards[subtree_id] = shard
+            heapq.heappush(shard_loads, (shard_load + operation_count, shard))
+
+        def get_shard(account_id: str) -> int:
+            return subtree_shards[
+                _get_account_subtree_id(account_id, organization_index)
+            ]
+
+    elif strategy == ACCOUNT_HASH_STRATEGY:
+
+        def get_shard(account_id: str) -> int:
+            return get_account_shard(account_id, shard_count)
+
+    else:
+        raise ValueError(f"Unsupported shard strategy: {strategy}")
+
+    shard_plans = [AssignmentPlan() for _ in range(shard_count)]
+    for assignment in assignment_plan.creates:
+        shard_plans[get_shard(assignment.account_id)].creates.append(assignment)
+    for assignment in assignment_plan.deletes:
+        shard_plans[get_shard(assignment.account_id)].deletes.append(assignment)
+    return shard_plans
+
+
+class ShardCoordinator:
+    """
+    Fans a plan out as one reconciliation run per shard and aggregates
+    the progress of the shard runs
+    """
+
+    def __init__(
+        self,
+        run_store: ReconciliationRunStore,
+        dispatch_run,
+        shard_count: int,
+        strategy: str = ACCOUNT_HASH_STRATEGY,
+        stale_after_seconds: int = 900,
+    ) -> None:
+        """
+        Parameters
+        ----------
+            - run_store: ReconciliationRunStore, required
+                Store shard runs are persisted to
+            - dispatch_run: callable, required
+                Called with a run ID & version to hand the run to a
+                worker, e.g. an asynchronous Lambda invocation, a queue
+                message or, locally, the runner itself
+            - shard_count: int, required
+                Number of shards plans are split into
+            - strategy: str, optional
+                Shard strategy, see partition_plan
+            - stale_after_seconds: int, optional
+                Age of the last checkpoint after which an in progress run
+                is considered abandoned and no longer blocks new fan-outs
+        """
+        self._run_store = run_store
+        self._dispatch_run = dispatch_run
+        self._shard_count = shard_count
+        self._strategy = strategy
+        self._stale_after_seconds = stale_after_seconds
+
+    def start(
+        self,
+        assignment_plan: AssignmentPlan,
+        organization_index: OrganizationIndex = None,
+    ) -> dict:
+        """
+        Persist a shard run per non-empty shard and dispatch them, raising
+        ReconciliationRunConflictError while another run is in progress
+
+        Returns
+        -------
+        dict:
+            The fan-out ID & the IDs of its shard runs
+        """
+        fanout_id = uuid.uuid4().hex
+        shard_plans = {
+            uuid.uuid4().hex: shard_plan
+            for shard_plan in partition_plan(
+                assignment_plan,
+                self._shard_count,
+                strategy=self._strategy,
+                organization_index=organization_index,
+            )
+            if shard_plan
+        }
+        run_ids = list(shard_plans)
+        self._run_store.reserve_active_runs(run_ids, self._stale_after_seconds)
+        shard_runs = [
+            self._run_store.create(shard_plan, fanout_id=fanout_id, run_id=run_id)
+            for run_id, shard_plan in shard_plans.items()
+        ]
+        self._run_store.save_fanout(fanout_id, run_ids)
+
+        LOGGER.info("Fanning out %s across %s shard runs", fanout_id, len(run_ids))
+        for shard_run in shard_runs:
+            self._dispatch_run(shard_run.run_id, shard_run.version)
+        return {"fanout_id": fanout_id, "run_ids": run_ids}
+
+    def aggregate(self, fanout_id: str) -> dict:
+        """
+        Aggregate the progress of the shard runs of a fan-out
+
+        Returns
+        -------
+        dict:
+            Summed progress, merged failures & COMPLETED once every shard
+            run completed
+        """
+        run_summaries = [
+            run_summary
+            for run_summary in map(
+                self._run_store.load_summary, self._run_store.load_fanout(fanout_id)
+            )
+            if run_summary
+        ]
+        failed = {}
+        for run_summary in run_summaries:
+            failed.update(run_summary["failed"])
+        return {
+            "fanout_id": fanout_id,
+            "status": (
+                COMPLETED_STATUS
+                if all(
+                    run_summary["status"] == COMPLETED_STATUS
+                    for run_summary in run_summaries
+                )
+                else IN_PROGRESS_STATUS
+            ),
+            "shards": len(run_summaries),
+            "cursor": sum(run_summary["cursor"] for run_summary in run_summaries),
+            "operation_count": sum(
+                run_summary["operation_count"] for run_summary in run_summaries
+            ),
+            "failed": failed,
+        }
@@ -0,0 +1,226 @@
+"""
+Module to persist versioned, TTL-bounded snapshots of crawled AWS
+state across Lambda invocations
+"""
+import os
+import abc
+import json
+import time
+import uuid
+import zlib
+import tempfile
+import threading
+import dataclasses
+import boto3
+import botocore.exceptions
+from boto3.dynamodb.conditions import Attr
+from .aws_clients import get_resource
+
+
+class SnapshotConflictError(RuntimeError):
+    """
+    Raised when a snapshot is saved over a revision other than the one it
+    was patched from, i.e. another writer saved the snapshot meanwhile
+    """
+
+
+@dataclasses.dataclass
+class Snapshot:
+    """
+    Versioned snapshot of a crawled data structure.
+
+        - data: dict, snapshot payload
+        - version: int, payload format version
+        - created_at: float, epoch seconds at which the payload was crawled
+        - revision: str, unique ID of the write that saved the snapshot,
+          empty for snapshots saved before revisions were recorded
+    """
+
+    data: dict
+    version: int
+    created_at: float
+    revision: str = ""
+
+    def to_dict(self) -> dict:
+        """Serialize the snapshot into a JSON compatible dictionary"""
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_dict(cls, snapshot: dict) -> "Snapshot":
+        """Deserialize a snapshot previously produced by to_dict"""
+        return cls(
+            data=snapshot["data"],
+            version=snapshot["version"],
+            created_at=snapshot["created_at"],
+            revision=snapshot.get("revision", ""),
+        )
+
+
+class SnapshotStore(abc.ABC):
+    """
+    Base class of the backing stores snapshots are persisted in
+    """
+
+    @abc.abstractmethod
+    def load(self, key: str) -> dict:
+        """Return the serialized snapshot stored under key, or None"""
+
+    @abc.abstractmethod
+    def save(self, key: str, snapshot: dict, expected_revision: str = None) -> None:
+        """
+        Persist a serialized snapshot under key. When expected_revision is
+        given, the snapshot stored under key must still be that revision,
+        otherwise SnapshotConflictError is raised and nothing is written.
+        """
+
+
+class FileSnapshotStore(SnapshotStore):
+    """
+    Snapshot store backed by the local filesystem. On Lambda the default
+    directory is /tmp, which survives for the lifetime of a warm container.
+    """
+
+    def __init__(self, directory: str = None) -> None:
+        self._directory = directory if directory else tempfile.gettempdir()
+        self._lock = threading.Lock()
+
+    def _snapshot_filepath(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.json")
+
+    def load(self, key: str) -> dict:
+        try:
+            with open(self._snapshot_filepath(key), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, key: str, snapshot: dict, expected_revision: str = None) -> None:
+        # The directory belongs to a single container, a lock fences writers
+        with self._lock:
+            if expected_revision is not None:
+                stored_snapshot = self.load(key) or {}
+                if stored_snapshot.get("revision", "") != expected_revision:
+                    raise SnapshotConflictError(f"Snapshot {key} was saved meanwhile")
+
+            # Write to a temporary file first so readers never see partial files
+            filepath = self._snapshot_filepath(key)
+            temporary_filepath = f"{filepath}.{os.getpid()}.tmp"
+            with open(temporary_filepath, "w", encoding="utf-8") as file:
+                json.dump(snapshot, file)
+            os.replace(temporary_filepath, filepath)
+
+
+class DynamoDBSnapshotStore(SnapshotStore):
+    """
+    Snapshot store backed by the application's pk/sk DynamoDB table.
+    Snapshots are stored zlib compressed in a single binary attribute,
+    which keeps large organizations well under the 400KB item limit.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        hash_key: str = "pk",
+        range_key: str = "sk",
+        partition_key: str = "SNAPSHOT",
+        dynamodb_resource: boto3.resource = None,
+    ) -> None:
+        self._hash_key = hash_key
+        self._range_key = range_key
+        self._partition_key = partition_key
+        dynamodb_resource = (
+            dynamodb_resource if dynamodb_resource else get_resource("dynamodb")
+        )
+        self._table = dynamodb_resource.Table(table_name)
+
+    def load(self, key: str) -> dict:
+        item = self._table.get_item(
+            Key={self._hash_key: self._partition_key, self._range_key: key},
+            ConsistentRead=True,
+        ).get("Item")
+        if not item:
+            return None
+        return json.loads(zlib.decompress(item["payload"].value))
+
+    def save(self, key: str, snapshot: dict, expected_revision: str = None) -> None:
+        condition = {}
+        if expected_revision is not None:
+            condition["ConditionExpression"] = (
+                Attr("revision").eq(expected_revision)
+                if expected_revision
+                else Attr("revision").not_exists()
+            )
+        try:
+            self._table.put_item(
+                Item={
+                    self._hash_key: self._partition_key,
+                    self._range_key: key,
+                    "revision": snapshot.get("revision", ""),
+                    "payload": zlib.compress(json.dumps(snapshot).encode("utf-8")),
+                },
+                **condition,
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            raise SnapshotConflictError(f"Snapshot {key} was saved meanwhile") from e
+
+
+class SnapshotCache:
+    """
+    TTL-bounded cache of versioned snapshots on top of a snapshot store
+    """
+
+    def __init__(self, store: SnapshotStore, ttl_seconds: int) -> None:
+        """
+        Parameters
+        ----------
+            - store: SnapshotStore, required
+                Backing store snapshots are persisted in
+            - ttl_seconds: int, required
+                Age after which a snapshot is considered expired
+        """
+        self._store = store
+        self._ttl_seconds = ttl_seconds
+
+    def is_expired(self, created_at: float) -> bool:
+        """Return whether a snapshot crawled at created_at has expired"""
+        return time.time() - created_at >= self._ttl_seconds
+
+    def get(self, key: str, version: int) -> Snapshot:
+        """
+        Return the snapshot stored under key, or None if it is missing,
+        expired or was written with a payload version other than version.
+        """
+        serialized_snapshot = self._store.load(key)
+        if not serialized_snapshot:
+            return None
+
+        snapshot = Snapshot.from_dict(serialized_snapshot)
+        if snapshot.version != version or self.is_expired(snapshot.created_at):
+            return None
+        return snapshot
+
+    def put(
+        self,
+        key: str,
+        data: dict,
+        version: int,
+        created_at: float = None,
+        expected_revision: str = None,
+    ) -> Snapshot:
+        """
+        Persist data as a snapshot of the given version under key. Passing
+        created_at keeps the age of a snapshot that was patched in place
+        rather than recrawled, so its TTL still forces a periodic resync.
+        Passing the expected_revision the data was patched from raises
+        SnapshotConflictError if another writer saved the key meanwhile.
+        """
+        snapshot = Snapshot(
+            data=data,
+            version=version,
+            created_at=created_at if created_at is not None else time.time(),
+            revision=uuid.uuid4().hex,
+        )
+        self._store.save(key, snapshot.to_dict(), expected_revision=expected_revision)
+        return snapshot
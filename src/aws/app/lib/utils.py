@@ -14,64 +14,122 @@ import dataclasses
 LOGGER = logging.getLogger(__name__)
 
 
-def load_file(filepath: str) -> dict:
-    """Loads a YAML or JSON file and returns its content as a dictionary."""
+# libyaml backed loader, when PyYAML was built against libyaml
+YAML_LOADER = getattr(  # pylint: disable=invalid-name
+    yaml, "CSafeLoader", yaml.SafeLoader
+)
+
+
+def load_file(filepath: str, case_insensitive_keys: frozenset = frozenset()) -> dict:
+    """
+    Loads a YAML or JSON file and returns its content as a dictionary.
+
+    Parameters
+    ----------
+        - filepath: str, required
+            Path to a .yaml, .yml or .json file
+        - case_insensitive_keys: frozenset, optional
+            Keys whose string values are lowercased while the file is
+            parsed, every other value is returned as written
+    """
     if filepath.endswith((".yaml", ".yml")):
         with open(filepath, "r") as file:
-            return convert_strings_to_lowercase(yaml.safe_load(file))
+            return yaml.load(file, Loader=get_yaml_loader(case_insensitive_keys))
     elif filepath.endswith(".json"):
         with open(filepath, "r") as file:
-            return json.load(file)
+            return json.load(
+                file,
+                object_hook=functools.partial(
+                    lowercase_values, case_insensitive_keys=case_insensitive_keys
+                ),
+            )
     else:
         raise ValueError(
             "Unsupported file format. Only .yaml, .yml, and .json are supported."
         )
 
 
-def convert_strings_to_lowercase(item):
+@functools.lru_cache(maxsize=None)
+def get_yaml_loader(case_insensitive_keys: frozenset):
+    """
+    Return a YAML loader lowercasing the string values of the given keys
+    as mappings are constructed, so no second pass over the tree is needed.
     """
-    Recursively traverse a dictionary and convert all string values to lowercase.
+    if not case_insensitive_keys:
+        return YAML_LOADER
 
-    :param d: Dictionary to be processed
-    :return: Dictionary with all string values converted to lowercase
+    def construct_mapping(loader, node) -> dict:
+        return lowercase_values(loader.construct_mapping(node), case_insensitive_keys)
+
+    yaml_loader = type("CaseInsensitiveLoader", (YAML_LOADER,), {})
+    yaml_loader.add_constructor(
+        yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG, construct_mapping
+    )
+    return yaml_loader
+
+
+def lowercase_values(mapping: dict, case_insensitive_keys: frozenset) -> dict:
     """
-    if isinstance(item, dict):
-        return {k: convert_strings_to_lowercase(v) for k, v in item.items()}
-    elif isinstance(item, list):
-        return [convert_strings_to_lowercase(item) for item in item]
-    elif isinstance(item, str):
-        return item.lower()
-    else:
-        return item
+    Lowercase, in place, the string values of the case insensitive keys
+    of a mapping.
+    """
+    for key in case_insensitive_keys.intersection(mapping):
+        if isinstance(mapping[key], str):
+            mapping[key] = mapping[key].lower()
+    return mapping
 
 
-def recursive_process_dict(dict_object: dict):
+def process_dict(dict_object: dict, to_dynamodb: bool = True) -> dict:
     """
-    Utils function to recursively parse and process dictionary values
-    and adjust item source datatypes into target dataypes
+    Utils function to adjust, in place, the values of a dictionary and of
+    its nested dictionaries & lists to or from DynamoDB datatypes. Nested
+    containers are walked with an explicit stack rather than recursion,
+    so deeply nested items neither hit the recursion limit nor pay for a
+    call per level.
+
+        - float -> decimal.Decimal, when converting to DynamoDB
+        - decimal.Decimal -> int or float, when converting from DynamoDB
+        - datetime.datetime -> str
 
     Parameters
     ----------
         - dict_object: dict, required
             Dictionary object to be processed
+        - to_dynamodb: bool, optional
+            Whether to convert into, rather than from, DynamoDB datatypes
 
     Returns
     -------
     dict_object:
         Processed dictionary object
     """
-    for k, v in dict_object.items():
-        if isinstance(v, dict):
-            recursive_process_dict(v)
-        else:
-            if isinstance(v, (int, float)):
-                dict_object[k] = decimal.Decimal(v)
-            elif isinstance(v, decimal.Decimal):
-                dict_object[k] = float(v)
-            elif isinstance(v, datetime.datetime):
-                dict_object[k] = v.strftime("%y-%m-%d %H:%M:%S")
-            else:
-                continue
+    # Floats are converted through their shortest repr, which DynamoDB
+    # accepts, rather than their inexact binary expansion
+    number_type, convert_number = (
+        (float, lambda value: decimal.Decimal(repr(value)))
+        if to_dynamodb
+        else (
+            decimal.Decimal,
+            lambda value: (
+                int(value) if value == value.to_integral_value() else float(value)
+            ),
+        )
+    )
+    containers = [dict_object]
+    while containers:
+        container = containers.pop()
+        keys = (
+            container.keys() if isinstance(container, dict) else range(len(container))
+        )
+        for key in keys:
+            value = container[key]
+            value_type = type(value)
+            if value_type is dict or value_type is list:
+                containers.append(value)
+            elif value_type is number_type:
+                container[key] = convert_number(value)
+            elif value_type is datetime.datetime:
+                container[key] = value.strftime("%y-%m-%d %H:%M:%S")
     return dict_object
 
 
@@ -116,7 +174,7 @@ def handle_aws_sso_errors(func):
                 return "Specified resource doesn't exist", 400
             elif type(e).__name__ == "ThrottlingException":
                 LOGGER.error(e)
-                return "Invalid input parameters", 400
+                return "Too many requests, retry later", 429
             elif type(e).__name__ == "ValidationException":
                 LOGGER.error(e)
                 return "Syntax error", 400
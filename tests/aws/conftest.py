@@ -4,10 +4,14 @@
 
 import os
 import json
+import uuid
+import datetime
 import itertools
+import collections
 import moto
 import boto3
 import pytest
+from aws.app.lib import aws_clients
 
 ################################################
 #               Helper functions               #
@@ -95,6 +99,187 @@ def delete_aws_ous_accounts(
         delete_accounts_in_child_ous(root_ou_id)
 
 
+class FakePaginator:
+    """
+    Single page paginator over a fake client operation
+    """
+
+    def __init__(self, operation) -> None:
+        self._operation = operation
+
+    def paginate(self, **kwargs):
+        yield self._operation(**kwargs)
+
+
+class FakeSsoAdminClient:
+    """
+    In-memory stand-in for the SSO admin APIs moto does not implement.
+    Assignment operations complete after a single status poll.
+    """
+
+    def __init__(self, permission_set_names: list = ()) -> None:
+        self.account_assignments = set()
+        self.request_counts = collections.Counter()
+        self.permission_sets = {
+            f"arn:aws:sso:::permissionSet/ssoins-instanceId/ps-{name.lower()}": name
+            for name in permission_set_names
+        }
+        self._operation_statuses = {}
+
+    def get_paginator(self, operation_name: str) -> FakePaginator:
+        return FakePaginator(getattr(self, operation_name))
+
+    def _record(self, operation_name: str) -> None:
+        self.request_counts[operation_name] += 1
+
+    def list_permission_sets(self, **kwargs) -> dict:
+        self._record("list_permission_sets")
+        return {"PermissionSets": list(self.permission_sets)}
+
+    def describe_permission_set(self, PermissionSetArn: str, **kwargs) -> dict:
+        self._record("describe_permission_set")
+        return {
+            "PermissionSet": {
+                "Name": self.permission_sets[PermissionSetArn],
+                "PermissionSetArn": PermissionSetArn,
+                "CreatedDate": datetime.datetime(2024, 1, 1),
+            }
+        }
+
+    def list_accounts_for_provisioned_permission_set(
+        self, PermissionSetArn: str, **kwargs
+    ) -> dict:
+        self._record("list_accounts_for_provisioned_permission_set")
+        return {
+            "AccountIds": sorted(
+                {
+                    assignment[0]
+                    for assignment in self.account_assignments
+                    if assignment[1] == PermissionSetArn
+                }
+            )
+        }
+
+    def list_account_assignments(
+        self, AccountId: str, PermissionSetArn: str, **kwargs
+    ) -> dict:
+        self._record("list_account_assignments")
+        return {
+            "AccountAssignments": [
+                {
+                    "AccountId": assignment[0],
+                    "PermissionSetArn": assignment[1],
+                    "PrincipalType": assignment[2],
+                    "PrincipalId": assignment[3],
+                }
+                for assignment in self.account_assignments
+                if assignment[:2] == (AccountId, PermissionSetArn)
+            ]
+        }
+
+    def _submit(self, operation_name: str, status_key: str, **kwargs) -> dict:
+        self._record(operation_name)
+        assignment = (
+            kwargs["TargetId"],
+            kwargs["PermissionSetArn"],
+            kwargs["PrincipalType"],
+            kwargs["PrincipalId"],
+        )
+        if operation_name == "create_account_assignment":
+            self.account_assignments.add(assignment)
+        else:
+            self.account_assignments.discard(assignment)
+
+        request_id = str(uuid.uuid4())
+        self._operation_statuses[request_id] = "SUCCEEDED"
+        return {status_key: {"RequestId": request_id, "Status": "IN_PROGRESS"}}
+
+    def create_account_assignment(self, **kwargs) -> dict:
+        return self._submit(
+            "create_account_assignment", "AccountAssignmentCreationStatus", **kwargs
+        )
+
+    def delete_account_assignment(self, **kwargs) -> dict:
+        return self._submit(
+            "delete_account_assignment", "AccountAssignmentDeletionStatus", **kwargs
+        )
+
+    def describe_account_assignment_creation_status(
+        self, AccountAssignmentCreationRequestId: str, **kwargs
+    ) -> dict:
+        self._record("describe_account_assignment_creation_status")
+        return {
+            "AccountAssignmentCreationStatus": {
+                "RequestId": AccountAssignmentCreationRequestId,
+                "Status": self._operation_statuses[AccountAssignmentCreationRequestId],
+            }
+        }
+
+    def describe_account_assignment_deletion_status(
+        self, AccountAssignmentDeletionRequestId: str, **kwargs
+    ) -> dict:
+        self._record("describe_account_assignment_deletion_status")
+        return {
+            "AccountAssignmentDeletionStatus": {
+                "RequestId": AccountAssignmentDeletionRequestId,
+                "Status": self._operation_statuses[AccountAssignmentDeletionRequestId],
+            }
+        }
+
+
+class FakeIdentityStoreClient:
+    """
+    In-memory stand-in for the group membership APIs moto does not
+    implement. Memberships are (group ID, user ID) tuples.
+    """
+
+    def __init__(self, group_ids: list = (), user_ids: list = ()) -> None:
+        self.group_ids = list(group_ids)
+        self.user_ids = list(user_ids)
+        self.memberships = set()
+        self.request_counts = collections.Counter()
+
+    def get_paginator(self, operation_name: str) -> FakePaginator:
+        return FakePaginator(getattr(self, operation_name))
+
+    def list_groups(self, **kwargs) -> dict:
+        self.request_counts["list_groups"] += 1
+        return {
+            "Groups": [
+                {"GroupId": group_id, "DisplayName": group_id}
+                for group_id in self.group_ids
+            ]
+        }
+
+    def list_users(self, **kwargs) -> dict:
+        self.request_counts["list_users"] += 1
+        return {
+            "Users": [
+                {"UserId": user_id, "UserName": user_id} for user_id in self.user_ids
+            ]
+        }
+
+    def list_group_memberships(self, GroupId: str, **kwargs) -> dict:
+        self.request_counts["list_group_memberships"] += 1
+        return {
+            "GroupMemberships": [
+                {"GroupId": group_id, "MemberId": {"UserId": user_id}}
+                for group_id, user_id in sorted(self.memberships)
+                if group_id == GroupId
+            ]
+        }
+
+    def list_group_memberships_for_member(self, MemberId: dict, **kwargs) -> dict:
+        self.request_counts["list_group_memberships_for_member"] += 1
+        return {
+            "GroupMemberships": [
+                {"GroupId": group_id, "MemberId": {"UserId": user_id}}
+                for group_id, user_id in sorted(self.memberships)
+                if user_id == MemberId["UserId"]
+            ]
+        }
+
+
 ################################################
 #         Fixtures - AWS Env & Env Vars        #
 ################################################
@@ -104,6 +289,7 @@ def delete_aws_ous_accounts(
 def set_aws_creds():
     monkeypatch = pytest.MonkeyPatch()
     monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
     monkeypatch.setenv("AWS_SESSION_TOKEN", "test")
     monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
     monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
@@ -125,6 +311,17 @@ def setup_env_vars():
 ################################################
 
 
+@pytest.fixture(autouse=True)
+def clear_shared_clients() -> None:
+    """
+    Fixture to drop the shared clients around every test, so that no test
+    reuses a client created outside of its mocks
+    """
+    aws_clients.clear_clients()
+    yield
+    aws_clients.clear_clients()
+
+
 @pytest.fixture(scope="session")
 def organizations_client() -> boto3.client:
     """
@@ -152,6 +349,61 @@ def sso_admin_client() -> boto3.client:
         yield boto3.client("sso-admin")
 
 
+@pytest.fixture(scope="session")
+def dynamodb_resource() -> boto3.resource:
+    """
+    Fixture to mock AWS DynamoDB resource
+    """
+    with moto.mock_dynamodb():
+        yield boto3.resource("dynamodb")
+
+
+@pytest.fixture
+def fake_sso_admin_client() -> FakeSsoAdminClient:
+    """
+    Fixture to fake the AWS SSO admin client
+    """
+    return FakeSsoAdminClient(["AdministratorAccess", "ReadOnly"])
+
+
+@pytest.fixture
+def fake_identity_store_client() -> FakeIdentityStoreClient:
+    """
+    Fixture to fake the AWS identity store client
+    """
+    return FakeIdentityStoreClient(
+        group_ids=["g-admins", "g-developers", "g-auditors"],
+        user_ids=["u-user1", "u-user2", "u-user3"],
+    )
+
+
+################################################
+#           Fixtures - AWS DynamoDB            #
+################################################
+
+
+@pytest.fixture(scope="session")
+def setup_dynamodb_table(dynamodb_resource: boto3.resource) -> str:
+    """
+    Fixture to create the application's pk/sk DynamoDB table
+    """
+    table_name = os.getenv("DDB_TABLE_NAME")
+    dynamodb_resource.create_table(
+        TableName=table_name,
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[
+            {"AttributeName": "pk", "KeyType": "HASH"},
+            {"AttributeName": "sk", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "pk", "AttributeType": "S"},
+            {"AttributeName": "sk", "AttributeType": "S"},
+        ],
+    )
+    yield table_name
+    dynamodb_resource.Table(table_name).delete()
+
+
 ################################################
 #         Fixtures - AWS organizations         #
 ################################################
@@ -247,7 +499,7 @@ def setup_aws_environment(
             )
             for user in sso_users:
                 identity_store_client.delete_user(
-                    IdentityStoreId=identity_store_arn, UserId=user["UserId"]
+                    IdentityStoreId=identity_store_id, UserId=user["UserId"]
                 )
 
             # Delete SSO groups
@@ -262,7 +514,7 @@ def setup_aws_environment(
             )
             for group in sso_groups:
                 identity_store_client.delete_group(
-                    IdentityStoreId=identity_store_arn, GroupId=group["GroupId"]
+                    IdentityStoreId=identity_store_id, GroupId=group["GroupId"]
                 )
 
             # Delete permission sets
@@ -0,0 +1,199 @@
+"""
+Unit tests to test querying effective access from the resolved assignments
+"""
+import pytest
+from aws.app.lib.aws_sso_resolver import AccountAssignment
+from aws.app.lib.organization_index import OrganizationIndex
+from aws.app.lib.membership_index import MembershipIndex
+from aws.app.lib.access_query import AccessQueryIndex, parse_access_query
+
+# Globals vars
+ROOT_OU_ID = "r-1234"
+OU_ACCOUNT_MAP = {
+    ROOT_OU_ID: [{"Id": "000000000000", "Name": "master"}],
+    "ou-1234-prod": [{"Id": "111111111111", "Name": "workload_1_prod"}],
+    "ou-1234-payments": [{"Id": "222222222222", "Name": "payments_prod"}],
+    "ou-1234-dev": [{"Id": "333333333333", "Name": "workload_1_dev"}],
+}
+OU_METADATA = {
+    ROOT_OU_ID: {"Name": "Root"},
+    "ou-1234-prod": {"Name": "prod", "ParentId": ROOT_OU_ID},
+    "ou-1234-payments": {"Name": "payments", "ParentId": "ou-1234-prod"},
+    "ou-1234-dev": {"Name": "dev", "ParentId": ROOT_OU_ID},
+}
+ADMIN_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-administratoraccess"
+READONLY_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-readonly"
+PERMISSION_SETS = [
+    {"Name": "AdministratorAccess", "PermissionSetArn": ADMIN_ARN},
+    {"Name": "ReadOnly", "PermissionSetArn": READONLY_ARN},
+]
+PRINCIPAL_NAMES = {
+    ("GROUP", "g-admins"): "admins",
+    ("GROUP", "g-developers"): "developers",
+    ("USER", "u-user1"): "user1",
+}
+ASSIGNMENTS = {
+    AccountAssignment("111111111111", ADMIN_ARN, "GROUP", "g-admins"),
+    AccountAssignment("222222222222", ADMIN_ARN, "GROUP", "g-admins"),
+    AccountAssignment("222222222222", READONLY_ARN, "GROUP", "g-developers"),
+    AccountAssignment("333333333333", ADMIN_ARN, "GROUP", "g-developers"),
+    AccountAssignment("333333333333", READONLY_ARN, "USER", "u-user1"),
+}
+
+
+@pytest.fixture(name="access_query_index")
+def fixture_access_query_index() -> AccessQueryIndex:
+    return AccessQueryIndex(
+        ASSIGNMENTS,
+        organization_index=OrganizationIndex(ROOT_OU_ID, OU_ACCOUNT_MAP, OU_METADATA),
+        permission_sets=PERMISSION_SETS,
+        principal_names=PRINCIPAL_NAMES,
+        membership_index=MembershipIndex(
+            {"g-admins": ["u-user2"], "g-developers": ["u-user1", "u-user2"]}
+        ),
+    )
+
+
+def get_assignment_keys(assignments: list) -> list:
+    return [
+        (
+            assignment["account_id"],
+            assignment["permission_set_name"],
+            assignment["principal_name"] or assignment["principal_id"],
+        )
+        for assignment in assignments
+    ]
+
+
+# Test cases
+def test_who_has_permission_set_on_account(
+    access_query_index: AccessQueryIndex,
+) -> None:
+    # Act
+    assignments = access_query_index.query(
+        account="payments_prod", permission_set="administratoraccess"
+    )
+
+    # Assert
+    assert assignments == [
+        {
+            "account_id": "222222222222",
+            "account_name": "payments_prod",
+            "permission_set_arn": ADMIN_ARN,
+            "permission_set_name": "AdministratorAccess",
+            "principal_type": "GROUP",
+            "principal_id": "g-admins",
+            "principal_name": "admins",
+            "member_user_ids": ["u-user2"],
+        }
+    ]
+
+
+def test_what_group_can_do_in_ou(access_query_index: AccessQueryIndex) -> None:
+    # Act
+    assignments = access_query_index.query(
+        ou="prod", principal_type="group", principal="Developers"
+    )
+
+    # Assert - OUs match the accounts of their whole subtree
+    assert get_assignment_keys(assignments) == [
+        ("222222222222", "ReadOnly", "developers")
+    ]
+
+
+def test_effective_user_access(access_query_index: AccessQueryIndex) -> None:
+    # Act
+    effective_assignments = access_query_index.query(
+        principal_type="USER", principal="user1"
+    )
+    direct_assignments = access_query_index.query(
+        principal_type="USER", principal="u-user1", effective=False
+    )
+    group_only_assignments = access_query_index.query(
+        principal_type="USER", principal="u-user2", account="111111111111"
+    )
+
+    # Assert - group assignments of a user count towards its access
+    assert get_assignment_keys(effective_assignments) == [
+        ("222222222222", "ReadOnly", "developers"),
+        ("333333333333", "AdministratorAccess", "developers"),
+        ("333333333333", "ReadOnly", "user1"),
+    ]
+    assert get_assignment_keys(direct_assignments) == [
+        ("333333333333", "ReadOnly", "user1")
+    ]
+    assert get_assignment_keys(group_only_assignments) == [
+        ("111111111111", "AdministratorAccess", "admins")
+    ]
+
+
+def test_unmatched_and_invalid_queries(access_query_index: AccessQueryIndex) -> None:
+    # Assert
+    assert access_query_index.query(account="missing") == []
+    assert len(access_query_index.query()) == len(ASSIGNMENTS)
+    with pytest.raises(ValueError):
+        access_query_index.query(principal="admins")
+
+
+def test_extra_assignments_are_filtered_per_query(
+    access_query_index: AccessQueryIndex,
+) -> None:
+    # Arrange
+    jiit_assignments = {
+        AccountAssignment("111111111111", READONLY_ARN, "USER", "u-user1"),
+        AccountAssignment("222222222222", READONLY_ARN, "USER", "u-user3"),
+    }
+
+    # Act
+    user_assignments = access_query_index.query(
+        principal_type="USER",
+        principal="user1",
+        effective=False,
+        extra_assignments=jiit_assignments,
+    )
+    prod_assignments = access_query_index.query(
+        ou="prod", permission_set="readonly", extra_assignments=jiit_assignments
+    )
+
+    # Assert - extra assignments are not kept once the query is answered
+    assert get_assignment_keys(user_assignments) == [
+        ("111111111111", "ReadOnly", "user1"),
+        ("333333333333", "ReadOnly", "user1"),
+    ]
+    assert get_assignment_keys(prod_assignments) == [
+        ("111111111111", "ReadOnly", "user1"),
+        ("222222222222", "ReadOnly", "developers"),
+        ("222222222222", "ReadOnly", "u-user3"),
+    ]
+    assert access_query_index.assignments == ASSIGNMENTS
+
+
+def test_access_query_is_parsed() -> None:
+    # Act
+    access_query = parse_access_query(
+        {"principal_type": "user", "principal": "user1", "effective": "False"}
+    )
+
+    # Assert
+    assert access_query == {
+        "principal_type": "USER",
+        "principal": "user1",
+        "effective": False,
+    }
+    assert parse_access_query(None) == {}
+
+
+@pytest.mark.parametrize(
+    "query_parameters,error",
+    [
+        ({"account_id": "111111111111"}, "not an access query parameter"),
+        ({"principal_type": "role"}, "principal_type must be USER or GROUP"),
+        ({"principal": "admins"}, "principal_type is required"),
+        ({"effective": "yes"}, "effective must be true or false"),
+        ({"account": ""}, "account must be a non empty string"),
+    ],
+)
+def test_invalid_access_query_is_rejected(query_parameters: dict, error: str) -> None:
+    # Act & Assert
+    with pytest.raises(ValueError, match=error):
+        parse_access_query(query_parameters)
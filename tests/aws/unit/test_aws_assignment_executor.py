@@ -0,0 +1,197 @@
+"""
+Unit tests to test executing assignment plans
+"""
+import os
+import pytest
+import botocore.exceptions
+from aws.app.lib.aws_sso_resolver import AccountAssignment
+from aws.app.lib.aws_assignment_planner import AssignmentPlan
+from aws.app.lib.aws_assignment_executor import (
+    AwsAssignmentExecutor,
+    AssignmentOperation,
+    TokenBucket,
+)
+
+# Globals vars
+ADMIN_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-administratoraccess"
+ASSIGNMENT_PLAN = AssignmentPlan(
+    creates=[
+        AccountAssignment(f"{account_number:012d}", ADMIN_ARN, "GROUP", "g-admins")
+        for account_number in range(5)
+    ],
+    deletes=[AccountAssignment("999999999999", ADMIN_ARN, "GROUP", "g-admins")],
+)
+
+
+def create_executor(
+    sso_admin_client: pytest.fixture, **kwargs
+) -> AwsAssignmentExecutor:
+    return AwsAssignmentExecutor(
+        os.getenv("IDENTITY_STORE_ARN"),
+        sso_admin_client=sso_admin_client,
+        max_requests_per_second=1000,
+        backoff_seconds=0.001,
+        poll_interval_seconds=0,
+        **kwargs,
+    )
+
+
+# Test cases
+def test_execute_plan(fake_sso_admin_client: pytest.fixture) -> None:
+    # Arrange
+    fake_sso_admin_client.account_assignments = {tuple(ASSIGNMENT_PLAN.deletes[0])}
+    checkpoints = []
+
+    # Act
+    execution_result = create_executor(fake_sso_admin_client, batch_size=2).execute(
+        ASSIGNMENT_PLAN,
+        checkpoint=lambda result: checkpoints.append(len(result.succeeded)),
+    )
+
+    # Assert
+    assert execution_result.is_complete
+    assert not execution_result.failed
+    assert len(execution_result.succeeded) == len(ASSIGNMENT_PLAN)
+    assert checkpoints == [2, 4, 6]
+    assert fake_sso_admin_client.account_assignments == {
+        tuple(assignment) for assignment in ASSIGNMENT_PLAN.creates
+    }
+
+
+def test_resume_skips_completed_operations(
+    fake_sso_admin_client: pytest.fixture,
+) -> None:
+    # Arrange
+    completed_operation_ids = {
+        AssignmentOperation("create", assignment).operation_id
+        for assignment in ASSIGNMENT_PLAN.creates[:3]
+    }
+
+    # Act
+    execution_result = create_executor(fake_sso_admin_client).execute(
+        ASSIGNMENT_PLAN, completed_operation_ids=completed_operation_ids
+    )
+
+    # Assert
+    assert len(execution_result.succeeded) == len(ASSIGNMENT_PLAN) - 3
+    assert fake_sso_admin_client.request_counts["create_account_assignment"] == 2
+
+
+def test_deadline_leaves_operations_pending(
+    fake_sso_admin_client: pytest.fixture,
+) -> None:
+    # Arrange
+    remaining_times_in_millis = iter([60000, 1000])
+
+    # Act
+    execution_result = create_executor(fake_sso_admin_client, batch_size=4).execute(
+        ASSIGNMENT_PLAN,
+        get_remaining_time_in_millis=lambda: next(remaining_times_in_millis),
+    )
+
+    # Assert
+    assert not execution_result.is_complete
+    assert len(execution_result.succeeded) == 4
+    assert execution_result.pending == len(ASSIGNMENT_PLAN) - 4
+
+
+def test_stuck_operations_are_left_unsettled(
+    fake_sso_admin_client: pytest.fixture,
+) -> None:
+    # Arrange
+    create_account_assignment = fake_sso_admin_client.create_account_assignment
+
+    def stuck_create_account_assignment(**kwargs) -> dict:
+        response = create_account_assignment(**kwargs)
+        if kwargs["TargetId"] == ASSIGNMENT_PLAN.creates[1].account_id:
+            fake_sso_admin_client._operation_statuses[
+                response["AccountAssignmentCreationStatus"]["RequestId"]
+            ] = "IN_PROGRESS"
+        return response
+
+    fake_sso_admin_client.create_account_assignment = stuck_create_account_assignment
+
+    # Act
+    execution_result = create_executor(
+        fake_sso_admin_client, batch_size=4, max_polls=3
+    ).execute(ASSIGNMENT_PLAN)
+
+    # Assert - the stuck batch stops the execution without settling it
+    assert execution_result.unsettled == [
+        AssignmentOperation("create", ASSIGNMENT_PLAN.creates[1]).operation_id
+    ]
+    assert len(execution_result.succeeded) == 3
+    assert execution_result.pending == len(ASSIGNMENT_PLAN) - 3
+    assert (
+        fake_sso_admin_client.request_counts[
+            "describe_account_assignment_creation_status"
+        ]
+        == 4 + 2
+    )
+
+
+def test_throttled_requests_are_retried(fake_sso_admin_client: pytest.fixture) -> None:
+    # Arrange
+    create_account_assignment = fake_sso_admin_client.create_account_assignment
+    throttled_calls = iter([True, True, False, True, False])
+
+    def throttled_create_account_assignment(**kwargs) -> dict:
+        if next(throttled_calls, False):
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+                "CreateAccountAssignment",
+            )
+        return create_account_assignment(**kwargs)
+
+    fake_sso_admin_client.create_account_assignment = (
+        throttled_create_account_assignment
+    )
+    py_aws_assignment_executor = create_executor(fake_sso_admin_client, max_workers=1)
+
+    # Act
+    execution_result = py_aws_assignment_executor.execute(ASSIGNMENT_PLAN)
+
+    # Assert
+    assert not execution_result.failed
+    assert len(execution_result.succeeded) == len(ASSIGNMENT_PLAN)
+
+
+def test_persistent_throttling_fails_operation(
+    fake_sso_admin_client: pytest.fixture,
+) -> None:
+    # Arrange
+    def throttled_delete_account_assignment(**kwargs) -> dict:
+        raise botocore.exceptions.ClientError(
+            {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+            "DeleteAccountAssignment",
+        )
+
+    fake_sso_admin_client.delete_account_assignment = (
+        throttled_delete_account_assignment
+    )
+
+    # Act
+    execution_result = create_executor(fake_sso_admin_client, max_retries=2).execute(
+        ASSIGNMENT_PLAN
+    )
+
+    # Assert
+    assert list(execution_result.failed) == [
+        AssignmentOperation("delete", ASSIGNMENT_PLAN.deletes[0]).operation_id
+    ]
+
+
+def test_token_bucket_adapts_rate() -> None:
+    # Arrange
+    token_bucket = TokenBucket(rate=8)
+
+    # Act
+    token_bucket.penalize()
+    token_bucket.penalize()
+    penalized_rate = token_bucket.rate
+    for _ in range(100):
+        token_bucket.reward()
+
+    # Assert
+    assert penalized_rate == 2
+    assert token_bucket.rate == 8
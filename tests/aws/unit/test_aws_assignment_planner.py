@@ -0,0 +1,148 @@
+"""
+Unit tests to test planning account assignment changes
+"""
+import os
+import pytest
+from aws.app.lib.aws_sso_resolver import AccountAssignment
+from aws.app.lib.aws_assignment_planner import AwsAssignmentPlanner, AssignmentPlan
+
+# Globals vars
+ADMIN_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-administratoraccess"
+READONLY_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-readonly"
+
+
+def create_planner(fake_sso_admin_client: pytest.fixture) -> AwsAssignmentPlanner:
+    return AwsAssignmentPlanner(
+        os.getenv("IDENTITY_STORE_ARN"), sso_admin_client=fake_sso_admin_client
+    )
+
+
+# Test cases
+def test_list_account_assignments(fake_sso_admin_client: pytest.fixture) -> None:
+    # Arrange
+    fake_sso_admin_client.account_assignments = {
+        ("111111111111", ADMIN_ARN, "GROUP", "g-admins"),
+        ("111111111111", READONLY_ARN, "USER", "u-user1"),
+        ("222222222222", READONLY_ARN, "GROUP", "g-admins"),
+    }
+
+    # Act
+    assignments = create_planner(fake_sso_admin_client).list_account_assignments()
+    scoped_assignments = create_planner(fake_sso_admin_client).list_account_assignments(
+        account_ids={"222222222222"}
+    )
+
+    # Assert
+    assert assignments == {
+        AccountAssignment(*assignment)
+        for assignment in fake_sso_admin_client.account_assignments
+    }
+    assert scoped_assignments == {
+        AccountAssignment("222222222222", READONLY_ARN, "GROUP", "g-admins")
+    }
+
+
+def test_create_plan(fake_sso_admin_client: pytest.fixture) -> None:
+    # Arrange
+    fake_sso_admin_client.account_assignments = {
+        ("111111111111", ADMIN_ARN, "GROUP", "g-admins"),
+        ("222222222222", ADMIN_ARN, "GROUP", "g-admins"),
+        ("333333333333", ADMIN_ARN, "GROUP", "g-unmanaged"),
+    }
+    desired_assignments = {
+        AccountAssignment("111111111111", ADMIN_ARN, "GROUP", "g-admins"),
+        AccountAssignment("111111111111", READONLY_ARN, "USER", "u-user1"),
+    }
+
+    # Act
+    assignment_plan = create_planner(fake_sso_admin_client).create_plan(
+        desired_assignments,
+        account_ids={"111111111111", "222222222222"},
+        managed_scope={(ADMIN_ARN, "GROUP", "g-admins")},
+    )
+
+    # Assert
+    assert assignment_plan.creates == [
+        AccountAssignment("111111111111", READONLY_ARN, "USER", "u-user1")
+    ]
+    assert assignment_plan.deletes == [
+        AccountAssignment("222222222222", ADMIN_ARN, "GROUP", "g-admins")
+    ]
+
+
+def test_steady_state_plan_is_empty(fake_sso_admin_client: pytest.fixture) -> None:
+    # Arrange
+    fake_sso_admin_client.account_assignments = {
+        ("111111111111", ADMIN_ARN, "GROUP", "g-admins"),
+    }
+    desired_assignments = {
+        AccountAssignment("111111111111", ADMIN_ARN, "GROUP", "g-admins"),
+    }
+
+    # Act
+    assignment_plan = create_planner(fake_sso_admin_client).create_plan(
+        desired_assignments
+    )
+
+    # Assert
+    assert len(assignment_plan) == 0
+
+
+def test_plan_serialization() -> None:
+    # Arrange
+    assignment_plan = AssignmentPlan(
+        creates=[AccountAssignment("111111111111", ADMIN_ARN, "GROUP", "g-admins")],
+        deletes=[AccountAssignment("222222222222", ADMIN_ARN, "USER", "u-user1")],
+    )
+
+    # Assert
+    assert AssignmentPlan.from_dict(assignment_plan.to_dict()) == assignment_plan
+
+
+def test_create_plan_keeps_retained_assignments(
+    fake_sso_admin_client: pytest.fixture,
+) -> None:
+    # Arrange
+    fake_sso_admin_client.account_assignments = {
+        ("111111111111", ADMIN_ARN, "GROUP", "g-admins"),
+        ("111111111111", READONLY_ARN, "USER", "u-user1"),
+    }
+    jiit_assignment = AccountAssignment("111111111111", READONLY_ARN, "USER", "u-user1")
+
+    # Act
+    assignment_plan = create_planner(fake_sso_admin_client).create_plan(
+        set(), retained_assignments={jiit_assignment}, prune_unmanaged=True
+    )
+
+    # Assert
+    assert assignment_plan.creates == []
+    assert assignment_plan.deletes == [
+        AccountAssignment("111111111111", ADMIN_ARN, "GROUP", "g-admins")
+    ]
+
+
+def test_create_plan_keeps_unmanaged_assignments(
+    fake_sso_admin_client: pytest.fixture,
+) -> None:
+    # Arrange
+    fake_sso_admin_client.account_assignments = {
+        ("111111111111", ADMIN_ARN, "GROUP", "g-admins"),
+        ("111111111111", ADMIN_ARN, "USER", "u-break-glass"),
+        ("111111111111", READONLY_ARN, "GROUP", "g-admins"),
+    }
+    managed_scope = {(ADMIN_ARN, "GROUP", "g-admins")}
+
+    # Act
+    assignment_plan = create_planner(fake_sso_admin_client).create_plan(
+        set(), managed_scope=managed_scope
+    )
+    pruning_assignment_plan = create_planner(fake_sso_admin_client).create_plan(
+        set(), managed_scope=managed_scope, prune_unmanaged=True
+    )
+
+    # Assert - assignments outside the scope of the rules are only deleted
+    # once pruning is opted into
+    assert assignment_plan.deletes == [
+        AccountAssignment("111111111111", ADMIN_ARN, "GROUP", "g-admins")
+    ]
+    assert len(pruning_assignment_plan.deletes) == 3
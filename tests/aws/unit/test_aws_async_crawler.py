@@ -0,0 +1,209 @@
+"""
+Unit tests to test crawling the organization & identity store on an
+asyncio event loop
+"""
+import os
+import asyncio
+import contextlib
+import boto3
+import pytest
+from aws.app.lib import aws_async_crawler
+from aws.app.lib.aws_organizations import AwsOrganizations
+from aws.app.lib.aws_identitycentre import AwsIdentityStore
+from aws.app.lib.aws_permission_sets import PermissionSetCatalog
+from aws.app.lib.aws_async_crawler import (
+    AsyncAwsOrganizations,
+    AsyncAwsIdentityStore,
+    run_data_plane_crawl,
+)
+
+
+# Helper classes
+class AsyncPageIterator:
+    """
+    Async iterator over the pages of a sync paginator
+    """
+
+    def __init__(self, pages) -> None:
+        self._pages = iter(pages)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        await asyncio.sleep(0)
+        try:
+            return next(self._pages)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncPaginator:
+    def __init__(self, paginator) -> None:
+        self._paginator = paginator
+
+    def paginate(self, **kwargs) -> AsyncPageIterator:
+        return AsyncPageIterator(self._paginator.paginate(**kwargs))
+
+
+class AsyncClient:
+    """
+    Async facade of a sync, moto backed client, standing in for an
+    aiobotocore client
+    """
+
+    def __init__(self, client: boto3.client) -> None:
+        self._client = client
+        self.in_flight_requests = 0
+        self.max_in_flight_requests = 0
+
+    def get_paginator(self, operation_name: str) -> AsyncPaginator:
+        return AsyncPaginator(self._client.get_paginator(operation_name))
+
+    def __getattr__(self, operation_name: str):
+        operation = getattr(self._client, operation_name)
+
+        async def call_operation(**kwargs) -> dict:
+            self.in_flight_requests += 1
+            self.max_in_flight_requests = max(
+                self.max_in_flight_requests, self.in_flight_requests
+            )
+            await asyncio.sleep(0)
+            self.in_flight_requests -= 1
+            return operation(**kwargs)
+
+        return call_operation
+
+
+# Test cases
+def test_invalid_max_concurrency() -> None:
+    # Assert
+    with pytest.raises(ValueError):
+        AsyncAwsOrganizations("r-1234", max_concurrency=0)
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_crawl_matches_sync_crawl(
+    setup_aws_environment: pytest.fixture,
+    organizations_client: boto3.client,
+    identity_store_client: boto3.client,
+    sso_admin_client: boto3.client,
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    identity_store_id = os.getenv("IDENTITY_STORE_ID")
+    identity_store_arn = os.getenv("IDENTITY_STORE_ARN")
+    py_aws_organizations = AwsOrganizations(root_ou_id)
+    py_aws_identitystore = AwsIdentityStore(identity_store_id, identity_store_arn)
+    py_permission_set_catalog = PermissionSetCatalog(identity_store_arn)
+
+    # Act
+    crawl = run_data_plane_crawl(
+        AsyncAwsOrganizations(
+            root_ou_id, organizations_client=AsyncClient(organizations_client)
+        ),
+        AsyncAwsIdentityStore(
+            identity_store_id,
+            identity_store_arn,
+            identity_store_client=AsyncClient(identity_store_client),
+            sso_admin_client=AsyncClient(sso_admin_client),
+        ),
+    )
+
+    # Assert
+    assert list(crawl["ou_account_map"].items()) == list(
+        py_aws_organizations.ou_account_map.items()
+    )
+    assert crawl["ou_metadata"] == py_aws_organizations.ou_metadata
+    assert crawl["sso_groups"] == py_aws_identitystore.list_sso_groups()
+    assert crawl["sso_users"] == py_aws_identitystore.list_sso_users()
+    assert crawl["permission_sets"] == (
+        py_permission_set_catalog.list_permission_sets()
+    )
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_describes_are_bounded(
+    setup_aws_environment: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    sso_admin_client = AsyncClient(fake_sso_admin_client)
+    py_aws_identitystore = AsyncAwsIdentityStore(
+        os.getenv("IDENTITY_STORE_ID"),
+        os.getenv("IDENTITY_STORE_ARN"),
+        max_concurrency=1,
+        identity_store_client=AsyncClient(boto3.client("identitystore")),
+        sso_admin_client=sso_admin_client,
+    )
+
+    async def list_permission_sets() -> list:
+        async with py_aws_identitystore:
+            return await py_aws_identitystore.list_permission_sets()
+
+    # Act
+    permission_sets = asyncio.run(list_permission_sets())
+
+    # Assert
+    assert [permission_set["Name"] for permission_set in permission_sets] == [
+        "AdministratorAccess",
+        "ReadOnly",
+    ]
+    assert sso_admin_client.max_in_flight_requests == 1
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_organizations_crawl_on_an_event_loop(
+    setup_aws_environment: pytest.fixture,
+    organizations_client: boto3.client,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Arrange
+    @contextlib.asynccontextmanager
+    async def create_client(service_name: str, max_concurrency: int):
+        # pylint: disable=W0613
+        yield AsyncClient(organizations_client)
+
+    monkeypatch.setattr(aws_async_crawler, "create_client", create_client)
+    root_ou_id = setup_aws_environment["root_ou_id"]
+
+    # Act
+    py_aws_organizations = AwsOrganizations(root_ou_id, async_crawl=True)
+
+    # Assert
+    assert list(py_aws_organizations.ou_account_map.items()) == list(
+        AwsOrganizations(root_ou_id).ou_account_map.items()
+    )
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_missing_root_is_reported(
+    setup_aws_environment: pytest.fixture, organizations_client: boto3.client
+) -> None:
+    # Arrange
+    py_aws_organizations = AsyncAwsOrganizations(
+        "r-missing", organizations_client=AsyncClient(organizations_client)
+    )
+
+    async def describe_root_ou() -> dict:
+        async with py_aws_organizations:
+            return await py_aws_organizations.describe_aws_organizational_unit()
+
+    # Act & Assert
+    with pytest.raises(ValueError, match="r-missing"):
+        asyncio.run(describe_root_ou())
+
+
+def test_clients_are_created_with_aiobotocore() -> None:
+    # Arrange
+    pytest.importorskip("aiobotocore")
+    py_aws_organizations = AsyncAwsOrganizations("r-1234")
+
+    async def enter_crawler():
+        async with py_aws_organizations:
+            return py_aws_organizations._organizations_client
+
+    # Act
+    organizations_client = asyncio.run(enter_crawler())
+
+    # Assert
+    assert organizations_client.meta.service_model.service_name == "organizations"
@@ -0,0 +1,64 @@
+"""
+Unit tests to test sharing configured boto3 clients & resources
+"""
+from aws.app.lib.aws_clients import (
+    get_client,
+    get_resource,
+    DEFAULT_MAX_POOL_CONNECTIONS,
+)
+
+
+# Test cases
+def test_clients_are_cached_per_service_and_region() -> None:
+    # Act
+    sso_admin_client = get_client("sso-admin")
+    regional_sso_admin_client = get_client("sso-admin", region_name="eu-west-1")
+
+    # Assert
+    assert get_client("sso-admin") is sso_admin_client
+    assert get_client("sso-admin", region_name="eu-west-1") is regional_sso_admin_client
+    assert regional_sso_admin_client is not sso_admin_client
+    assert regional_sso_admin_client.meta.region_name == "eu-west-1"
+    assert get_resource("dynamodb") is get_resource("dynamodb")
+
+
+def test_client_config() -> None:
+    # Act
+    client_config = get_client("organizations").meta.config
+
+    # Assert
+    assert client_config.retries["mode"] == "adaptive"
+    assert client_config.tcp_keepalive
+    assert client_config.max_pool_connections == DEFAULT_MAX_POOL_CONNECTIONS
+
+
+def test_client_pool_grows_with_workers() -> None:
+    # Arrange
+    identity_store_client = get_client("identitystore")
+
+    # Act
+    pooled_identity_store_client = get_client("identitystore", max_pool_connections=32)
+
+    # Assert
+    assert pooled_identity_store_client is not identity_store_client
+    assert pooled_identity_store_client.meta.config.max_pool_connections == 32
+    assert get_client("identitystore", max_pool_connections=16) is (
+        pooled_identity_store_client
+    )
+
+
+def test_single_attempt_clients_are_cached_apart() -> None:
+    # Arrange
+    sso_admin_client = get_client("sso-admin")
+
+    # Act
+    single_attempt_client = get_client("sso-admin", max_attempts=1)
+
+    # Assert
+    assert single_attempt_client is not sso_admin_client
+    assert single_attempt_client.meta.config.retries == {
+        "mode": "standard",
+        "total_max_attempts": 1,
+    }
+    assert get_client("sso-admin", max_attempts=1) is single_attempt_client
+    assert get_client("sso-admin") is sso_admin_client
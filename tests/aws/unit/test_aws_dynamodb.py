@@ -0,0 +1,158 @@
+"""
+Unit tests to test reading & writing items of the pk/sk DynamoDB table
+"""
+import decimal
+import datetime
+import boto3
+import pytest
+from aws.app.lib.aws_dynamodb import DynamoDBTable
+from aws.app.lib.utils import process_dict
+
+
+class UnprocessedDynamoDBClient:
+    """
+    DynamoDB client wrapper leaving the first request of every batch call
+    unprocessed, as throttled batch calls do
+    """
+
+    def __init__(self, dynamodb_client: boto3.client) -> None:
+        self._dynamodb_client = dynamodb_client
+        self.request_counts = {"batch_get_item": 0, "batch_write_item": 0}
+
+    def batch_get_item(self, RequestItems: dict) -> dict:
+        self.request_counts["batch_get_item"] += 1
+        (table_name, keys_and_attributes), *_ = RequestItems.items()
+        if len(keys_and_attributes["Keys"]) == 1:
+            return self._dynamodb_client.batch_get_item(RequestItems=RequestItems)
+        response = self._dynamodb_client.batch_get_item(
+            RequestItems={
+                table_name: {
+                    **keys_and_attributes,
+                    "Keys": keys_and_attributes["Keys"][1:],
+                }
+            }
+        )
+        response["UnprocessedKeys"] = {
+            table_name: {**keys_and_attributes, "Keys": keys_and_attributes["Keys"][:1]}
+        }
+        return response
+
+    def batch_write_item(self, RequestItems: dict) -> dict:
+        self.request_counts["batch_write_item"] += 1
+        (table_name, write_requests), *_ = RequestItems.items()
+        if len(write_requests) == 1:
+            return self._dynamodb_client.batch_write_item(RequestItems=RequestItems)
+        response = self._dynamodb_client.batch_write_item(
+            RequestItems={table_name: write_requests[1:]}
+        )
+        response["UnprocessedItems"] = {table_name: write_requests[:1]}
+        return response
+
+    def __getattr__(self, name: str):
+        return getattr(self._dynamodb_client, name)
+
+
+def create_rules(rule_count: int) -> list:
+    return [
+        {
+            "pk": "RULES",
+            "sk": f"RULE_{rule_number:05d}",
+            "permission_set_name": "ReadOnly",
+            "target_names": [f"{rule_number:012d}"],
+            "weight": rule_number / 4,
+        }
+        for rule_number in range(rule_count)
+    ]
+
+
+# Test cases
+def test_batch_query_items(setup_dynamodb_table: pytest.fixture) -> None:
+    # Arrange
+    ddb_table = DynamoDBTable(setup_dynamodb_table)
+    rules = create_rules(120)
+    ddb_table.batch_write_items(
+        put_items=[*rules, {"pk": "RULES", "sk": "IGNORE_00000"}]
+    )
+
+    # Act
+    queried_rules = ddb_table.batch_query_items(key="RULES", range_begins_with="RULE_")
+    projected_rules = ddb_table.batch_query_items(
+        key="RULES", range_begins_with="RULE_", projection=["sk", "weight"]
+    )
+
+    # Assert
+    assert queried_rules == rules
+    assert projected_rules[1] == {"sk": "RULE_00001", "weight": 0.25}
+    assert projected_rules[4] == {"sk": "RULE_00004", "weight": 1}
+
+
+def test_batch_get_and_write_retry_unprocessed_requests(
+    setup_dynamodb_table: pytest.fixture,
+) -> None:
+    # Arrange
+    dynamodb_client = UnprocessedDynamoDBClient(boto3.client("dynamodb"))
+    ddb_table = DynamoDBTable(
+        setup_dynamodb_table, dynamodb_client=dynamodb_client, backoff_seconds=0
+    )
+    rules = [{**rule, "pk": "RETRIED_RULES"} for rule in create_rules(30)]
+
+    # Act
+    ddb_table.batch_write_items(put_items=rules)
+    fetched_rules = ddb_table.batch_get_items(
+        [(rule["pk"], rule["sk"]) for rule in rules]
+    )
+    ddb_table.batch_write_items(
+        delete_keys=[(rule["pk"], rule["sk"]) for rule in rules]
+    )
+
+    # Assert
+    assert sorted(fetched_rules, key=lambda rule: rule["sk"]) == rules
+    assert dynamodb_client.request_counts == {
+        "batch_get_item": 2,
+        "batch_write_item": 8,
+    }
+    assert not ddb_table.batch_query_items(key="RETRIED_RULES")
+
+
+def test_batch_write_keeps_last_request_of_a_key(
+    setup_dynamodb_table: pytest.fixture,
+) -> None:
+    # Arrange
+    ddb_table = DynamoDBTable(setup_dynamodb_table)
+    rules = [{**rule, "pk": "DUPLICATED_RULES"} for rule in create_rules(2)]
+
+    # Act
+    ddb_table.batch_write_items(
+        put_items=[*rules, {**rules[0], "weight": 2.5}],
+        delete_keys=[(rules[1]["pk"], rules[1]["sk"])],
+    )
+
+    # Assert
+    assert ddb_table.batch_query_items(key="DUPLICATED_RULES") == [
+        {**rules[0], "weight": 2.5}
+    ]
+    ddb_table.batch_write_items(delete_keys=[(rules[0]["pk"], rules[0]["sk"])])
+
+
+def test_process_dict() -> None:
+    # Arrange
+    item = {
+        "weight": 0.1,
+        "nested": [{"count": decimal.Decimal("3")}, {"ratio": decimal.Decimal("0.5")}],
+        "created_at": datetime.datetime(2024, 1, 1, 12, 30),
+    }
+
+    # Act
+    dynamodb_item = process_dict({"weight": item["weight"], "nested": [{"ratio": 0.5}]})
+    python_item = process_dict(item, to_dynamodb=False)
+
+    # Assert
+    assert dynamodb_item == {
+        "weight": decimal.Decimal("0.1"),
+        "nested": [{"ratio": decimal.Decimal("0.5")}],
+    }
+    assert python_item == {
+        "weight": 0.1,
+        "nested": [{"count": 3}, {"ratio": 0.5}],
+        "created_at": "24-01-01 12:30:00",
+    }
@@ -0,0 +1,297 @@
+"""
+Unit tests to test looking up identity store principals
+"""
+import os
+import pytest
+from aws.app.lib.aws_identitycentre import AwsIdentityStore
+from aws.app.lib.snapshot_cache import SnapshotCache, FileSnapshotStore
+
+
+# Test cases
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_resolve_sso_groups(setup_aws_environment: pytest.fixture) -> None:
+    # Arrange
+    py_aws_identitystore = AwsIdentityStore(
+        os.getenv("IDENTITY_STORE_ID"), os.getenv("IDENTITY_STORE_ARN")
+    )
+    listed_group_ids = {
+        group["DisplayName"]: group["GroupId"]
+        for group in py_aws_identitystore.list_sso_groups()
+    }
+
+    # Act
+    sso_groups = py_aws_identitystore.resolve_sso_groups({"group1", "GROUP2"})
+    missing_group_id = py_aws_identitystore.get_group_id("missing")
+
+    # Assert - lookups missing on case fall back to the full listing
+    assert sso_groups == [
+        {"GroupId": listed_group_ids["group2"], "DisplayName": "GROUP2"},
+        {"GroupId": listed_group_ids["group1"], "DisplayName": "group1"},
+    ]
+    assert missing_group_id is None
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_lookup_misses_are_not_memoized(
+    setup_aws_environment: pytest.fixture, identity_store_client: pytest.fixture
+) -> None:
+    # Arrange
+    py_aws_identitystore = AwsIdentityStore(
+        os.getenv("IDENTITY_STORE_ID"),
+        os.getenv("IDENTITY_STORE_ARN"),
+        listing_ttl_seconds=0,
+    )
+    missing_group_id = py_aws_identitystore.get_group_id("Late-Group")
+
+    # Act
+    group_id = identity_store_client.create_group(
+        IdentityStoreId=os.getenv("IDENTITY_STORE_ID"), DisplayName="late-group"
+    )["GroupId"]
+
+    # Assert - the case mismatched group is found by the expired listing
+    assert missing_group_id is None
+    assert py_aws_identitystore.get_group_id("Late-Group") == group_id
+    assert py_aws_identitystore.get_group_id("late-group") == group_id
+    identity_store_client.delete_group(
+        IdentityStoreId=os.getenv("IDENTITY_STORE_ID"), GroupId=group_id
+    )
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_principal_lookups_are_memoized(
+    setup_aws_environment: pytest.fixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Arrange
+    py_aws_identitystore = AwsIdentityStore(
+        os.getenv("IDENTITY_STORE_ID"), os.getenv("IDENTITY_STORE_ARN")
+    )
+    lookups = []
+
+    def get_user_id(IdentityStoreId: str, AlternateIdentifier: dict) -> dict:
+        lookups.append(AlternateIdentifier["UniqueAttribute"]["AttributeValue"])
+        return {"UserId": "u-user1", "IdentityStoreId": IdentityStoreId}
+
+    monkeypatch.setattr(
+        py_aws_identitystore._identity_store_client, "get_user_id", get_user_id
+    )
+
+    # Act
+    sso_users = py_aws_identitystore.resolve_sso_users({"user1@testing.com"})
+    py_aws_identitystore.resolve_sso_users({"user1@testing.com"})
+
+    # Assert
+    assert sso_users == [{"UserId": "u-user1", "UserName": "user1@testing.com"}]
+    assert lookups == ["user1@testing.com"]
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_iter_sso_principals_are_projected(
+    setup_aws_environment: pytest.fixture,
+) -> None:
+    # Arrange
+    py_aws_identitystore = AwsIdentityStore(
+        os.getenv("IDENTITY_STORE_ID"), os.getenv("IDENTITY_STORE_ARN")
+    )
+
+    # Act
+    sso_groups = list(py_aws_identitystore.iter_sso_groups())
+    sso_users = list(py_aws_identitystore.iter_sso_users())
+
+    # Assert
+    assert {group["DisplayName"] for group in sso_groups} == {
+        group["name"] for group in setup_aws_environment["aws_sso_group_definitions"]
+    }
+    assert {user["UserName"] for user in sso_users} == {
+        user["username"] for user in setup_aws_environment["aws_sso_user_definitions"]
+    }
+    assert all(group.keys() == {"GroupId", "DisplayName"} for group in sso_groups)
+    assert all(user.keys() == {"UserId", "UserName"} for user in sso_users)
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_iter_sso_groups_streams_pages(
+    setup_aws_environment: pytest.fixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Arrange
+    py_aws_identitystore = AwsIdentityStore(
+        os.getenv("IDENTITY_STORE_ID"), os.getenv("IDENTITY_STORE_ARN")
+    )
+    fetched_pages = []
+
+    def paginate(**kwargs):
+        for page_number in range(100):
+            fetched_pages.append(page_number)
+            yield {
+                "Groups": [
+                    {
+                        "GroupId": f"g-{page_number}",
+                        "DisplayName": f"group_{page_number}",
+                        "Description": "x" * 1024,
+                    }
+                ]
+            }
+
+    monkeypatch.setattr(
+        py_aws_identitystore._sso_groups_paginator, "paginate", paginate
+    )
+
+    # Act
+    sso_groups = py_aws_identitystore.iter_sso_groups()
+    first_group = next(sso_groups)
+
+    # Assert
+    assert first_group == {"GroupId": "g-0", "DisplayName": "group_0"}
+    assert fetched_pages == [0]
+
+
+# Membership index test cases
+def create_identity_store(
+    identity_store_client: pytest.fixture, snapshot_cache: SnapshotCache = None
+) -> AwsIdentityStore:
+    return AwsIdentityStore(
+        os.getenv("IDENTITY_STORE_ID"),
+        os.getenv("IDENTITY_STORE_ARN"),
+        identity_store_client=identity_store_client,
+        snapshot_cache=snapshot_cache,
+    )
+
+
+def test_membership_index_is_crawled_once(
+    fake_identity_store_client: pytest.fixture, tmp_path: pytest.fixture
+) -> None:
+    # Arrange
+    fake_identity_store_client.memberships = {
+        ("g-admins", "u-user1"),
+        ("g-developers", "u-user1"),
+        ("g-developers", "u-user2"),
+    }
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+
+    # Act
+    membership_index = create_identity_store(
+        fake_identity_store_client, snapshot_cache
+    ).get_membership_index()
+    cached_membership_index = create_identity_store(
+        fake_identity_store_client, snapshot_cache
+    ).get_membership_index()
+
+    # Assert
+    assert membership_index.get_group_ids("u-user1") == {"g-admins", "g-developers"}
+    assert membership_index.get_user_ids("g-developers") == {"u-user1", "u-user2"}
+    assert membership_index.get_group_ids("u-user3") == frozenset()
+    assert cached_membership_index.to_dict() == membership_index.to_dict()
+    assert fake_identity_store_client.request_counts == {
+        "list_groups": 1,
+        "list_group_memberships": 3,
+    }
+
+
+def test_refresh_user_memberships(
+    fake_identity_store_client: pytest.fixture, tmp_path: pytest.fixture
+) -> None:
+    # Arrange
+    fake_identity_store_client.memberships = {
+        ("g-admins", "u-user1"),
+        ("g-developers", "u-user2"),
+    }
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+    py_aws_identitystore = create_identity_store(
+        fake_identity_store_client, snapshot_cache
+    )
+    py_aws_identitystore.get_membership_index()
+    fake_identity_store_client.memberships = {
+        ("g-auditors", "u-user1"),
+        ("g-developers", "u-user2"),
+        ("g-developers", "u-user3"),
+    }
+
+    # Act
+    changed_user_count = py_aws_identitystore.refresh_user_memberships(
+        {"u-user1", "u-user2"}
+    )
+    membership_index = py_aws_identitystore.get_membership_index()
+    cached_membership_index = create_identity_store(
+        fake_identity_store_client, snapshot_cache
+    ).get_membership_index()
+
+    # Assert - user3 was not refreshed, so is not indexed yet
+    assert changed_user_count == 1
+    assert membership_index.to_dict() == {
+        "g-admins": [],
+        "g-developers": ["u-user2"],
+        "g-auditors": ["u-user1"],
+    }
+    assert cached_membership_index.to_dict() == membership_index.to_dict()
+    assert fake_identity_store_client.request_counts == {
+        "list_groups": 1,
+        "list_group_memberships": 3,
+        "list_group_memberships_for_member": 2,
+    }
+
+
+def test_membership_events_refresh_their_user(
+    fake_identity_store_client: pytest.fixture,
+) -> None:
+    # Arrange
+    fake_identity_store_client.memberships = {("g-admins", "u-user1")}
+    py_aws_identitystore = create_identity_store(fake_identity_store_client)
+    group_ids = py_aws_identitystore.get_membership_index().get_group_ids("u-user1")
+    fake_identity_store_client.memberships = {
+        ("g-admins", "u-user1"),
+        ("g-developers", "u-user1"),
+    }
+
+    # Act
+    is_failed_call_applied = py_aws_identitystore.apply_membership_event(
+        {"eventName": "AddMemberToGroup", "errorCode": "AccessDenied"}
+    )
+    is_applied = py_aws_identitystore.apply_membership_event(
+        {
+            "eventName": "AddMemberToGroup",
+            "requestParameters": {
+                "groupId": "g-developers",
+                "member": {"memberId": "u-user1", "memberType": "USER"},
+            },
+        }
+    )
+
+    # Assert - group IDs already read are not mutated by the refresh
+    assert is_failed_call_applied and is_applied
+    assert group_ids == {"g-admins"}
+    assert py_aws_identitystore.get_membership_index().get_group_ids("u-user1") == {
+        "g-admins",
+        "g-developers",
+    }
+    assert fake_identity_store_client.request_counts == {
+        "list_groups": 1,
+        "list_group_memberships": 3,
+        "list_group_memberships_for_member": 1,
+    }
+
+
+def test_membership_events_without_user_recrawl(
+    fake_identity_store_client: pytest.fixture,
+) -> None:
+    # Arrange
+    fake_identity_store_client.memberships = {("g-admins", "u-user1")}
+    py_aws_identitystore = create_identity_store(fake_identity_store_client)
+    py_aws_identitystore.get_membership_index()
+    fake_identity_store_client.memberships = set()
+
+    # Act
+    is_applied = py_aws_identitystore.apply_membership_event(
+        {
+            "eventName": "DeleteGroupMembership",
+            "requestParameters": {
+                "identityStoreId": "d-1234567890",
+                "membershipId": "m-membership1",
+            },
+        }
+    )
+
+    # Assert
+    assert not is_applied
+    assert py_aws_identitystore.get_membership_index().get_group_ids("u-user1") == (
+        frozenset()
+    )
+    assert fake_identity_store_client.request_counts["list_group_memberships"] == 6
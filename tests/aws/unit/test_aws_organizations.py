@@ -0,0 +1,341 @@
+"""
+Unit tests to test crawling the AWS organization tree
+"""
+import pytest
+import boto3
+from aws.app.lib.aws_organizations import AwsOrganizations
+
+
+# Helper functions
+def describe_ou_tree_serially(
+    organizations_client: boto3.client, parent_ou_id: str, ou_account_map: dict
+) -> dict:
+    """
+    Reference depth-first crawl the concurrent crawler must agree with
+    """
+    ou_account_map[parent_ou_id] = [
+        {"Id": account["Id"], "Name": account["Name"]}
+        for account in organizations_client.list_accounts_for_parent(
+            ParentId=parent_ou_id
+        )["Accounts"]
+        if account["Status"] == "ACTIVE"
+    ]
+    for ou in organizations_client.list_organizational_units_for_parent(
+        ParentId=parent_ou_id
+    )["OrganizationalUnits"]:
+        describe_ou_tree_serially(organizations_client, ou["Id"], ou_account_map)
+    return ou_account_map
+
+
+def count_accounts(aws_organization_definitions: list) -> int:
+    """
+    Count the accounts declared in an organization definition
+    """
+    return sum(
+        1
+        if definition["type"] == "ACCOUNT"
+        else count_accounts(definition.get("children") or [])
+        for definition in aws_organization_definitions
+    )
+
+
+# Test cases
+def test_invalid_max_workers() -> None:
+    # Assert
+    with pytest.raises(ValueError):
+        AwsOrganizations("r-1234", max_workers=0)
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_1.json"], indirect=True)
+def test_missing_root_is_reported(setup_aws_environment: pytest.fixture) -> None:
+    # Act & Assert
+    with pytest.raises(ValueError, match="r-missing"):
+        AwsOrganizations("r-missing")
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_crawl_matches_serial_crawl(
+    setup_aws_environment: pytest.fixture, organizations_client: boto3.client
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    expected_ou_account_map = describe_ou_tree_serially(
+        organizations_client, root_ou_id, {}
+    )
+
+    # Act
+    py_aws_organizations = AwsOrganizations(root_ou_id, max_workers=4)
+
+    # Assert
+    assert py_aws_organizations.ou_account_map == expected_ou_account_map
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_crawl_single_worker(setup_aws_environment: pytest.fixture) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    aws_organization_definitions = setup_aws_environment["aws_organization_definitions"]
+
+    # Act
+    py_aws_organizations = AwsOrganizations(root_ou_id, max_workers=1)
+    active_aws_accounts = [
+        account
+        for accounts in py_aws_organizations.ou_account_map.values()
+        for account in accounts
+    ]
+
+    # Assert - the management account sits under the root
+    assert len(active_aws_accounts) == count_accounts(aws_organization_definitions) + 1
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_crawl_skips_ignored_ou_subtree(
+    setup_aws_environment: pytest.fixture, organizations_client: boto3.client
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    workloads_ou_id = next(
+        ou["Id"]
+        for ou in organizations_client.list_organizational_units_for_parent(
+            ParentId=root_ou_id
+        )["OrganizationalUnits"]
+        if ou["Name"] == "workloads"
+    )
+    ignored_ou_account_map = describe_ou_tree_serially(
+        organizations_client, workloads_ou_id, {}
+    )
+
+    # Act
+    py_aws_organizations = AwsOrganizations(
+        root_ou_id, ou_id_ignore_list=[workloads_ou_id]
+    )
+
+    # Assert
+    assert root_ou_id in py_aws_organizations.ou_account_map
+    assert not set(ignored_ou_account_map) & set(py_aws_organizations.ou_account_map)
+
+
+# Organization event test cases
+def create_organizations_event_detail(
+    event_name: str, request_parameters: dict, response_elements: dict = None
+) -> dict:
+    """
+    Build the detail section of a CloudTrail backed EventBridge event
+    """
+    return {
+        "eventSource": "organizations.amazonaws.com",
+        "eventName": event_name,
+        "requestParameters": request_parameters,
+        "responseElements": response_elements,
+    }
+
+
+def get_child_ou_id(
+    organizations_client: boto3.client, parent_ou_id: str, ou_name: str
+) -> str:
+    """
+    Return the ID of the child OU with the given name
+    """
+    return next(
+        ou["Id"]
+        for ou in organizations_client.list_organizational_units_for_parent(
+            ParentId=parent_ou_id
+        )["OrganizationalUnits"]
+        if ou["Name"] == ou_name
+    )
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_apply_move_account_event(
+    setup_aws_environment: pytest.fixture, organizations_client: boto3.client
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    security_ou_id = get_child_ou_id(organizations_client, root_ou_id, "security")
+    audit_ou_id = get_child_ou_id(organizations_client, security_ou_id, "audit")
+    account_id = next(
+        account["Id"]
+        for account in organizations_client.list_accounts_for_parent(
+            ParentId=security_ou_id
+        )["Accounts"]
+    )
+    py_aws_organizations = AwsOrganizations(root_ou_id)
+    request_parameters = {
+        "accountId": account_id,
+        "sourceParentId": security_ou_id,
+        "destinationParentId": audit_ou_id,
+    }
+
+    # Act
+    organizations_client.move_account(
+        AccountId=account_id,
+        SourceParentId=security_ou_id,
+        DestinationParentId=audit_ou_id,
+    )
+    try:
+        is_applied = py_aws_organizations.apply_event(
+            create_organizations_event_detail("MoveAccount", request_parameters)
+        )
+        expected_ou_account_map = describe_ou_tree_serially(
+            organizations_client, root_ou_id, {}
+        )
+    finally:
+        organizations_client.move_account(
+            AccountId=account_id,
+            SourceParentId=audit_ou_id,
+            DestinationParentId=security_ou_id,
+        )
+
+    # Assert
+    assert is_applied
+    assert py_aws_organizations.ou_account_map == expected_ou_account_map
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_apply_create_and_delete_ou_events(
+    setup_aws_environment: pytest.fixture, organizations_client: boto3.client
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    py_aws_organizations = AwsOrganizations(root_ou_id)
+
+    # Act
+    ou = organizations_client.create_organizational_unit(
+        ParentId=root_ou_id, Name="staging"
+    )["OrganizationalUnit"]
+    is_create_applied = py_aws_organizations.apply_event(
+        create_organizations_event_detail(
+            "CreateOrganizationalUnit",
+            {"parentId": root_ou_id, "name": "staging"},
+            {"organizationalUnit": {"id": ou["Id"], "name": "staging"}},
+        )
+    )
+    is_created = ou["Id"] in py_aws_organizations.ou_account_map
+
+    organizations_client.delete_organizational_unit(OrganizationalUnitId=ou["Id"])
+    is_delete_applied = py_aws_organizations.apply_event(
+        create_organizations_event_detail(
+            "DeleteOrganizationalUnit", {"organizationalUnitId": ou["Id"]}
+        )
+    )
+
+    # Assert
+    assert is_create_applied and is_created
+    assert is_delete_applied
+    assert ou["Id"] not in py_aws_organizations.ou_account_map
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_apply_close_account_event(setup_aws_environment: pytest.fixture) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    py_aws_organizations = AwsOrganizations(root_ou_id)
+    account_id = py_aws_organizations.ou_account_map[root_ou_id][0]["Id"]
+
+    # Act
+    is_applied = py_aws_organizations.apply_event(
+        create_organizations_event_detail("CloseAccount", {"accountId": account_id})
+    )
+
+    # Assert
+    assert is_applied
+    assert account_id not in [
+        account["Id"]
+        for accounts in py_aws_organizations.ou_account_map.values()
+        for account in accounts
+    ]
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_apply_failed_api_call_event(setup_aws_environment: pytest.fixture) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    py_aws_organizations = AwsOrganizations(root_ou_id)
+    event_detail = create_organizations_event_detail(
+        "CloseAccount",
+        {"accountId": py_aws_organizations.ou_account_map[root_ou_id][0]["Id"]},
+    )
+    event_detail["errorCode"] = "AccessDeniedException"
+    expected_ou_account_map = py_aws_organizations.ou_account_map
+
+    # Act
+    is_applied = py_aws_organizations.apply_event(event_detail)
+
+    # Assert
+    assert is_applied
+    assert py_aws_organizations.ou_account_map == expected_ou_account_map
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_apply_unsupported_event_resyncs(
+    setup_aws_environment: pytest.fixture,
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    py_aws_organizations = AwsOrganizations(root_ou_id)
+    py_aws_organizations.ou_account_map = {}
+
+    # Act
+    is_applied = py_aws_organizations.apply_event(
+        create_organizations_event_detail(
+            "UpdateOrganizationalUnit", {"organizationalUnitId": "ou-1234"}
+        )
+    )
+
+    # Assert
+    assert not is_applied
+    assert root_ou_id in py_aws_organizations.ou_account_map
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_apply_move_to_unknown_ou_resyncs(
+    setup_aws_environment: pytest.fixture,
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    py_aws_organizations = AwsOrganizations(root_ou_id)
+    account_id = py_aws_organizations.ou_account_map[root_ou_id][0]["Id"]
+
+    # Act
+    is_applied = py_aws_organizations.apply_event(
+        create_organizations_event_detail(
+            "MoveAccount",
+            {
+                "accountId": account_id,
+                "sourceParentId": root_ou_id,
+                "destinationParentId": "ou-unknown",
+            },
+        )
+    )
+
+    # Assert
+    assert not is_applied
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_account_tag_index(
+    setup_aws_environment: pytest.fixture, organizations_client: boto3.client
+) -> None:
+    # Arrange
+    py_aws_organizations = AwsOrganizations(setup_aws_environment["root_ou_id"])
+    account_ids = sorted(py_aws_organizations.organization_index.account_ids)
+    for account_id, environment in zip(account_ids, ["prod", "prod", "dev"]):
+        organizations_client.tag_resource(
+            ResourceId=account_id,
+            Tags=[
+                {"Key": "env", "Value": environment},
+                {"Key": "team", "Value": "payments"},
+            ],
+        )
+
+    # Act
+    prod_account_ids = py_aws_organizations.account_tag_index.get_account_ids(
+        {"env": "prod", "team": "payments"}
+    )
+    payments_account_ids = py_aws_organizations.account_tag_index.get_account_ids(
+        {"team": "payments", "env": ["prod", "dev"]}
+    )
+
+    # Assert
+    assert prod_account_ids == set(account_ids[:2])
+    assert payments_account_ids == set(account_ids[:3])
@@ -0,0 +1,74 @@
+"""
+Unit tests to test hydrating & caching the permission set catalog
+"""
+import os
+import pytest
+from aws.app.lib.aws_permission_sets import PermissionSetCatalog
+from aws.app.lib.snapshot_cache import SnapshotCache, FileSnapshotStore
+
+# Globals vars
+ADMIN_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-administratoraccess"
+READONLY_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-readonly"
+BILLING_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-billing"
+
+
+def create_catalog(
+    sso_admin_client: pytest.fixture, snapshot_cache: SnapshotCache = None
+) -> PermissionSetCatalog:
+    return PermissionSetCatalog(
+        os.getenv("IDENTITY_STORE_ARN"),
+        sso_admin_client=sso_admin_client,
+        snapshot_cache=snapshot_cache,
+    )
+
+
+# Test cases
+def test_list_permission_sets(fake_sso_admin_client: pytest.fixture) -> None:
+    # Act
+    permission_set_arns = create_catalog(
+        fake_sso_admin_client
+    ).get_permission_set_arns()
+
+    # Assert
+    assert permission_set_arns == {
+        "administratoraccess": ADMIN_ARN,
+        "readonly": READONLY_ARN,
+    }
+
+
+def test_only_changed_arns_are_described(
+    fake_sso_admin_client: pytest.fixture, tmp_path: pytest.fixture
+) -> None:
+    # Arrange
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+    create_catalog(fake_sso_admin_client, snapshot_cache).list_permission_sets()
+    del fake_sso_admin_client.permission_sets[READONLY_ARN]
+    fake_sso_admin_client.permission_sets[BILLING_ARN] = "Billing"
+
+    # Act - a cold container reloads the catalog from the snapshot
+    permission_sets = create_catalog(
+        fake_sso_admin_client, snapshot_cache
+    ).list_permission_sets()
+
+    # Assert
+    assert [permission_set["Name"] for permission_set in permission_sets] == [
+        "AdministratorAccess",
+        "Billing",
+    ]
+    assert permission_sets[0]["CreatedDate"] == "2024-01-01T00:00:00"
+    assert fake_sso_admin_client.request_counts["describe_permission_set"] == 3
+
+
+def test_expired_catalog_is_described_again(
+    fake_sso_admin_client: pytest.fixture, tmp_path: pytest.fixture
+) -> None:
+    # Arrange
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=0)
+    permission_set_catalog = create_catalog(fake_sso_admin_client, snapshot_cache)
+
+    # Act
+    permission_set_catalog.list_permission_sets()
+    permission_set_catalog.list_permission_sets()
+
+    # Assert
+    assert fake_sso_admin_client.request_counts["describe_permission_set"] == 4
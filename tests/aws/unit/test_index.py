@@ -1,3 +1,65 @@
+"""
+Unit tests to test the cold start cost of importing the handler module
+"""
+import os
+import sys
+import json
+import subprocess
+
+# Globals vars, the budget is generous since CI runners are noisy, it only
+# catches a heavy module imported at module level again
+IMPORT_TIME_BUDGET_MICROSECONDS = 250_000
+IMPORT_TIME_RUNS = 5
+DEFERRED_MODULES = ("boto3", "jsonschema", "yaml", "aws_xray_sdk")
+SRC_DIRECTORY = os.path.realpath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "..", "src")
+)
+
+
+def import_index() -> tuple:
+    """
+    Import the handler module in a fresh interpreter, returning its
+    cumulative import time in microseconds & the modules it loaded
+    """
+    completed_process = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, json; import aws.app.index; print(json.dumps(list(sys.modules)))",
+        ],
+        cwd=SRC_DIRECTORY,
+        env={**os.environ, "PYTHONPATH": SRC_DIRECTORY},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_time_microseconds = next(
+        int(line.split("|")[1])
+        for line in completed_process.stderr.splitlines()
+        if line.split("|")[-1].strip() == "aws.app.index"
+    )
+    return import_time_microseconds, set(json.loads(completed_process.stdout))
+
+
+# Test cases
+def test_index_import_defers_heavy_modules() -> None:
+    # Act
+    _, imported_modules = import_index()
+
+    # Assert
+    assert not imported_modules.intersection(DEFERRED_MODULES)
+
+
+def test_index_import_time_is_within_budget() -> None:
+    # Act, the best of a few cold interpreters, once bytecode is cached
+    import_time_microseconds = min(import_index()[0] for _ in range(IMPORT_TIME_RUNS))
+
+    # Assert
+    assert import_time_microseconds < IMPORT_TIME_BUDGET_MICROSECONDS
+
+
 # """
 # Unit tests to test writing regex rules from DDB
 # """
@@ -0,0 +1,282 @@
+"""
+Unit tests to test granting & sweeping just-in-time (JIIT) assignments
+"""
+import os
+import pytest
+from aws.app.lib.aws_sso_resolver import AccountAssignment
+from aws.app.lib.aws_assignment_executor import AwsAssignmentExecutor
+from aws.app.lib.jiit_grants import (
+    JiitGrant,
+    JiitGrantStore,
+    JiitScheduler,
+    get_sso_user_name,
+    parse_grant_request,
+)
+
+# Globals vars
+ADMIN_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-administratoraccess"
+NOW = 1_700_000_000
+
+
+def create_scheduler(
+    table_name: str, fake_sso_admin_client: pytest.fixture, **kwargs
+) -> JiitScheduler:
+    grant_store = JiitGrantStore(table_name)
+    # The table is shared by the session, start from an empty set of grants
+    grant_store.delete(grant_store.list_expired(now=2**32, limit=10_000))
+    return JiitScheduler(
+        grant_store,
+        AwsAssignmentExecutor(
+            os.getenv("IDENTITY_STORE_ARN"),
+            sso_admin_client=fake_sso_admin_client,
+            poll_interval_seconds=0,
+        ),
+        **kwargs,
+    )
+
+
+# Test cases
+def test_grant_is_revoked_once_expired(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    scheduler = create_scheduler(setup_dynamodb_table, fake_sso_admin_client)
+    grant_store = JiitGrantStore(setup_dynamodb_table)
+    assignment = AccountAssignment("111111111111", ADMIN_ARN, "USER", "u-user1")
+
+    # Act
+    grant = scheduler.grant(assignment, duration_seconds=600, now=NOW)
+    early_sweep = scheduler.sweep(now=NOW + 599)
+    granted_assignments = set(fake_sso_admin_client.account_assignments)
+    sweep = scheduler.sweep(now=NOW + 600)
+
+    # Assert
+    assert grant == JiitGrant(assignment, NOW + 600)
+    assert early_sweep == {"revoked": 0, "retained": 0, "failed": 0}
+    assert granted_assignments == {tuple(assignment)}
+    assert sweep == {"revoked": 1, "retained": 0, "failed": 0}
+    assert not fake_sso_admin_client.account_assignments
+    assert grant_store.get(assignment) is None
+    assert not grant_store.list_expired(now=2**32, limit=10)
+
+
+def test_grant_is_extended_never_shortened(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    scheduler = create_scheduler(setup_dynamodb_table, fake_sso_admin_client)
+    grant_store = JiitGrantStore(setup_dynamodb_table)
+    assignment = AccountAssignment("222222222222", ADMIN_ARN, "GROUP", "g-admins")
+
+    # Act
+    scheduler.grant(assignment, duration_seconds=600, now=NOW)
+    extended_grant = scheduler.grant(assignment, duration_seconds=1200, now=NOW)
+    unchanged_grant = scheduler.grant(assignment, duration_seconds=60, now=NOW)
+    sweep = scheduler.sweep(now=NOW + 600)
+
+    # Assert
+    assert extended_grant.expires_at == NOW + 1200
+    assert unchanged_grant == extended_grant
+    assert grant_store.get(assignment) == extended_grant
+    assert sweep == {"revoked": 0, "retained": 0, "failed": 0}
+    assert fake_sso_admin_client.account_assignments == {tuple(assignment)}
+
+
+def test_grant_duration_is_capped(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    scheduler = create_scheduler(
+        setup_dynamodb_table, fake_sso_admin_client, max_duration_seconds=900
+    )
+    assignment = AccountAssignment("333333333333", ADMIN_ARN, "USER", "u-user1")
+
+    # Act
+    grant = scheduler.grant(assignment, duration_seconds=86_400, now=NOW)
+
+    # Assert
+    assert grant.expires_at == NOW + 900
+    with pytest.raises(ValueError):
+        scheduler.grant(assignment, duration_seconds=0, now=NOW)
+
+
+def test_sweep_reads_only_due_grants(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    scheduler = create_scheduler(
+        setup_dynamodb_table, fake_sso_admin_client, sweep_size=2
+    )
+    grant_store = JiitGrantStore(setup_dynamodb_table)
+    assignments = [
+        AccountAssignment(f"{account_number:012d}", ADMIN_ARN, "USER", "u-user1")
+        for account_number in range(5)
+    ]
+    for duration_seconds, assignment in enumerate(assignments, start=1):
+        scheduler.grant(assignment, duration_seconds=duration_seconds, now=NOW)
+
+    # Act
+    expired_grants = grant_store.list_expired(now=NOW + 3, limit=10)
+    first_sweep = scheduler.sweep(now=NOW + 5)
+    second_sweep = scheduler.sweep(now=NOW + 5)
+
+    # Assert
+    assert [grant.assignment for grant in expired_grants] == assignments[:3]
+    assert first_sweep == {"revoked": 2, "retained": 0, "failed": 0}
+    assert second_sweep == {"revoked": 2, "retained": 0, "failed": 0}
+    assert grant_store.list_active_assignments() == {assignments[4]}
+    assert fake_sso_admin_client.account_assignments == {tuple(assignments[4])}
+
+
+def test_held_assignment_is_not_granted(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    scheduler = create_scheduler(setup_dynamodb_table, fake_sso_admin_client)
+    grant_store = JiitGrantStore(setup_dynamodb_table)
+    assignment = AccountAssignment("555555555555", ADMIN_ARN, "USER", "u-user5")
+
+    # Act
+    grant = scheduler.grant(
+        assignment, duration_seconds=600, now=NOW, held_assignments={assignment}
+    )
+    sweep = scheduler.sweep(now=NOW + 600)
+
+    # Assert
+    assert grant is None
+    assert grant_store.get(assignment) is None
+    assert sweep == {"revoked": 0, "retained": 0, "failed": 0}
+    assert fake_sso_admin_client.request_counts["create_account_assignment"] == 0
+
+
+def test_sweep_retains_rbac_assignments(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    scheduler = create_scheduler(setup_dynamodb_table, fake_sso_admin_client)
+    grant_store = JiitGrantStore(setup_dynamodb_table)
+    rbac_assignment = AccountAssignment("666666666666", ADMIN_ARN, "USER", "u-user6")
+    jiit_assignment = AccountAssignment("666666666666", ADMIN_ARN, "USER", "u-user7")
+    scheduler.grant(rbac_assignment, duration_seconds=600, now=NOW)
+    scheduler.grant(jiit_assignment, duration_seconds=600, now=NOW)
+
+    # Act
+    sweep = scheduler.sweep(
+        now=NOW + 600, get_retained_assignments=lambda: {rbac_assignment}
+    )
+
+    # Assert
+    assert sweep == {"revoked": 1, "retained": 1, "failed": 0}
+    assert fake_sso_admin_client.account_assignments == {tuple(rbac_assignment)}
+    assert grant_store.get(rbac_assignment) is None
+    assert not grant_store.list_expired(now=2**32, limit=10)
+
+
+def test_grant_store_honours_the_table_keys(dynamodb_resource: pytest.fixture) -> None:
+    # Arrange
+    table = dynamodb_resource.create_table(
+        TableName="jiit-custom-keys",
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[
+            {"AttributeName": "id", "KeyType": "HASH"},
+            {"AttributeName": "range", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "id", "AttributeType": "S"},
+            {"AttributeName": "range", "AttributeType": "S"},
+        ],
+    )
+    grant_store = JiitGrantStore(table.name, hash_key="id", range_key="range")
+    grant = JiitGrant(
+        AccountAssignment("777777777777", ADMIN_ARN, "USER", "u-user1"), NOW + 600
+    )
+
+    # Act
+    grant_store.put(grant)
+    active_assignments = grant_store.list_active_assignments()
+    expired_grants = grant_store.list_expired(now=NOW + 600, limit=10)
+    grant_store.delete(expired_grants)
+
+    # Assert
+    assert active_assignments == {grant.assignment}
+    assert expired_grants == [grant]
+    assert grant_store.get(grant.assignment) is None
+    table.delete()
+
+
+@pytest.mark.parametrize(
+    "grant_request,error",
+    [
+        ({"account_id": "111111111111", "duration_seconds": 600}, "is required"),
+        (
+            {
+                "account_id": "111111111111",
+                "permission_set_name": "AdministratorAccess",
+                "duration_seconds": 600,
+                "principal_name": "user1",
+            },
+            "not a grant request field",
+        ),
+        (
+            {
+                "account_id": "1111",
+                "permission_set_name": "AdministratorAccess",
+                "duration_seconds": 600,
+            },
+            "account_id",
+        ),
+        (
+            {
+                "account_id": "111111111111",
+                "permission_set_name": "AdministratorAccess",
+                "duration_seconds": "600",
+            },
+            "duration_seconds",
+        ),
+        (
+            {
+                "account_id": "111111111111",
+                "permission_set_name": "AdministratorAccess",
+                "duration_seconds": True,
+            },
+            "duration_seconds",
+        ),
+    ],
+)
+def test_invalid_grant_request_is_rejected(grant_request: dict, error: str) -> None:
+    # Act & Assert
+    with pytest.raises(ValueError, match=error):
+        parse_grant_request(grant_request)
+
+
+def test_grant_request_is_parsed() -> None:
+    # Act
+    grant_request = parse_grant_request(
+        {
+            "account_id": "111111111111",
+            "permission_set_name": "AdministratorAccess",
+            "duration_seconds": 600,
+        }
+    )
+
+    # Assert
+    assert grant_request == {
+        "account_id": "111111111111",
+        "permission_set_name": "AdministratorAccess",
+        "duration_seconds": 600,
+        "group_name": None,
+    }
+
+
+def test_sso_user_name_is_read_from_the_caller_arn() -> None:
+    # Arrange
+    sso_arn = (
+        "arn:aws:sts::111111111111:assumed-role/"
+        "AWSReservedSSO_JiitRequester_0123456789abcdef/user1@example.com"
+    )
+    iam_arn = "arn:aws:sts::111111111111:assumed-role/DeployRole/user1@example.com"
+
+    # Act & Assert
+    assert get_sso_user_name(sso_arn) == "user1@example.com"
+    assert get_sso_user_name(iam_arn) is None
+    assert get_sso_user_name(None) is None
@@ -2,9 +2,19 @@
 Unit tests to test writing regex rules from DDB
 """
 import os
+import json
 import pytest
 import jsonschema
 from aws.app.lib.aws_sso_resolver import AwsResolver
+from aws.app.lib.manifest_compiler import (
+    ManifestCompiler,
+    ManifestValidator,
+    ManifestValidationError,
+    get_manifest_validator,
+    merge_manifests,
+    normalize_manifest,
+)
+from aws.app.lib.snapshot_cache import FileSnapshotStore
 
 # Globals vars
 CWD = os.path.dirname(os.path.realpath(__file__))
@@ -209,3 +219,277 @@ def test_multiple_rules_invalid_target_type_nested_combination() -> None:
     # Assert
     with pytest.raises(jsonschema.ValidationError):
         AwsResolver(manifest_definition_filepath, MANIFEST_SCHEMA_DEFINITION_FILEPATH)
+
+
+def test_valid_manifest_is_normalized(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    manifest_definition_filepath = os.path.join(
+        CWD, "..", "configs", "manifests", "valid_manifest.yaml"
+    )
+
+    # Act
+    py_aws_resolver = AwsResolver(
+        manifest_definition_filepath,
+        MANIFEST_SCHEMA_DEFINITION_FILEPATH,
+        manifest_compiler=ManifestCompiler(FileSnapshotStore(str(tmp_path))),
+    )
+
+    # Assert
+    assert py_aws_resolver.manifest_definition["ignore"][0]["nested"] is True
+    assert py_aws_resolver.manifest_definition["rules"][1]["nested"] is False
+    assert py_aws_resolver.manifest_definition["rules"][1]["rule_type"] == "explicit"
+
+
+def test_only_case_insensitive_values_are_lowercased(
+    tmp_path: pytest.fixture,
+) -> None:
+    # Arrange
+    manifest_definition_fragment = tmp_path / "manifest.yaml"
+    manifest_definition_fragment.write_text(
+        """
+rules:
+  - target_type: OU
+    target_names: [Workloads_Dev]
+    access_type: RBAC
+    permission_set_name: ReadOnly
+    principal_name: Developers
+    principal_type: GROUP
+    nested: true
+"""
+    )
+
+    # Act
+    manifest_definition = ManifestCompiler(FileSnapshotStore(str(tmp_path))).compile(
+        str(manifest_definition_fragment), MANIFEST_SCHEMA_DEFINITION_FILEPATH
+    )
+
+    # Assert
+    assert manifest_definition["rules"] == [
+        {
+            "target_type": "ou",
+            "target_names": ["Workloads_Dev"],
+            "access_type": "rbac",
+            "permission_set_name": "ReadOnly",
+            "principal_name": "Developers",
+            "principal_type": "group",
+            "nested": True,
+            "rule_type": "explicit",
+        }
+    ]
+
+
+def test_compiled_manifest_is_cached_by_content(
+    tmp_path: pytest.fixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Arrange
+    manifest_definition_filepath = tmp_path / "manifest.yaml"
+    with open(
+        os.path.join(CWD, "..", "configs", "manifests", "valid_manifest.yaml")
+    ) as file:
+        manifest_definition_filepath.write_text(file.read())
+    manifest_compiler = ManifestCompiler(FileSnapshotStore(str(tmp_path)))
+    compiled_manifest = manifest_compiler.compile(
+        str(manifest_definition_filepath), MANIFEST_SCHEMA_DEFINITION_FILEPATH
+    )
+    validated_manifests = []
+    monkeypatch.setattr(
+        ManifestValidator,
+        "validate",
+        lambda manifest_validator, manifest_definition: validated_manifests.append(
+            manifest_definition
+        ),
+    )
+
+    # Act
+    cached_manifest = manifest_compiler.compile(
+        str(manifest_definition_filepath), MANIFEST_SCHEMA_DEFINITION_FILEPATH
+    )
+    manifest_definition_filepath.write_text(
+        manifest_definition_filepath.read_text().replace("ReadOnly", "Billing")
+    )
+    changed_manifest = manifest_compiler.compile(
+        str(manifest_definition_filepath), MANIFEST_SCHEMA_DEFINITION_FILEPATH
+    )
+
+    # Assert
+    assert cached_manifest == compiled_manifest
+    assert changed_manifest["rules"][0]["permission_set_name"] == "Billing"
+    assert len(validated_manifests) == 1
+
+
+def test_validator_is_recompiled_once_the_schema_changes(
+    tmp_path: pytest.fixture,
+) -> None:
+    # Arrange
+    schema_definition_filepath = tmp_path / "schema.json"
+    with open(MANIFEST_SCHEMA_DEFINITION_FILEPATH) as file:
+        schema_definition = json.load(file)
+    schema_definition_filepath.write_text(json.dumps(schema_definition))
+
+    # Act
+    manifest_validator = get_manifest_validator(str(schema_definition_filepath))
+    cached_manifest_validator = get_manifest_validator(str(schema_definition_filepath))
+    schema_definition["required"] = ["rules", "ignore"]
+    schema_definition_filepath.write_text(json.dumps(schema_definition))
+    edited_manifest_validator = get_manifest_validator(str(schema_definition_filepath))
+
+    # Assert
+    assert cached_manifest_validator is manifest_validator
+    manifest_validator.validate({"rules": []})
+    with pytest.raises(ManifestValidationError):
+        edited_manifest_validator.validate({"rules": []})
+
+
+def test_every_invalid_rule_is_reported(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    manifest_definition_filepath = tmp_path / "manifest.yaml"
+    manifest_definition_filepath.write_text(
+        """
+rules:
+  - target_type: ou
+    target_names: [dev]
+    access_type: fail
+    permission_set_name: ReadOnly
+    principal_name: Developers
+    principal_type: group
+  - target_type: act
+    target_names: [master]
+    access_type: rbac
+    permission_set_name: ReadOnly
+    principal_name: Developers
+    principal_type: group
+  - target_type: act
+    target_names: [master]
+    access_type: rbac
+    principal_name: Developers
+    principal_type: group
+"""
+    )
+
+    # Act
+    with pytest.raises(ManifestValidationError) as exc_info:
+        AwsResolver(
+            str(manifest_definition_filepath),
+            MANIFEST_SCHEMA_DEFINITION_FILEPATH,
+            manifest_compiler=ManifestCompiler(FileSnapshotStore(str(tmp_path))),
+        )
+
+    # Assert
+    assert [
+        (entry_error["section"], entry_error["index"])
+        for entry_error in exc_info.value.entry_errors
+    ] == [("rules", 0), ("rules", 2)]
+
+
+def create_fragment(target_names: list, principal_name: str, **kwargs) -> str:
+    return json.dumps(
+        {
+            "rules": [
+                {
+                    "target_type": "ou",
+                    "target_names": target_names,
+                    "access_type": "rbac",
+                    "permission_set_name": "readonly",
+                    "principal_name": principal_name,
+                    "principal_type": "group",
+                    **kwargs,
+                }
+            ],
+            "ignore": [{"target_type": "act", "target_names": ["master"]}],
+        }
+    )
+
+
+def test_manifest_fragments_are_merged(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    manifest_directory = tmp_path / "manifests"
+    manifest_directory.mkdir()
+    (manifest_directory / "developers.json").write_text(
+        create_fragment(["prod"], "developers")
+    )
+    (manifest_directory / "developers_copy.json").write_text(
+        create_fragment(["prod"], "developers", nested=False)
+    )
+    with open(
+        os.path.join(CWD, "..", "configs", "manifests", "valid_manifest.yaml")
+    ) as file:
+        (manifest_directory / "platform.yaml").write_text(file.read())
+    manifest_compiler = ManifestCompiler(FileSnapshotStore(str(tmp_path)))
+
+    # Act
+    directory_manifest = manifest_compiler.compile(
+        str(manifest_directory), MANIFEST_SCHEMA_DEFINITION_FILEPATH
+    )
+    glob_manifest = manifest_compiler.compile(
+        str(manifest_directory / "developers*.json"),
+        MANIFEST_SCHEMA_DEFINITION_FILEPATH,
+    )
+
+    # Assert
+    assert len(directory_manifest["rules"]) == 3
+    assert len(directory_manifest["ignore"]) == 2
+    assert len(glob_manifest["rules"]) == 1
+
+
+def test_conflicting_manifest_fragments(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    (tmp_path / "developers.json").write_text(create_fragment(["dev"], "developers"))
+    (tmp_path / "developers_nested.json").write_text(
+        create_fragment(["dev"], "developers", nested=True)
+    )
+
+    # Assert
+    with pytest.raises(ValueError):
+        ManifestCompiler(FileSnapshotStore(str(tmp_path))).compile(
+            str(tmp_path / "*.json"), MANIFEST_SCHEMA_DEFINITION_FILEPATH
+        )
+
+
+def test_abac_rules_with_distinct_tags_are_merged() -> None:
+    # Arrange
+    manifest_fragments = [
+        (
+            f"{environment}.json",
+            normalize_manifest(
+                json.loads(
+                    create_fragment(
+                        ["workloads"],
+                        "developers",
+                        access_type="abac",
+                        target_tags={"env": environment},
+                    )
+                )
+            ),
+        )
+        for environment in ("prod", "dev", "prod")
+    ]
+
+    # Act
+    merged_manifest = merge_manifests(manifest_fragments)
+
+    # Assert - only the exact duplicate is dropped
+    assert [rule["target_tags"] for rule in merged_manifest["rules"]] == [
+        {"env": "prod"},
+        {"env": "dev"},
+    ]
+
+
+def test_missing_manifest_fragments(tmp_path: pytest.fixture) -> None:
+    # Assert
+    with pytest.raises(ValueError):
+        ManifestCompiler(FileSnapshotStore(str(tmp_path))).compile(
+            str(tmp_path / "*.yaml"), MANIFEST_SCHEMA_DEFINITION_FILEPATH
+        )
+
+
+def test_abac_rule_requires_target_tags(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    (tmp_path / "abac.json").write_text(
+        create_fragment(["prod"], "developers", access_type="abac")
+    )
+
+    # Assert
+    with pytest.raises(jsonschema.ValidationError):
+        ManifestCompiler(FileSnapshotStore(str(tmp_path))).compile(
+            str(tmp_path / "abac.json"), MANIFEST_SCHEMA_DEFINITION_FILEPATH
+        )
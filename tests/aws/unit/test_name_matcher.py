@@ -0,0 +1,35 @@
+"""
+Unit tests to test matching names against combined patterns
+"""
+import re
+import pytest
+from aws.app.lib.name_matcher import NameMatcher
+
+
+# Test cases
+@pytest.mark.parametrize(
+    "name,matched_patterns",
+    [
+        ("prod-payments", ["prod-*", "*-payments", "^prod"]),
+        ("PROD-billing", ["prod-*", "^prod"]),
+        ("dev-42", ["^dev-[0-9]+$"]),
+        ("dev-x", []),
+    ],
+)
+def test_match_every_pattern(name: str, matched_patterns: list) -> None:
+    # Arrange
+    name_matcher = NameMatcher(["prod-*", "*-payments", "^prod", "^dev-[0-9]+$"])
+
+    # Assert
+    assert name_matcher.match(name) == matched_patterns
+
+
+def test_empty_matcher() -> None:
+    # Assert
+    assert NameMatcher([]).match("prod") == []
+
+
+def test_invalid_regex_pattern() -> None:
+    # Assert
+    with pytest.raises(re.error):
+        NameMatcher(["^prod-("])
@@ -0,0 +1,99 @@
+"""
+Unit tests to test indexing the AWS organization tree
+"""
+import pytest
+from aws.app.lib.aws_organizations import AwsOrganizations
+from aws.app.lib.organization_index import OrganizationIndex
+
+# Globals vars
+ROOT_OU_ID = "r-1234"
+OU_ACCOUNT_MAP = {
+    ROOT_OU_ID: [{"Id": "000000000000", "Name": "master"}],
+    "ou-1234-workloads": [],
+    "ou-1234-dev": [{"Id": "111111111111", "Name": "workload_1_dev"}],
+    "ou-1234-sandbox": [{"Id": "222222222222", "Name": "Workload_1_Sandbox"}],
+    "ou-1234-prod": [
+        {"Id": "333333333333", "Name": "workload_1_prod"},
+        {"Id": "444444444444", "Name": "workload_1_dev"},
+    ],
+}
+OU_METADATA = {
+    ROOT_OU_ID: {"Name": "Root"},
+    "ou-1234-workloads": {"Name": "workloads", "ParentId": ROOT_OU_ID},
+    "ou-1234-dev": {"Name": "dev", "ParentId": "ou-1234-workloads"},
+    "ou-1234-sandbox": {"Name": "sandbox", "ParentId": "ou-1234-dev"},
+    "ou-1234-prod": {"Name": "prod", "ParentId": "ou-1234-workloads"},
+}
+
+
+@pytest.fixture(name="organization_index")
+def fixture_organization_index() -> OrganizationIndex:
+    return OrganizationIndex(ROOT_OU_ID, OU_ACCOUNT_MAP, OU_METADATA)
+
+
+# Test cases
+def test_parent_child_links(organization_index: OrganizationIndex) -> None:
+    # Assert
+    assert organization_index.ou_child_ids["ou-1234-workloads"] == [
+        "ou-1234-dev",
+        "ou-1234-prod",
+    ]
+    assert organization_index.ou_parent_ids["ou-1234-sandbox"] == "ou-1234-dev"
+    assert organization_index.account_parent_ids["222222222222"] == "ou-1234-sandbox"
+    assert organization_index.get_ou_path("ou-1234-sandbox") == [
+        ROOT_OU_ID,
+        "ou-1234-workloads",
+        "ou-1234-dev",
+        "ou-1234-sandbox",
+    ]
+
+
+def test_account_lookups(organization_index: OrganizationIndex) -> None:
+    # Assert
+    assert organization_index.get_account_ids("333333333333") == {"333333333333"}
+    assert organization_index.get_account_ids("workload_1_sandbox") == {"222222222222"}
+    assert organization_index.get_account_ids("workload_1_dev") == {
+        "111111111111",
+        "444444444444",
+    }
+    assert organization_index.get_account_ids("missing") == set()
+    assert organization_index.account_names["000000000000"] == "master"
+
+
+def test_ou_lookups(organization_index: OrganizationIndex) -> None:
+    # Assert
+    assert organization_index.get_ou_ids("ou-1234-dev") == {"ou-1234-dev"}
+    assert organization_index.get_ou_ids("PROD") == {"ou-1234-prod"}
+    assert organization_index.get_ou_ids("missing") == set()
+    assert organization_index.ou_names[ROOT_OU_ID] == "Root"
+
+
+def test_descendant_accounts(organization_index: OrganizationIndex) -> None:
+    # Assert
+    assert organization_index.get_ou_account_ids("ou-1234-workloads") == set()
+    assert organization_index.get_ou_account_ids("ou-1234-workloads", nested=True) == {
+        "111111111111",
+        "222222222222",
+        "333333333333",
+        "444444444444",
+    }
+    assert organization_index.get_ou_account_ids(ROOT_OU_ID, nested=True) == (
+        organization_index.account_ids
+    )
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_index_crawled_organization(setup_aws_environment: pytest.fixture) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+
+    # Act
+    organization_index = AwsOrganizations(root_ou_id).organization_index
+    (dev_ou_id,) = organization_index.get_ou_ids("dev")
+
+    # Assert
+    assert organization_index.ou_names[root_ou_id] == "Root"
+    assert {
+        organization_index.account_names[account_id]
+        for account_id in organization_index.get_ou_account_ids(dev_ou_id, nested=True)
+    } == {"workload_1_dev", "workload_1_sandbox"}
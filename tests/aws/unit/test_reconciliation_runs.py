@@ -0,0 +1,203 @@
+"""
+Unit tests to test checkpointed, resumable reconciliation runs
+"""
+import os
+import pytest
+from aws.app.lib.aws_sso_resolver import AccountAssignment
+from aws.app.lib.aws_assignment_planner import AssignmentPlan
+from aws.app.lib.aws_assignment_executor import AwsAssignmentExecutor
+from aws.app.lib.reconciliation_runs import (
+    ReconciliationRunner,
+    ReconciliationRunStore,
+    ReconciliationRunConflictError,
+    COMPLETED_STATUS,
+)
+
+# Globals vars
+ADMIN_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-administratoraccess"
+
+
+def create_assignment_plan(creates: int, deletes: int = 0) -> AssignmentPlan:
+    return AssignmentPlan(
+        creates=[
+            AccountAssignment(f"{account_number:012d}", ADMIN_ARN, "GROUP", "g-admins")
+            for account_number in range(creates)
+        ],
+        deletes=[
+            AccountAssignment(f"{account_number:012d}", ADMIN_ARN, "USER", "u-user1")
+            for account_number in range(deletes)
+        ],
+    )
+
+
+# Test cases
+def test_run_store_round_trip(setup_dynamodb_table: pytest.fixture) -> None:
+    # Arrange
+    run_store = ReconciliationRunStore(setup_dynamodb_table)
+    assignment_plan = create_assignment_plan(creates=2100, deletes=5)
+
+    # Act
+    run = run_store.create(assignment_plan)
+    run.cursor = 7
+    run.failed = {"create#000000000003": "Conflict"}
+    run_store.save(run)
+    loaded_run = run_store.load(run.run_id)
+
+    # Assert
+    assert loaded_run == run
+    assert len(loaded_run.completed_operation_ids) == 7
+
+
+def test_load_missing_run(setup_dynamodb_table: pytest.fixture) -> None:
+    # Assert
+    assert ReconciliationRunStore(setup_dynamodb_table).load("missing") is None
+
+
+def test_run_is_drained_across_invocations(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    assignment_plan = create_assignment_plan(creates=5, deletes=2)
+    fake_sso_admin_client.account_assignments = {
+        tuple(assignment) for assignment in assignment_plan.deletes
+    }
+    continued_run_ids = []
+    reconciliation_runner = ReconciliationRunner(
+        ReconciliationRunStore(setup_dynamodb_table),
+        AwsAssignmentExecutor(
+            os.getenv("IDENTITY_STORE_ARN"),
+            sso_admin_client=fake_sso_admin_client,
+            batch_size=2,
+            poll_interval_seconds=0,
+        ),
+        slice_size=3,
+        continue_run=lambda run_id, version: continued_run_ids.append(
+            (run_id, version)
+        ),
+    )
+
+    # Act - each continuation stands in for a re-enqueued invocation
+    run = reconciliation_runner.start(assignment_plan)
+    while continued_run_ids:
+        run = reconciliation_runner.resume(*continued_run_ids.pop())
+
+    # Assert
+    assert run.status == COMPLETED_STATUS
+    assert run.cursor == len(assignment_plan)
+    assert fake_sso_admin_client.request_counts["create_account_assignment"] == 5
+    assert fake_sso_admin_client.account_assignments == {
+        tuple(assignment) for assignment in assignment_plan.creates
+    }
+
+
+def test_resume_completed_run(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    run_store = ReconciliationRunStore(setup_dynamodb_table)
+    reconciliation_runner = ReconciliationRunner(
+        run_store,
+        AwsAssignmentExecutor(
+            os.getenv("IDENTITY_STORE_ARN"),
+            sso_admin_client=fake_sso_admin_client,
+            poll_interval_seconds=0,
+        ),
+    )
+    run = reconciliation_runner.start(create_assignment_plan(creates=1))
+
+    # Act
+    resumed_run = reconciliation_runner.resume(run.run_id)
+
+    # Assert
+    assert resumed_run.status == COMPLETED_STATUS
+    assert fake_sso_admin_client.request_counts["create_account_assignment"] == 1
+
+
+def test_unsettled_operations_are_retried_next_slice(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    assignment_plan = create_assignment_plan(creates=5)
+    create_account_assignment = fake_sso_admin_client.create_account_assignment
+    stuck_account_ids = [assignment_plan.creates[2].account_id]
+
+    def stuck_create_account_assignment(**kwargs) -> dict:
+        response = create_account_assignment(**kwargs)
+        if kwargs["TargetId"] in stuck_account_ids:
+            stuck_account_ids.remove(kwargs["TargetId"])
+            fake_sso_admin_client._operation_statuses[
+                response["AccountAssignmentCreationStatus"]["RequestId"]
+            ] = "IN_PROGRESS"
+        return response
+
+    fake_sso_admin_client.create_account_assignment = stuck_create_account_assignment
+    continued_run_ids = []
+    reconciliation_runner = ReconciliationRunner(
+        ReconciliationRunStore(setup_dynamodb_table),
+        AwsAssignmentExecutor(
+            os.getenv("IDENTITY_STORE_ARN"),
+            sso_admin_client=fake_sso_admin_client,
+            batch_size=2,
+            poll_interval_seconds=0,
+            max_polls=2,
+        ),
+        continue_run=lambda run_id, version: continued_run_ids.append(
+            (run_id, version)
+        ),
+    )
+
+    # Act
+    first_slice_run = reconciliation_runner.start(assignment_plan)
+    first_slice_cursor = first_slice_run.cursor
+    run = reconciliation_runner.resume(*continued_run_ids.pop())
+
+    # Assert - the cursor stops before the stuck operation, which is retried
+    # along with the operation settled after it
+    assert first_slice_cursor == 2
+    assert run.status == COMPLETED_STATUS
+    assert not run.failed
+    assert fake_sso_admin_client.request_counts["create_account_assignment"] == 7
+
+
+def test_concurrent_invocations_are_fenced(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    run_store = ReconciliationRunStore(setup_dynamodb_table)
+    continued_runs = []
+    reconciliation_runner = ReconciliationRunner(
+        run_store,
+        AwsAssignmentExecutor(
+            os.getenv("IDENTITY_STORE_ARN"),
+            sso_admin_client=fake_sso_admin_client,
+            poll_interval_seconds=0,
+        ),
+        slice_size=2,
+        continue_run=lambda run_id, version: continued_runs.append((run_id, version)),
+    )
+    run = reconciliation_runner.start(create_assignment_plan(creates=5))
+    run_id, version = continued_runs.pop()
+
+    # Act - a second start, a leased run & a stale checkpoint are refused
+    with pytest.raises(ReconciliationRunConflictError):
+        reconciliation_runner.start(create_assignment_plan(creates=1))
+    run_store.acquire_lease(run_id, "other-invocation", lease_seconds=60)
+    leased_run = reconciliation_runner.resume(run_id, expected_version=version)
+    run_store.release_lease(run_id, "other-invocation")
+    stale_run = run_store.load(run_id)
+    stale_run.version -= 1
+    with pytest.raises(ReconciliationRunConflictError):
+        run_store.save(stale_run)
+
+    # A redelivered continuation is dropped once the run moved past it
+    reconciliation_runner.resume(run_id, expected_version=version)
+    create_count = fake_sso_admin_client.request_counts["create_account_assignment"]
+    reconciliation_runner.resume(run_id, expected_version=version)
+    while continued_runs:
+        run = reconciliation_runner.resume(*continued_runs.pop())
+
+    # Assert
+    assert leased_run is None
+    assert create_count == 4
+    assert run.status == COMPLETED_STATUS
+    assert fake_sso_admin_client.request_counts["create_account_assignment"] == 5
@@ -0,0 +1,143 @@
+"""
+Unit tests to test sharding reconciliation plans across workers
+"""
+import os
+import pytest
+from aws.app.lib.aws_sso_resolver import AccountAssignment
+from aws.app.lib.aws_assignment_planner import AssignmentPlan
+from aws.app.lib.aws_assignment_executor import AwsAssignmentExecutor
+from aws.app.lib.organization_index import OrganizationIndex
+from aws.app.lib.reconciliation_runs import (
+    ReconciliationRunner,
+    ReconciliationRunStore,
+    COMPLETED_STATUS,
+    IN_PROGRESS_STATUS,
+)
+from aws.app.lib.reconciliation_shards import (
+    ShardCoordinator,
+    partition_plan,
+    get_account_shard,
+)
+
+# Globals vars
+ADMIN_ARN = "arn:aws:sso:::permissionSet/ssoins-instanceId/ps-administratoraccess"
+ROOT_OU_ID = "r-1234"
+OU_ACCOUNT_MAP = {
+    ROOT_OU_ID: [{"Id": "000000000000", "Name": "master"}],
+    "ou-1234-dev": [
+        {"Id": f"1{number:011d}", "Name": f"dev_{number}"} for number in range(6)
+    ],
+    "ou-1234-sandbox": [{"Id": "200000000000", "Name": "sandbox"}],
+    "ou-1234-prod": [
+        {"Id": f"3{number:011d}", "Name": f"prod_{number}"} for number in range(4)
+    ],
+}
+OU_METADATA = {
+    ROOT_OU_ID: {"Name": "Root"},
+    "ou-1234-dev": {"Name": "dev", "ParentId": ROOT_OU_ID},
+    "ou-1234-sandbox": {"Name": "sandbox", "ParentId": "ou-1234-dev"},
+    "ou-1234-prod": {"Name": "prod", "ParentId": ROOT_OU_ID},
+}
+ASSIGNMENT_PLAN = AssignmentPlan(
+    creates=[
+        AccountAssignment(account["Id"], ADMIN_ARN, "GROUP", "g-admins")
+        for accounts in OU_ACCOUNT_MAP.values()
+        for account in accounts
+    ],
+    deletes=[AccountAssignment("100000000000", ADMIN_ARN, "USER", "u-user1")],
+)
+
+
+def get_plan_account_ids(assignment_plan: AssignmentPlan) -> set:
+    return {
+        assignment.account_id
+        for assignment in assignment_plan.creates + assignment_plan.deletes
+    }
+
+
+# Test cases
+def test_partition_plan_by_account_hash() -> None:
+    # Act
+    shard_plans = partition_plan(ASSIGNMENT_PLAN, 3)
+
+    # Assert
+    assert sum(len(shard_plan) for shard_plan in shard_plans) == len(ASSIGNMENT_PLAN)
+    for shard, shard_plan in enumerate(shard_plans):
+        assert all(
+            get_account_shard(account_id, 3) == shard
+            for account_id in get_plan_account_ids(shard_plan)
+        )
+
+
+def test_partition_plan_by_ou_subtree() -> None:
+    # Arrange
+    organization_index = OrganizationIndex(ROOT_OU_ID, OU_ACCOUNT_MAP, OU_METADATA)
+
+    # Act
+    shard_plans = partition_plan(
+        ASSIGNMENT_PLAN, 2, strategy="ou", organization_index=organization_index
+    )
+
+    # Assert - the dev subtree, sandbox included, is never split
+    assert get_plan_account_ids(shard_plans[0]) == {
+        account["Id"]
+        for ou_id in ("ou-1234-dev", "ou-1234-sandbox")
+        for account in OU_ACCOUNT_MAP[ou_id]
+    }
+    assert len(shard_plans[1]) == len(ASSIGNMENT_PLAN) - len(shard_plans[0])
+
+
+def test_partition_plan_invalid_strategy() -> None:
+    # Assert
+    with pytest.raises(ValueError):
+        partition_plan(ASSIGNMENT_PLAN, 2, strategy="random")
+
+
+def test_fanout_is_drained_and_aggregated(
+    setup_dynamodb_table: pytest.fixture, fake_sso_admin_client: pytest.fixture
+) -> None:
+    # Arrange
+    run_store = ReconciliationRunStore(setup_dynamodb_table)
+    dispatched_run_ids = []
+    reconciliation_runner = ReconciliationRunner(
+        run_store,
+        AwsAssignmentExecutor(
+            os.getenv("IDENTITY_STORE_ARN"),
+            sso_admin_client=fake_sso_admin_client,
+            poll_interval_seconds=0,
+        ),
+        slice_size=2,
+        continue_run=lambda run_id, version: dispatched_run_ids.append(
+            (run_id, version)
+        ),
+    )
+    shard_coordinator = ShardCoordinator(
+        run_store,
+        dispatch_run=lambda run_id, version: dispatched_run_ids.append(
+            (run_id, version)
+        ),
+        shard_count=4,
+    )
+
+    # Act - the dispatched run IDs stand in for a queue of worker invocations
+    fanout = shard_coordinator.start(ASSIGNMENT_PLAN)
+    in_progress_summary = shard_coordinator.aggregate(fanout["fanout_id"])
+    while dispatched_run_ids:
+        reconciliation_runner.resume(*dispatched_run_ids.pop(0))
+
+    # Retried worker invocations must not write again
+    create_count = fake_sso_admin_client.request_counts["create_account_assignment"]
+    for run_id in fanout["run_ids"]:
+        reconciliation_runner.resume(run_id)
+    fanout_summary = shard_coordinator.aggregate(fanout["fanout_id"])
+
+    # Assert
+    assert in_progress_summary["status"] == IN_PROGRESS_STATUS
+    assert fanout_summary["status"] == COMPLETED_STATUS
+    assert fanout_summary["cursor"] == len(ASSIGNMENT_PLAN)
+    assert not fanout_summary["failed"]
+    assert create_count == len(ASSIGNMENT_PLAN.creates)
+    assert (
+        fake_sso_admin_client.request_counts["create_account_assignment"]
+        == create_count
+    )
@@ -0,0 +1,298 @@
+"""
+Unit tests to test caching organization snapshots across invocations
+"""
+import pytest
+from aws.app.lib.aws_organizations import AwsOrganizations
+from aws.app.lib.snapshot_cache import (
+    SnapshotCache,
+    SnapshotStore,
+    SnapshotConflictError,
+    FileSnapshotStore,
+    DynamoDBSnapshotStore,
+)
+
+# Globals vars
+OU_ACCOUNT_MAP = {"r-1234": [{"Id": "123456789012", "Name": "master"}]}
+
+
+# Test cases
+def test_file_store_round_trip(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+
+    # Act
+    snapshot_cache.put("organization", OU_ACCOUNT_MAP, version=1)
+
+    # Assert
+    assert snapshot_cache.get("organization", version=1).data == OU_ACCOUNT_MAP
+
+
+def test_file_store_missing_snapshot(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+
+    # Assert
+    assert snapshot_cache.get("organization", version=1) is None
+
+
+def test_expired_snapshot(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=0)
+
+    # Act
+    snapshot_cache.put("organization", OU_ACCOUNT_MAP, version=1)
+
+    # Assert
+    assert snapshot_cache.get("organization", version=1) is None
+
+
+def test_snapshot_version_mismatch(tmp_path: pytest.fixture) -> None:
+    # Arrange
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+
+    # Act
+    snapshot_cache.put("organization", OU_ACCOUNT_MAP, version=1)
+
+    # Assert
+    assert snapshot_cache.get("organization", version=2) is None
+
+
+def test_dynamodb_store_round_trip(setup_dynamodb_table: pytest.fixture) -> None:
+    # Arrange
+    snapshot_cache = SnapshotCache(
+        DynamoDBSnapshotStore(setup_dynamodb_table), ttl_seconds=60
+    )
+
+    # Act
+    snapshot_cache.put("organization", OU_ACCOUNT_MAP, version=1)
+
+    # Assert
+    assert snapshot_cache.get("organization", version=1).data == OU_ACCOUNT_MAP
+
+
+@pytest.mark.parametrize("store_type", ["file", "dynamodb"])
+def test_stale_revision_conflicts(
+    store_type: str, tmp_path: pytest.fixture, setup_dynamodb_table: pytest.fixture
+) -> None:
+    # Arrange
+    snapshot_store = (
+        FileSnapshotStore(str(tmp_path))
+        if store_type == "file"
+        else DynamoDBSnapshotStore(setup_dynamodb_table)
+    )
+    snapshot_cache = SnapshotCache(snapshot_store, ttl_seconds=60)
+    key = f"conflict-{store_type}"
+    snapshot = snapshot_cache.put(key, OU_ACCOUNT_MAP, version=1)
+    patched_snapshot = snapshot_cache.put(
+        key, {}, version=1, expected_revision=snapshot.revision
+    )
+
+    # Act - a writer still holding the first revision must not overwrite
+    with pytest.raises(SnapshotConflictError):
+        snapshot_cache.put(
+            key, OU_ACCOUNT_MAP, version=1, expected_revision=snapshot.revision
+        )
+
+    # Assert
+    assert snapshot_cache.get(key, version=1).revision == patched_snapshot.revision
+    assert snapshot_cache.get(key, version=1).data == {}
+
+
+def test_incomplete_store_fails_on_construction() -> None:
+    # Arrange
+    class LoadOnlySnapshotStore(SnapshotStore):
+        def load(self, key: str) -> dict:
+            return None
+
+    # Assert
+    with pytest.raises(TypeError):
+        LoadOnlySnapshotStore()
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_organizations_reload_snapshot_without_crawling(
+    setup_aws_environment: pytest.fixture, tmp_path: pytest.fixture
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+    crawled_ou_account_map = AwsOrganizations(
+        root_ou_id, snapshot_cache=snapshot_cache
+    ).ou_account_map
+
+    # Act - a cold container must reload the snapshot instead of recrawling
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr(
+        AwsOrganizations,
+        "describe_aws_organizational_unit",
+        pytest.fail,
+    )
+    py_aws_organizations = AwsOrganizations(root_ou_id, snapshot_cache=snapshot_cache)
+    monkeypatch.undo()
+
+    # Assert
+    assert py_aws_organizations.get_ou_account_map() == crawled_ou_account_map
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_organizations_recrawl_expired_snapshot(
+    setup_aws_environment: pytest.fixture, tmp_path: pytest.fixture
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    snapshot_store = FileSnapshotStore(str(tmp_path))
+    stale_snapshot_cache = SnapshotCache(snapshot_store, ttl_seconds=60)
+    # Key suffix is the digest of an empty OU ignore list
+    stale_snapshot_cache.put(
+        f"organization-{root_ou_id}-" + "e3b0c44298fc1c14",
+        OU_ACCOUNT_MAP,
+        version=1,
+    )
+
+    # Act
+    py_aws_organizations = AwsOrganizations(
+        root_ou_id, snapshot_cache=SnapshotCache(snapshot_store, ttl_seconds=0)
+    )
+
+    # Assert
+    assert py_aws_organizations.ou_account_map != OU_ACCOUNT_MAP
+    assert root_ou_id in py_aws_organizations.ou_account_map
+
+
+def create_ou_event_detail(parent_ou_id: str, ou_id: str) -> dict:
+    """
+    Build the CloudTrail event detail of an OU creation
+    """
+    return {
+        "eventSource": "organizations.amazonaws.com",
+        "eventName": "CreateOrganizationalUnit",
+        "requestParameters": {"parentId": parent_ou_id, "name": ou_id},
+        "responseElements": {"organizationalUnit": {"id": ou_id, "name": ou_id}},
+    }
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_organizations_containers_keep_each_others_deltas(
+    setup_aws_environment: pytest.fixture, tmp_path: pytest.fixture
+) -> None:
+    # Arrange - two warm containers sharing a snapshot
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+    first_aws_organizations = AwsOrganizations(
+        root_ou_id, snapshot_cache=snapshot_cache
+    )
+    second_aws_organizations = AwsOrganizations(
+        root_ou_id, snapshot_cache=snapshot_cache
+    )
+
+    # Act
+    is_first_applied = first_aws_organizations.apply_event(
+        create_ou_event_detail(root_ou_id, "ou-first")
+    )
+    is_second_applied = second_aws_organizations.apply_event(
+        create_ou_event_detail(root_ou_id, "ou-second")
+    )
+
+    # Assert
+    assert is_first_applied and is_second_applied
+    ou_account_map = AwsOrganizations(
+        root_ou_id, snapshot_cache=snapshot_cache
+    ).get_ou_account_map()
+    assert {"ou-first", "ou-second"} <= ou_account_map.keys()
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_organizations_resync_on_snapshot_conflict(
+    setup_aws_environment: pytest.fixture, tmp_path: pytest.fixture
+) -> None:
+    # Arrange
+    class RacedSnapshotStore(FileSnapshotStore):
+        def save(self, key: str, snapshot: dict, expected_revision: str = None):
+            if expected_revision is not None:
+                raise SnapshotConflictError(key)
+            super().save(key, snapshot)
+
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    snapshot_cache = SnapshotCache(RacedSnapshotStore(str(tmp_path)), ttl_seconds=60)
+    py_aws_organizations = AwsOrganizations(root_ou_id, snapshot_cache=snapshot_cache)
+
+    # Act
+    is_applied = py_aws_organizations.apply_event(
+        create_ou_event_detail(root_ou_id, "ou-raced")
+    )
+
+    # Assert - the recrawl replaced the patched tree
+    assert not is_applied
+    assert "ou-raced" not in py_aws_organizations.ou_account_map
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_organizations_reload_account_tags_without_crawling(
+    setup_aws_environment: pytest.fixture,
+    tmp_path: pytest.fixture,
+    organizations_client: pytest.fixture,
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+    py_aws_organizations = AwsOrganizations(root_ou_id, snapshot_cache=snapshot_cache)
+    account_id = min(py_aws_organizations.organization_index.account_ids)
+    organizations_client.tag_resource(
+        ResourceId=account_id, Tags=[{"Key": "env", "Value": "reload"}]
+    )
+    try:
+        assert py_aws_organizations.account_tag_index.get_account_ids(
+            {"env": "reload"}
+        ) == {account_id}
+
+        # Act - a cold container must reload the tags instead of listing them
+        monkeypatch = pytest.MonkeyPatch()
+        monkeypatch.setattr(AwsOrganizations, "_list_account_tags", pytest.fail)
+        reload_account_ids = AwsOrganizations(
+            root_ou_id, snapshot_cache=snapshot_cache
+        ).account_tag_index.get_account_ids({"env": "reload"})
+        monkeypatch.undo()
+    finally:
+        organizations_client.untag_resource(ResourceId=account_id, TagKeys=["env"])
+
+    # Assert
+    assert reload_account_ids == {account_id}
+
+
+@pytest.mark.parametrize("setup_aws_environment", ["aws_org_3.json"], indirect=True)
+def test_organizations_tag_event_invalidates_snapshot_tags(
+    setup_aws_environment: pytest.fixture,
+    tmp_path: pytest.fixture,
+    organizations_client: pytest.fixture,
+) -> None:
+    # Arrange
+    root_ou_id = setup_aws_environment["root_ou_id"]
+    snapshot_cache = SnapshotCache(FileSnapshotStore(str(tmp_path)), ttl_seconds=60)
+    py_aws_organizations = AwsOrganizations(root_ou_id, snapshot_cache=snapshot_cache)
+    account_id = min(py_aws_organizations.organization_index.account_ids)
+    assert not py_aws_organizations.account_tag_index.get_account_ids({"env": "qa"})
+
+    # Act
+    organizations_client.tag_resource(
+        ResourceId=account_id, Tags=[{"Key": "env", "Value": "qa"}]
+    )
+    try:
+        is_applied = py_aws_organizations.apply_event(
+            {
+                "eventSource": "organizations.amazonaws.com",
+                "eventName": "TagResource",
+                "requestParameters": {
+                    "resourceId": account_id,
+                    "tags": [{"key": "env", "value": "qa"}],
+                },
+            }
+        )
+        qa_account_ids = AwsOrganizations(
+            root_ou_id, snapshot_cache=snapshot_cache
+        ).account_tag_index.get_account_ids({"env": "qa"})
+    finally:
+        organizations_client.untag_resource(ResourceId=account_id, TagKeys=["env"])
+
+    # Assert
+    assert is_applied
+    assert qa_account_ids == {account_id}
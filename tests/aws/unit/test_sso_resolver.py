@@ -1 +1,336 @@
-# from aws.app.lib.aws_sso_resolver import RbacResolver
+"""
+Unit tests to test resolving manifest rules into account assignments
+"""
+import pytest
+from aws.app.lib.aws_sso_resolver import RbacResolver, AccountAssignment
+from aws.app.lib.organization_index import OrganizationIndex
+from aws.app.lib.account_tag_index import AccountTagIndex
+
+# Globals vars
+ROOT_OU_ID = "r-1234"
+OU_ACCOUNT_MAP = {
+    ROOT_OU_ID: [{"Id": "000000000000", "Name": "master"}],
+    "ou-1234-dev": [{"Id": "111111111111", "Name": "workload_1_dev"}],
+    "ou-1234-sandbox": [{"Id": "222222222222", "Name": "workload_1_sandbox"}],
+    "ou-1234-prod": [
+        {"Id": "333333333333", "Name": "workload_1_prod"},
+        {"Id": "444444444444", "Name": "workload_2_prod"},
+    ],
+}
+OU_METADATA = {
+    ROOT_OU_ID: {"Name": "Root"},
+    "ou-1234-dev": {"Name": "dev", "ParentId": ROOT_OU_ID},
+    "ou-1234-sandbox": {"Name": "sandbox", "ParentId": "ou-1234-dev"},
+    "ou-1234-prod": {"Name": "prod", "ParentId": ROOT_OU_ID},
+}
+AWS_ACCOUNTS = [account for accounts in OU_ACCOUNT_MAP.values() for account in accounts]
+SSO_GROUPS = [
+    {"GroupId": "g-admins", "DisplayName": "Admins"},
+    {"GroupId": "g-developers", "DisplayName": "Developers"},
+]
+SSO_USERS = [{"UserId": "u-user1", "UserName": "user1@testing.com"}]
+PERMISSION_SETS = [
+    {"Name": "AdministratorAccess", "PermissionSetArn": "arn:ps-admin"},
+    {"Name": "ReadOnly", "PermissionSetArn": "arn:ps-readonly"},
+]
+
+
+def create_rule(
+    target_type: str,
+    target_names: list,
+    principal_name: str,
+    permission_set_name: str,
+    principal_type: str = "group",
+    **kwargs,
+) -> dict:
+    return {
+        "target_type": target_type,
+        "target_names": target_names,
+        "access_type": "rbac",
+        "principal_name": principal_name,
+        "principal_type": principal_type,
+        "permission_set_name": permission_set_name,
+        **kwargs,
+    }
+
+
+def resolve(assignment_rules: list, ignore_rules: list = None) -> set:
+    return RbacResolver().create_assignments_mapping(
+        aws_accounts=AWS_ACCOUNTS,
+        sso_groups=SSO_GROUPS,
+        sso_users=SSO_USERS,
+        permission_sets=PERMISSION_SETS,
+        assignment_rules=assignment_rules,
+        ignore_rules=ignore_rules,
+        organization_index=OrganizationIndex(ROOT_OU_ID, OU_ACCOUNT_MAP, OU_METADATA),
+    )
+
+
+# Test cases
+def test_account_targets_by_id_and_name() -> None:
+    # Act
+    assignments = resolve(
+        [create_rule("act", ["000000000000", "workload_1_prod"], "admins", "readonly")]
+    )
+
+    # Assert
+    assert assignments == {
+        AccountAssignment("000000000000", "arn:ps-readonly", "GROUP", "g-admins"),
+        AccountAssignment("333333333333", "arn:ps-readonly", "GROUP", "g-admins"),
+    }
+
+
+def test_user_principal() -> None:
+    # Act
+    assignments = resolve(
+        [create_rule("act", ["master"], "user1@testing.com", "readonly", "user")]
+    )
+
+    # Assert
+    assert assignments == {
+        AccountAssignment("000000000000", "arn:ps-readonly", "USER", "u-user1")
+    }
+
+
+def test_ou_targets_nested_and_flat() -> None:
+    # Act
+    flat_assignments = resolve([create_rule("ou", ["dev"], "developers", "readonly")])
+    nested_assignments = resolve(
+        [create_rule("ou", ["dev"], "developers", "readonly", nested=True)]
+    )
+
+    # Assert
+    assert {assignment.account_id for assignment in flat_assignments} == {
+        "111111111111"
+    }
+    assert {assignment.account_id for assignment in nested_assignments} == {
+        "111111111111",
+        "222222222222",
+    }
+
+
+def test_overlapping_rules_are_deduplicated() -> None:
+    # Act
+    assignments = resolve(
+        [
+            create_rule(
+                "ou", [ROOT_OU_ID], "admins", "administratoraccess", nested=True
+            ),
+            create_rule("ou", ["prod"], "admins", "administratoraccess"),
+            create_rule("act", ["workload_1_prod"], "admins", "administratoraccess"),
+        ]
+    )
+
+    # Assert
+    assert len(assignments) == len(AWS_ACCOUNTS)
+
+
+def test_ignore_rules_are_subtracted() -> None:
+    # Act
+    assignments = resolve(
+        [create_rule("ou", ["root"], "admins", "administratoraccess", nested=True)],
+        ignore_rules=[
+            {"target_type": "ou", "target_names": ["dev"], "nested": True},
+            {"target_type": "act", "target_names": ["master"]},
+        ],
+    )
+
+    # Assert
+    assert {assignment.account_id for assignment in assignments} == {
+        "333333333333",
+        "444444444444",
+    }
+
+
+def test_non_rbac_rules_are_skipped() -> None:
+    # Act
+    assignments = resolve(
+        [create_rule("act", ["master"], "admins", "readonly", access_type="jiit")]
+    )
+
+    # Assert
+    assert assignments == set()
+
+
+@pytest.mark.parametrize(
+    "assignment_rule",
+    [
+        create_rule("act", ["missing"], "admins", "readonly"),
+        create_rule("ou", ["missing"], "admins", "readonly"),
+        create_rule("act", ["master"], "missing", "readonly"),
+        create_rule("act", ["master"], "admins", "missing"),
+    ],
+)
+def test_unresolved_references(assignment_rule: dict) -> None:
+    # Assert
+    with pytest.raises(ValueError):
+        resolve([assignment_rule])
+
+
+def test_resolve_large_assignment_matrix() -> None:
+    # Arrange
+    aws_accounts = [
+        {"Id": f"{account_number:012d}", "Name": f"account_{account_number}"}
+        for account_number in range(5000)
+    ]
+    ou_account_map = {
+        ROOT_OU_ID: [],
+        **{
+            f"ou-1234-{ou_number}": aws_accounts[ou_number::50]
+            for ou_number in range(50)
+        },
+    }
+    ou_metadata = {
+        ROOT_OU_ID: {"Name": "Root"},
+        **{
+            f"ou-1234-{ou_number}": {"Name": f"ou_{ou_number}", "ParentId": ROOT_OU_ID}
+            for ou_number in range(50)
+        },
+    }
+    sso_groups = [
+        {"GroupId": f"g-{group_number}", "DisplayName": f"group_{group_number}"}
+        for group_number in range(20)
+    ]
+    assignment_rules = [
+        create_rule("ou", ["root"], f"group_{group_number}", "readonly", nested=True)
+        for group_number in range(10)
+    ] + [
+        create_rule("ou", ["ou_0", "ou_1"], "group_0", "readonly"),
+    ]
+
+    # Act
+    assignments = RbacResolver().create_assignments_mapping(
+        aws_accounts=aws_accounts,
+        sso_groups=sso_groups,
+        permission_sets=PERMISSION_SETS,
+        assignment_rules=assignment_rules,
+        ignore_rules=[{"target_type": "ou", "target_names": ["ou_49"]}],
+        organization_index=OrganizationIndex(ROOT_OU_ID, ou_account_map, ou_metadata),
+    )
+
+    # Assert
+    assert len(assignments) == 10 * (5000 - 100)
+
+
+def test_referenced_principal_names() -> None:
+    # Act
+    principal_names = RbacResolver().get_referenced_principal_names(
+        [
+            create_rule("act", ["master"], "admins", "readonly"),
+            create_rule("act", ["master"], "user1@testing.com", "readonly", "user"),
+            create_rule("act", ["master"], "auditors", "readonly", access_type="jiit"),
+        ]
+    )
+    implicit_principal_names = RbacResolver().get_referenced_principal_names(
+        [create_rule("act", ["master"], "admins", "readonly", rule_type="implicit")]
+    )
+
+    # Assert
+    assert principal_names == {"group": {"admins"}, "user": {"user1@testing.com"}}
+    assert implicit_principal_names is None
+
+
+def test_implicit_rules_match_patterns() -> None:
+    # Act
+    assignments = resolve(
+        [
+            create_rule(
+                "act", ["workload_*_prod"], "admin?", "readonly", rule_type="implicit"
+            ),
+            create_rule(
+                "ou",
+                ["^(dev|sandbox)$"],
+                "*",
+                "administratoraccess",
+                rule_type="implicit",
+            ),
+            create_rule(
+                "act", ["^nothing"], "admins", "readonly", rule_type="implicit"
+            ),
+        ]
+    )
+
+    # Assert
+    assert assignments == {
+        AccountAssignment("333333333333", "arn:ps-readonly", "GROUP", "g-admins"),
+        AccountAssignment("444444444444", "arn:ps-readonly", "GROUP", "g-admins"),
+        *(
+            AccountAssignment(account_id, "arn:ps-admin", "GROUP", group_id)
+            for account_id in ("111111111111", "222222222222")
+            for group_id in ("g-admins", "g-developers")
+        ),
+    }
+
+
+def test_abac_rules_select_tagged_accounts() -> None:
+    # Arrange
+    account_tag_index = AccountTagIndex(
+        {
+            "111111111111": {"env": "dev", "team": "payments"},
+            "333333333333": {"env": "prod", "team": "payments"},
+            "444444444444": {"env": "prod", "team": "search"},
+        }
+    )
+
+    # Act
+    assignments = RbacResolver().create_assignments_mapping(
+        aws_accounts=AWS_ACCOUNTS,
+        sso_groups=SSO_GROUPS,
+        permission_sets=PERMISSION_SETS,
+        assignment_rules=[
+            create_rule(
+                "ou",
+                [ROOT_OU_ID],
+                "admins",
+                "readonly",
+                access_type="abac",
+                nested=True,
+                target_tags={"env": "prod", "team": ["payments", "billing"]},
+            )
+        ],
+        organization_index=OrganizationIndex(ROOT_OU_ID, OU_ACCOUNT_MAP, OU_METADATA),
+        account_tag_index=account_tag_index,
+    )
+
+    # Assert
+    assert assignments == {
+        AccountAssignment("333333333333", "arn:ps-readonly", "GROUP", "g-admins")
+    }
+
+
+def test_abac_rules_require_tag_index() -> None:
+    # Assert
+    with pytest.raises(ValueError):
+        resolve(
+            [
+                create_rule(
+                    "act",
+                    ["master"],
+                    "admins",
+                    "readonly",
+                    access_type="abac",
+                    target_tags={"env": "prod"},
+                )
+            ]
+        )
+
+
+def test_managed_scope_covers_rules_without_targets() -> None:
+    # Arrange
+    managed_scope = set()
+
+    # Act - the ignore entry leaves the rule without any assignment
+    assignments = RbacResolver().create_assignments_mapping(
+        aws_accounts=AWS_ACCOUNTS,
+        sso_groups=SSO_GROUPS,
+        sso_users=SSO_USERS,
+        permission_sets=PERMISSION_SETS,
+        assignment_rules=[create_rule("act", ["master"], "admins", "readonly")],
+        ignore_rules=[{"target_type": "act", "target_names": ["master"]}],
+        organization_index=OrganizationIndex(ROOT_OU_ID, OU_ACCOUNT_MAP, OU_METADATA),
+        managed_scope=managed_scope,
+    )
+
+    # Assert
+    assert assignments == set()
+    assert managed_scope == {("arn:ps-readonly", "GROUP", "g-admins")}